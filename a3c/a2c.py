@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+import tensorflow as tf
+import numpy as np
+import time
+import logging
+
+from termcolor import colored
+from common.game_state import GameStateVec, SubprocGameStateVec
+from common.util import discounted_returns
+
+logger = logging.getLogger("a2c")
+
+
+class A2CTrainer(object):
+    """Synchronous advantage actor-critic (A2C) on n_envs lockstep envs.
+
+    Every step runs one batched forward pass of the global network for all
+    envs; every local_t_max steps the (local_t_max * n_envs) rollout is
+    used for one gradient update of the global network with the same loss
+    (prepare_loss), clipping and RMSProp applier as the A3C threads.
+    Rollout buffers are preallocated, the env writes the next states
+    straight into the rollout. Feed-forward networks only.
+    """
+    log_interval = 100
+    performance_log_interval = 1000
+    local_t_max = 20
+    entropy_beta = 0.01
+    gamma = 0.99
+    reward_type = 'CLIP'  # CLIP | LOG | RAW
+    transformed_bellman = False
+    clip_norm = 0.5
+
+    def __init__(self,
+                 global_network,
+                 initial_learning_rate,
+                 learning_rate_input,
+                 grad_applier,
+                 max_global_time_step,
+                 env_id=None,
+                 n_envs=16,
+                 use_subproc=False,
+                 fused_grayscale=False,
+                 ale_skip=False,
+                 start_state_pool=None,
+                 device=None):
+        assert env_id is not None
+        assert not hasattr(global_network, 'lstm'), "A2C does not support LSTM networks"
+
+        self.network = global_network
+        self.initial_learning_rate = initial_learning_rate
+        self.learning_rate_input = learning_rate_input
+        self.max_global_time_step = max_global_time_step
+        self.n_envs = n_envs
+
+        logger.info("n_envs: {}".format(n_envs))
+        logger.info("local_t_max: {}".format(self.local_t_max))
+        logger.info("use_subproc: {}".format(colored(use_subproc, "green" if use_subproc else "red")))
+
+        with tf.device(device):
+            # the evaluator thread may share the network and its loss
+            if not hasattr(self.network, 'total_loss'):
+                self.network.prepare_loss(entropy_beta=self.entropy_beta, critic_lr=0.5)
+            var_list = self.network.get_vars()
+            gradients = tf.gradients(self.network.total_loss, var_list)
+            if self.clip_norm is not None:
+                gradients, _ = tf.clip_by_global_norm(gradients, self.clip_norm)
+            self.apply_gradients = grad_applier.apply_gradients(list(zip(gradients, var_list)))
+
+        if use_subproc:
+            self.envs = SubprocGameStateVec(
+                env_id=env_id, n_envs=n_envs, episode_life=True,
+                fused_grayscale=fused_grayscale, ale_skip=ale_skip)
+        else:
+            self.envs = GameStateVec(
+                env_id=env_id, n_envs=n_envs, episode_life=True,
+                fused_grayscale=fused_grayscale, ale_skip=ale_skip,
+                start_state_pool=start_state_pool)
+        self.action_size = self.envs.action_size
+
+        T = self.local_t_max
+        # states[t] is the input of step t, states[T] the bootstrap state
+        self.states = np.zeros((T + 1, n_envs, 84, 84, 4), dtype=np.uint8)
+        self.actions = np.zeros((T, n_envs), dtype=np.int32)
+        self.rewards = np.zeros((T, n_envs), dtype=np.float32)
+        self.values = np.zeros((T, n_envs), dtype=np.float32)
+        self.terminals = np.zeros((T, n_envs), dtype=np.bool_)
+        self.returns = np.zeros((T, n_envs), dtype=np.float32)
+        self.envs.reset(out=self.states[0])
+
+        self.episode_rewards = np.zeros(n_envs, dtype=np.float64)
+        self.episode_steps = np.zeros(n_envs, dtype=np.int64)
+        self.local_t = 0
+        self.prev_local_t = 0
+
+    def _anneal_learning_rate(self, global_time_step):
+        learning_rate = self.initial_learning_rate * (self.max_global_time_step - global_time_step) / self.max_global_time_step
+        if learning_rate < 0.0:
+            learning_rate = 0.0
+        return learning_rate
+
+    def choose_actions(self, logits):
+        """Gumbel-max sample of one action per row of logits"""
+        noise = np.random.uniform(0, 1, np.shape(logits))
+        return np.argmax(logits - np.log(-np.log(noise)), axis=1)
+
+    def set_summary_writer(self, writer):
+        self.writer = writer
+
+    def record_summary(self, score=0, steps=0, global_t=0, mode='Train'):
+        summary = tf.Summary()
+        summary.value.add(tag='{}/score'.format(mode), simple_value=float(score))
+        summary.value.add(tag='{}/steps'.format(mode), simple_value=float(steps))
+        self.writer.add_summary(summary, global_t)
+        self.writer.flush()
+
+    def set_start_time(self, start_time):
+        self.start_time = start_time
+
+    def process(self, sess, global_t, train_rewards):
+        """One rollout of local_t_max steps on every env and one update.
+        Returns the number of env steps taken.
+        """
+        network = self.network
+        for t in range(self.local_t_max):
+            if self.local_t % self.log_interval == 0:
+                # the full distribution is only fetched for logging
+                pi_, values_, logits_ = sess.run(
+                    [network.pi, network.v0, network.logits],
+                    feed_dict={network.s: self.states[t]})
+                actions = self.choose_actions(logits_)
+                logger.debug("lg={}".format(np.array_str(logits_[0], precision=4, suppress_small=True)))
+                logger.debug("pi={}".format(np.array_str(pi_[0], precision=4, suppress_small=True)))
+                logger.debug("V={:.4f}".format(values_[0]))
+            else:
+                actions, values_ = sess.run(
+                    [network.sampled_action, network.v0],
+                    feed_dict={network.s: self.states[t]})
+            self.actions[t] = actions
+            self.values[t] = values_
+
+            _, rewards, terminals, _, real_dones = self.envs.step(actions, out=self.states[t + 1])
+
+            self.episode_rewards += rewards
+            self.episode_steps += 1
+            if self.reward_type == 'LOG':
+                rewards = np.sign(rewards) * np.log(1 + np.abs(rewards))
+            elif self.reward_type == 'CLIP':
+                rewards = np.sign(rewards)
+            self.rewards[t] = rewards
+            self.terminals[t] = terminals
+
+            self.local_t += 1
+            global_t += self.n_envs
+
+            for i in np.flatnonzero(real_dones):
+                score_str = colored("score={}".format(self.episode_rewards[i]), "magenta")
+                steps_str = colored("steps={}".format(self.episode_steps[i]), "blue")
+                logger.debug("train: env={} global_t={} {} {}".format(i, global_t, score_str, steps_str))
+                train_rewards['train'][global_t] = (self.episode_rewards[i], int(self.episode_steps[i]))
+                self.record_summary(
+                    score=self.episode_rewards[i], steps=self.episode_steps[i],
+                    global_t=global_t, mode='Train')
+                self.episode_rewards[i] = 0
+                self.episode_steps[i] = 0
+
+        last_values = sess.run(network.v0, feed_dict={network.s: self.states[-1]})
+        # no bootstrapping across a terminal (lost life or game over)
+        returns = discounted_returns(
+            self.rewards, self.gamma, last_values, terminals=self.terminals,
+            transformed=self.transformed_bellman, out=self.returns)
+        advantages = returns - self.values
+
+        batch_size = self.local_t_max * self.n_envs
+        cur_learning_rate = self._anneal_learning_rate(global_t)
+        sess.run(self.apply_gradients,
+            feed_dict = {
+                network.s: self.states[:-1].reshape((batch_size, 84, 84, 4)),
+                network.a: self.actions.ravel(),
+                network.advantage: advantages.ravel(),
+                network.cumulative_reward: returns.ravel(),
+                self.learning_rate_input: cur_learning_rate})
+
+        # the bootstrap state starts the next rollout
+        self.states[0] = self.states[-1]
+
+        if self.local_t - self.prev_local_t >= self.performance_log_interval:
+            self.prev_local_t += self.performance_log_interval
+            elapsed_time = time.time() - self.start_time
+            steps_per_sec = global_t / elapsed_time
+            logger.info("Performance : {} STEPS in {:.0f} sec. {:.0f} STEPS/sec. {:.2f}M STEPS/hour".format(
+                global_t,  elapsed_time, steps_per_sec, steps_per_sec * 3600 / 1000000.))
+
+        return batch_size
+
+    def close(self):
+        self.envs.close()
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import threading
+import multiprocessing
 import numpy as np
 import signal
 import math
@@ -8,8 +9,8 @@ import sys
 import time
 import logging
 
-from common.util import load_memory, prepare_dir
-from common.game_state import GameState
+from common.util import load_memory, prepare_dir, ArtifactWriter
+from common.game_state import GameState, StartStatePool
 
 logger = logging.getLogger("a3c")
 
@@ -18,6 +19,38 @@ try:
 except ImportError:
     import pickle
 
+def configure_training_thread(args, action_size):
+    """Set the A3CTrainingThread class parameters from the command line,
+    also called by the worker processes of --use-processes."""
+    from a3c_training_thread import A3CTrainingThread
+    A3CTrainingThread.log_interval = args.log_interval
+    A3CTrainingThread.performance_log_interval = args.performance_log_interval
+    A3CTrainingThread.local_t_max = args.local_t_max
+    A3CTrainingThread.demo_t_max = args.demo_t_max
+    A3CTrainingThread.use_lstm = args.use_lstm
+    A3CTrainingThread.action_size = action_size
+    A3CTrainingThread.entropy_beta = args.entropy_beta
+    A3CTrainingThread.demo_entropy_beta = args.demo_entropy_beta
+    A3CTrainingThread.gamma = args.gamma
+    A3CTrainingThread.use_mnih_2015 = args.use_mnih_2015
+    A3CTrainingThread.env_id = args.gym_env
+    A3CTrainingThread.finetune_upper_layers_only = args.finetune_upper_layers_only
+    A3CTrainingThread.transformed_bellman = args.transformed_bellman
+    A3CTrainingThread.clip_norm = args.grad_norm_clip
+    A3CTrainingThread.use_grad_cam = args.use_grad_cam
+    A3CTrainingThread.fused_grayscale = args.fused_grayscale
+    A3CTrainingThread.ale_skip = args.ale_skip
+    A3CTrainingThread.profile_env_interval = args.profile_env_interval
+    A3CTrainingThread.local_sync_interval = args.local_sync_interval
+    A3CTrainingThread.share_global_network = args.share_global_network
+
+    if args.unclipped_reward:
+        A3CTrainingThread.reward_type = "RAW"
+    elif args.log_scale_reward:
+        A3CTrainingThread.reward_type = "LOG"
+    else:
+        A3CTrainingThread.reward_type = "CLIP"
+
 def run_a3c(args):
     """
     python3 run_experiment.py --gym-env=PongNoFrameskip-v4 --parallel-size=16 --initial-learn-rate=7e-4 --use-lstm --use-mnih-2015
@@ -28,6 +61,12 @@ def run_a3c(args):
     """
     from game_ac_network import GameACFFNetwork, GameACLSTMNetwork
     from a3c_training_thread import A3CTrainingThread
+    from batched_predictor import BatchedPredictor
+    from a2c import A2CTrainer
+    from a3c_multiprocess import WorkerPool, store_from_graph, save_store
+    from step_counter import StepCounter, last_crossed
+    from async_evaluator import AsyncEvaluator
+    from coordination import Coordinator, Phase, CountDown
     if args.use_gpu:
         assert args.cuda_devices != ''
         os.environ['CUDA_VISIBLE_DEVICES'] = args.cuda_devices
@@ -59,6 +98,8 @@ def run_a3c(args):
             end_str += '_logreward'
         if args.transformed_bellman:
             end_str += '_transformedbell'
+        if args.use_a2c:
+            end_str += '_a2c'
 
         if args.use_transfer:
             end_str += '_transfer'
@@ -147,7 +188,7 @@ def run_a3c(args):
     rewards = {'train':{}, 'eval':{}}
     best_model_reward = -(sys.maxsize)
 
-    stop_requested = False
+    coord = Coordinator()
 
     game_state = GameState(env_id=args.gym_env)
     action_size = game_state.env.action_space.n
@@ -198,32 +239,40 @@ def run_a3c(args):
         decay=args.rmsp_alpha,
         epsilon=args.rmsp_epsilon)
 
-    A3CTrainingThread.log_interval = args.log_interval
-    A3CTrainingThread.performance_log_interval = args.performance_log_interval
-    A3CTrainingThread.local_t_max = args.local_t_max
-    A3CTrainingThread.demo_t_max = args.demo_t_max
-    A3CTrainingThread.use_lstm = args.use_lstm
-    A3CTrainingThread.action_size = action_size
-    A3CTrainingThread.entropy_beta = args.entropy_beta
-    A3CTrainingThread.demo_entropy_beta = args.demo_entropy_beta
-    A3CTrainingThread.gamma = args.gamma
-    A3CTrainingThread.use_mnih_2015 = args.use_mnih_2015
-    A3CTrainingThread.env_id = args.gym_env
-    A3CTrainingThread.finetune_upper_layers_only = args.finetune_upper_layers_only
-    A3CTrainingThread.transformed_bellman = args.transformed_bellman
-    A3CTrainingThread.clip_norm = args.grad_norm_clip
-    A3CTrainingThread.use_grad_cam = args.use_grad_cam
-
-    if args.unclipped_reward:
-        A3CTrainingThread.reward_type = "RAW"
-    elif args.log_scale_reward:
-        A3CTrainingThread.reward_type = "LOG"
-    else:
-        A3CTrainingThread.reward_type = "CLIP"
+    configure_training_thread(args, action_size)
+
+    if args.use_a2c:
+        assert not args.use_lstm, "A2C does not support LSTM networks"
+        assert not args.use_demo_threads and not args.load_pretrained_model
+        assert args.train_with_demo_num_steps == 0 and args.train_with_demo_num_epochs == 0
+        assert not args.use_predictor
+        A2CTrainer.log_interval = args.log_interval
+        A2CTrainer.performance_log_interval = args.performance_log_interval
+        A2CTrainer.local_t_max = args.local_t_max
+        A2CTrainer.entropy_beta = args.entropy_beta
+        A2CTrainer.gamma = args.gamma
+        A2CTrainer.reward_type = A3CTrainingThread.reward_type
+        A2CTrainer.transformed_bellman = args.transformed_bellman
+        A2CTrainer.clip_norm = args.grad_norm_clip
+
+    if args.use_processes:
+        assert not args.use_a2c
+        assert not args.use_demo_threads and not args.load_pretrained_model
+        assert args.train_with_demo_num_steps == 0 and args.train_with_demo_num_epochs == 0
+        assert not args.use_predictor
+
+    start_state_pool = None
+    if args.start_state_pool_size > 0:
+        start_state_pool = StartStatePool(
+            env_id=args.gym_env, size=args.start_state_pool_size,
+            refresh_interval=args.start_state_refresh,
+            fused_grayscale=args.fused_grayscale, ale_skip=args.ale_skip)
 
     n_shapers = args.parallel_size #int(args.parallel_size * .25)
     mod = args.parallel_size // n_shapers
-    for i in range(args.parallel_size):
+    # with A2C or worker processes the only thread is the evaluator
+    n_threads = 1 if args.use_a2c or args.use_processes else args.parallel_size
+    for i in range(n_threads):
         is_reward_shape = False
         is_advice = False
         if i % mod == 0:
@@ -237,9 +286,48 @@ def run_a3c(args):
             pretrained_model=pretrained_model,
             pretrained_model_sess=pretrained_model_sess,
             advice=is_advice,
-            reward_shaping=is_reward_shape)
+            reward_shaping=is_reward_shape,
+            start_state_pool=start_state_pool)
         training_threads.append(training_thread)
 
+    a2c_trainer = None
+    if args.use_a2c:
+        a2c_trainer = A2CTrainer(
+            global_network, initial_learning_rate,
+            learning_rate_input,
+            grad_applier, args.max_time_step,
+            env_id=args.gym_env,
+            n_envs=args.parallel_size,
+            use_subproc=args.a2c_subproc,
+            fused_grayscale=args.fused_grayscale,
+            ale_skip=args.ale_skip,
+            start_state_pool=start_state_pool,
+            device=device)
+
+    # evaluator of weight snapshots in its own graph, session and env
+    eval_graph = None
+    if args.async_eval:
+        eval_graph = tf.Graph()
+        with eval_graph.as_default():
+            if args.use_lstm:
+                eval_network = GameACLSTMNetwork(action_size, -1, device)
+            else:
+                eval_network = GameACFFNetwork(action_size, -1, device)
+            eval_learning_rate_input = tf.placeholder(tf.float32, shape=(), name="opt_lr")
+            eval_grad_applier = tf.train.RMSPropOptimizer(
+                learning_rate=eval_learning_rate_input,
+                decay=args.rmsp_alpha,
+                epsilon=args.rmsp_epsilon)
+            eval_thread = A3CTrainingThread(
+                args.parallel_size, eval_network, initial_learning_rate,
+                eval_learning_rate_input,
+                eval_grad_applier, args.max_time_step,
+                device=device,
+                pretrained_model=pretrained_model,
+                pretrained_model_sess=pretrained_model_sess,
+                advice=args.use_pretrained_model_as_advice)
+            eval_init = tf.global_variables_initializer()
+
     # prepare session
     sess = tf.Session(config=config)
 
@@ -320,10 +408,37 @@ def run_a3c(args):
     summary_op = tf.summary.merge_all()
     summary_writer = tf.summary.FileWriter('results/log/a3c/{}/'.format(args.gym_env.replace('-', '_')) + folder[12:], sess.graph)
 
+    predictor = None
+    if args.use_predictor:
+        assert not args.use_lstm
+        predictor = BatchedPredictor(sess, global_network, batch_size=args.predictor_batch_size)
+
+    artifact_writer = None
+    if args.artifact_writer != 'none':
+        artifact_writer = ArtifactWriter(
+            max_queue_size=args.artifact_queue_size,
+            use_process=args.artifact_writer == 'process')
+
     # init or load checkpoint with saver
     root_saver = tf.train.Saver(max_to_keep=1)
     saver = tf.train.Saver(max_to_keep=6)
     best_saver = tf.train.Saver(max_to_keep=1)
+    if args.async_eval:
+        # best models of snapshots are saved in the layout of best_saver, with
+        # the global network taken from copies outside of the trained variables
+        snapshot_vars = {}
+        snapshot_inputs = []
+        snapshot_assigns = []
+        for v in global_network.get_vars():
+            snapshot_input = tf.placeholder(v.dtype.base_dtype, v.get_shape())
+            snapshot_var = tf.Variable(snapshot_input, trainable=False, collections=[])
+            snapshot_vars[v.op.name] = snapshot_var
+            snapshot_inputs.append(snapshot_input)
+            snapshot_assigns.append(snapshot_var.initializer)
+        snapshot_load = tf.group(*snapshot_assigns)
+        snapshot_saver = tf.train.Saver(
+            {v.op.name: snapshot_vars.get(v.op.name, v) for v in tf.global_variables()},
+            max_to_keep=1)
     checkpoint = tf.train.get_checkpoint_state(folder)
     if checkpoint and checkpoint.model_checkpoint_path:
         root_saver.restore(sess, checkpoint.model_checkpoint_path)
@@ -350,37 +465,56 @@ def run_a3c(args):
         prepare_dir(folder + '/model_best', empty=True)
         prepare_dir(folder + '/frames', empty=True)
 
+    # weights and RMSProp state shared with the worker processes
+    store = None
+    if args.use_processes:
+        store = store_from_graph(
+            sess, global_network, grad_applier,
+            multiprocessing.get_context('spawn'),
+            use_lock=args.shared_params_lock)
+        store.global_t = global_t
+
+    # global_t of all workers, add() reports each eval/checkpoint boundary once
+    max_global_t = args.max_time_step * args.max_time_step_fraction
+    save_freq = int(max_global_t // 5)
+    if store is not None:
+        step_counter = store.step_counter
+    else:
+        step_counter = StepCounter(global_t)
+    step_counter.intervals = {'eval': args.eval_freq, 'save': save_freq}
+
     lock = threading.Lock()
-    test_lock = False
-    if global_t == 0:
-        test_lock = True
+    # threads wait out the first evaluation and then every evaluation
+    initial_eval = Phase(coord, active=(global_t == 0))
+    eval_phase = Phase(coord)
 
-    last_temp_global_t = global_t
-    ispretrain_markers = [False] * args.parallel_size
+    use_pretrain = global_t == 0 and (args.train_with_demo_num_steps > 0 or args.train_with_demo_num_epochs > 0)
+    pretrain_done = CountDown(coord, min(2, args.parallel_size) if use_pretrain else 0)
     num_demo_thread = 0
     ctr_demo_thread = 0
     def train_function(parallel_index):
-        nonlocal global_t, pretrain_global_t, pretrain_epoch, \
-            rewards, test_lock, lock, \
-            last_temp_global_t, ispretrain_markers, num_demo_thread, \
-            ctr_demo_thread
+        nonlocal pretrain_global_t, pretrain_epoch, \
+            num_demo_thread, ctr_demo_thread
         training_thread = training_threads[parallel_index]
+        global_t = step_counter.value
 
         training_thread.set_summary_writer(summary_writer)
+        training_thread.set_artifact_writer(artifact_writer)
+        if predictor is not None:
+            training_thread.set_predictor(predictor)
 
         # set all threads as demo threads
         training_thread.is_demo_thread = args.load_memory and args.use_demo_threads
         if training_thread.is_demo_thread or args.train_with_demo_num_steps > 0 or args.train_with_demo_num_epochs:
             training_thread.pretrain_init(demo_memory)
 
-        if global_t == 0 and (args.train_with_demo_num_steps > 0 or args.train_with_demo_num_epochs > 0) and parallel_index < 2:
-            ispretrain_markers[parallel_index] = True
+        if use_pretrain and parallel_index < 2:
             training_thread.replay_mem_reset()
 
             # Pretraining with demo memory
             logger.info("t_idx={} pretrain starting".format(parallel_index))
-            while ispretrain_markers[parallel_index]:
-                if stop_requested:
+            while True:
+                if coord.stop_requested:
                     return
                 if pretrain_global_t > args.train_with_demo_num_steps and pretrain_epoch > args.train_with_demo_num_epochs:
                     # At end of pretraining, reset state
@@ -389,7 +523,7 @@ def run_a3c(args):
                     training_thread.local_t = 0
                     if args.use_lstm:
                         training_thread.local_network.reset_state()
-                    ispretrain_markers[parallel_index] = False
+                    pretrain_done.count_down()
                     logger.info("t_idx={} pretrain ended".format(parallel_index))
                     break
 
@@ -405,22 +539,19 @@ def run_a3c(args):
                     logger.debug("pretrain_epoch={}".format(pretrain_epoch))
 
             # Waits for all threads to finish pretraining
-            while not stop_requested and any(ispretrain_markers):
-                time.sleep(0.01)
+            pretrain_done.wait()
 
         # Evaluate model before training
-        if not stop_requested and global_t == 0:
-            with lock:
-                if parallel_index == 0:
-                    test_reward, test_steps, test_episodes = training_threads[0].testing(
-                        sess, args.eval_max_steps, global_t, folder, demo_memory_cam=demo_memory_cam)
-                    rewards['eval'][global_t] = (test_reward, test_steps, test_episodes)
-                    saver.save(sess, folder + '/model_checkpoints/' + '{}_checkpoint'.format(args.gym_env.replace('-', '_')), global_step=global_t)
-                    save_best_model(test_reward)
-                    test_lock = False
+        if not coord.stop_requested and global_t == 0:
+            if parallel_index == 0:
+                test_reward, test_steps, test_episodes = training_threads[0].testing(
+                    sess, args.eval_max_steps, global_t, folder, demo_memory_cam=demo_memory_cam)
+                rewards['eval'][global_t] = (test_reward, test_steps, test_episodes)
+                saver.save(sess, folder + '/model_checkpoints/' + '{}_checkpoint'.format(args.gym_env.replace('-', '_')), global_step=global_t)
+                save_best_model(test_reward)
+                initial_eval.end()
             # all threads wait until evaluation finishes
-            while not stop_requested and test_lock:
-                time.sleep(0.01)
+            initial_eval.wait()
 
         # set start_time
         start_time = time.time() - wall_t
@@ -428,9 +559,10 @@ def run_a3c(args):
         episode_end = True
         use_demo_thread = False
         while True:
-            if stop_requested:
+            if coord.stop_requested:
                 return
-            if global_t >= (args.max_time_step * args.max_time_step_fraction):
+            global_t = step_counter.value
+            if global_t >= max_global_t:
                 return
 
             if args.use_demo_threads and global_t < args.max_steps_threads_as_demo and episode_end and num_demo_thread < 16:
@@ -457,57 +589,163 @@ def run_a3c(args):
                 diff_global_t, episode_end = training_thread.process(
                     sess, global_t, rewards)
 
-            for _ in range(diff_global_t):
-                global_t += 1
-                if global_t % args.eval_freq == 0:
-                    temp_global_t = global_t
-                    lock.acquire()
-                    try:
-                        # catch multiple threads getting in at the same time
-                        if last_temp_global_t == temp_global_t:
-                            logger.info("Threading race problem averted!")
-                            continue
-                        test_lock = True
-                        test_reward, test_steps, n_episodes = training_thread.testing(
-                            sess, args.eval_max_steps, temp_global_t, folder, demo_memory_cam=demo_memory_cam)
-                        rewards['eval'][temp_global_t] = (test_reward, test_steps, n_episodes)
-                        if temp_global_t % ((args.max_time_step * args.max_time_step_fraction) // 5) == 0:
-                            saver.save(
-                                sess, folder + '/model_checkpoints/' + '{}_checkpoint'.format(args.gym_env.replace('-', '_')),
-                                global_step=temp_global_t, write_meta_graph=False)
-                        if test_reward > best_model_reward:
-                            save_best_model(test_reward)
-                        test_lock = False
-                        last_temp_global_t = temp_global_t
-                    finally:
-                        lock.release()
-                if global_t % ((args.max_time_step * args.max_time_step_fraction) // 5) == 0:
+            global_t, crossed = step_counter.add(diff_global_t)
+            if 'eval' in crossed and async_evaluator is not None:
+                async_evaluator.evaluator.psi = training_thread.psi
+                async_evaluator.submit(crossed['eval'], sess.run(global_network.get_vars()))
+            elif 'eval' in crossed:
+                eval_global_t = crossed['eval']
+                with eval_phase, lock:
+                    test_reward, test_steps, n_episodes = training_thread.testing(
+                        sess, args.eval_max_steps, eval_global_t, folder, demo_memory_cam=demo_memory_cam)
+                    rewards['eval'][eval_global_t] = (test_reward, test_steps, n_episodes)
+                    if test_reward > best_model_reward:
+                        save_best_model(test_reward)
+            if 'save' in crossed:
+                saver.save(
+                    sess, folder + '/model_checkpoints/' + '{}_checkpoint'.format(args.gym_env.replace('-', '_')),
+                    global_step=crossed['save'], write_meta_graph=False)
+            # all threads wait until evaluation finishes
+            eval_phase.wait()
+
+    def train_a2c_function():
+        nonlocal rewards
+        evaluator = training_threads[0]
+        evaluator.set_summary_writer(summary_writer)
+        evaluator.set_artifact_writer(artifact_writer)
+        a2c_trainer.set_summary_writer(summary_writer)
+        global_t = step_counter.value
+
+        def evaluate(eval_global_t):
+            test_reward, test_steps, n_episodes = evaluator.testing(
+                sess, args.eval_max_steps, eval_global_t, folder, demo_memory_cam=demo_memory_cam)
+            rewards['eval'][eval_global_t] = (test_reward, test_steps, n_episodes)
+            return test_reward
+
+        # Evaluate model before training
+        if not coord.stop_requested and global_t == 0:
+            test_reward = evaluate(global_t)
+            saver.save(sess, folder + '/model_checkpoints/' + '{}_checkpoint'.format(args.gym_env.replace('-', '_')), global_step=global_t)
+            save_best_model(test_reward)
+
+        a2c_trainer.set_start_time(time.time() - wall_t)
+        while not coord.stop_requested and global_t < max_global_t:
+            # a rollout advances global_t by local_t_max * n_envs steps
+            global_t, crossed = step_counter.add(a2c_trainer.process(sess, global_t, rewards))
+            # evaluate and save at the boundaries the rollout crossed
+            if 'eval' in crossed and async_evaluator is not None:
+                async_evaluator.submit(crossed['eval'], sess.run(global_network.get_vars()))
+            elif 'eval' in crossed:
+                test_reward = evaluate(crossed['eval'])
+                if test_reward > best_model_reward:
+                    save_best_model(test_reward)
+            if 'save' in crossed:
+                saver.save(
+                    sess, folder + '/model_checkpoints/' + '{}_checkpoint'.format(args.gym_env.replace('-', '_')),
+                    global_step=crossed['save'], write_meta_graph=False)
+
+    def train_processes_function():
+        nonlocal rewards
+        evaluator = training_threads[0]
+        evaluator.set_summary_writer(summary_writer)
+        evaluator.set_artifact_writer(artifact_writer)
+        global_t = step_counter.value
+
+        def evaluate(eval_global_t):
+            save_store(sess, store, global_network, grad_applier)
+            test_reward, test_steps, n_episodes = evaluator.testing(
+                sess, args.eval_max_steps, eval_global_t, folder, demo_memory_cam=demo_memory_cam)
+            rewards['eval'][eval_global_t] = (test_reward, test_steps, n_episodes)
+            return test_reward
+
+        def handle(messages):
+            for kind, key, value in messages:
+                if kind == 'summary':
+                    summary_writer.add_summary(key, value)
+                elif kind == 'train':
+                    rewards['train'][key] = value
+
+        # Evaluate model before training
+        if not coord.stop_requested and global_t == 0:
+            test_reward = evaluate(global_t)
+            saver.save(sess, folder + '/model_checkpoints/' + '{}_checkpoint'.format(args.gym_env.replace('-', '_')), global_step=global_t)
+            save_best_model(test_reward)
+
+        workers = WorkerPool(
+            args, action_size, store, multiprocessing.get_context('spawn'),
+            start_time=time.time() - wall_t)
+        workers.start()
+        try:
+            while not coord.stop_requested and global_t < max_global_t and workers.alive():
+                handle(workers.poll())
+                prev_global_t = global_t
+                global_t = step_counter.value
+
+                # evaluate and save at the boundaries crossed since the last poll,
+                # workers are paused at their next rollout while reading the store
+                eval_global_t = last_crossed(prev_global_t, global_t, args.eval_freq)
+                save_global_t = last_crossed(prev_global_t, global_t, save_freq)
+                if eval_global_t is None and save_global_t is None:
+                    continue
+                workers.pause()
+                if eval_global_t is not None and async_evaluator is not None:
+                    async_evaluator.submit(eval_global_t, [store.get(v.name) for v in global_network.get_vars()])
+                elif eval_global_t is not None:
+                    test_reward = evaluate(eval_global_t)
+                    if test_reward > best_model_reward:
+                        save_best_model(test_reward)
+                if save_global_t is not None:
+                    save_store(sess, store, global_network, grad_applier)
                     saver.save(
                         sess, folder + '/model_checkpoints/' + '{}_checkpoint'.format(args.gym_env.replace('-', '_')),
-                        global_step=global_t, write_meta_graph=False)
-                # all threads wait until evaluation finishes
-                while not stop_requested and test_lock:
-                    time.sleep(0.01)
-
+                        global_step=save_global_t, write_meta_graph=False)
+                workers.resume()
+        finally:
+            handle(workers.stop())
+            save_store(sess, store, global_network, grad_applier)
 
     def signal_handler(signal, frame):
-        nonlocal stop_requested
         logger.info('You pressed Ctrl+C!')
-        stop_requested = True
+        coord.request_stop()
 
-        if stop_requested and global_t == 0:
+        if step_counter.value == 0:
             sys.exit(1)
 
-    def save_best_model(test_reward):
+    def save_best_model(test_reward, model_saver=None):
         nonlocal best_model_reward
         best_model_reward = test_reward
         with open(folder + '/model_best/best_model_reward', 'w') as f_best_model_reward:
             f_best_model_reward.write(str(best_model_reward))
-        best_saver.save(sess, folder + '/model_best/' + '{}_checkpoint'.format(args.gym_env.replace('-', '_')))
+        if model_saver is None:
+            model_saver = best_saver
+        model_saver.save(sess, folder + '/model_best/' + '{}_checkpoint'.format(args.gym_env.replace('-', '_')))
+
+    def record_eval_result(eval_global_t, result):
+        # called by the async evaluator thread, the snapshot is in eval_sess
+        rewards['eval'][eval_global_t] = result
+        if result[0] > best_model_reward:
+            snapshot = eval_sess.run(eval_network.get_vars())
+            sess.run(snapshot_load, feed_dict=dict(zip(snapshot_inputs, snapshot)))
+            save_best_model(result[0], model_saver=snapshot_saver)
+
+    async_evaluator = None
+    if args.async_eval:
+        eval_sess = tf.Session(config=config, graph=eval_graph)
+        eval_sess.run(eval_init)
+        eval_thread.set_summary_writer(summary_writer)
+        eval_thread.set_artifact_writer(artifact_writer)
+        async_evaluator = AsyncEvaluator(
+            eval_thread, eval_sess, eval_network, args.eval_max_steps, folder,
+            on_result=record_eval_result, demo_memory_cam=demo_memory_cam)
 
     train_threads = []
-    for i in range(args.parallel_size):
-        train_threads.append(threading.Thread(target=train_function, args=(i,)))
+    if args.use_a2c:
+        train_threads.append(threading.Thread(target=train_a2c_function))
+    elif args.use_processes:
+        train_threads.append(threading.Thread(target=train_processes_function))
+    else:
+        for i in range(args.parallel_size):
+            train_threads.append(threading.Thread(target=train_function, args=(i,)))
 
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
@@ -515,6 +753,11 @@ def run_a3c(args):
     # set start time
     start_time = time.time() - wall_t
 
+    if predictor is not None:
+        predictor.start()
+    if async_evaluator is not None:
+        async_evaluator.start()
+
     for t in train_threads:
         t.start()
 
@@ -523,7 +766,21 @@ def run_a3c(args):
     for t in train_threads:
         t.join()
 
+    if predictor is not None:
+        predictor.stop()
+    if async_evaluator is not None:
+        # results of evaluations still running go into the rewards file
+        async_evaluator.stop(wait_pending=not coord.stop_requested)
+        eval_sess.close()
+    if a2c_trainer is not None:
+        a2c_trainer.close()
+    if artifact_writer is not None:
+        artifact_writer.close()
+    if start_state_pool is not None:
+        start_state_pool.close()
+
     logger.info('Now saving data. Please wait')
+    global_t = step_counter.value
 
     # write wall time
     wall_t = time.time() - start_time
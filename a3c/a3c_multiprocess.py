@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+import multiprocessing
+import numpy as np
+import signal
+import queue
+import os
+import time
+import logging
+
+from coordination import Coordinator, Phase
+from shared_parameters import SharedParameterStore
+
+logger = logging.getLogger("a3c_multiprocess")
+
+class SharedRMSPropApplier(object):
+    """Grad applier whose apply_gradients() op pushes the gradients to a
+    SharedParameterStore, which applies RMSProp to the shared weights.
+
+    Drop-in for tf.train.RMSPropOptimizer in A3CTrainingThread, the
+    variables only name the store slots.
+    """
+    def __init__(self, store, learning_rate):
+        self.store = store
+        self.learning_rate = learning_rate
+
+    def apply_gradients(self, grads_and_vars):
+        import tensorflow as tf
+        grads, var_list = zip(*grads_and_vars)
+        names = [v.name for v in var_list]
+
+        def push(learning_rate, *grads):
+            self.store.apply_gradients(names, grads, learning_rate)
+            return np.int64(self.store.version)
+
+        version = tf.py_func(
+            push, [self.learning_rate] + list(grads), tf.int64,
+            stateful=True, name="push_gradients")
+        return tf.group(version)
+
+def sync_from_store(store, network, store_names, upper_layers_only=False):
+    """Op copying the store weights into the variables of network,
+    store_names are the store slots in network.get_vars() order."""
+    import tensorflow as tf
+    dst_vars = network.get_vars()
+    if upper_layers_only:
+        upper = set(network.get_vars_upper())
+        pairs = [(n, v) for n, v in zip(store_names, dst_vars) if v in upper]
+    else:
+        pairs = list(zip(store_names, dst_vars))
+    names = [n for n, _ in pairs]
+
+    def pull():
+        return [store.get(n) for n in names]
+
+    values = tf.py_func(pull, [], [tf.float32] * len(pairs), stateful=True, name="pull_weights")
+    sync_ops = []
+    for value, (_, dst_var) in zip(values, pairs):
+        value.set_shape(dst_var.get_shape())
+        sync_ops.append(tf.assign(dst_var, value))
+    return tf.group(*sync_ops)
+
+def store_from_graph(sess, network, grad_applier, ctx, use_lock=False):
+    """SharedParameterStore initialized from the global network weights and
+    the RMSProp slots of grad_applier (created by the evaluator thread)."""
+    var_list = network.get_vars()
+    store = SharedParameterStore(
+        [(v.name, v.get_shape().as_list()) for v in var_list],
+        decay=grad_applier._decay, epsilon=grad_applier._epsilon,
+        use_lock=use_lock, ctx=ctx)
+    load_store(sess, store, network, grad_applier)
+    return store
+
+def load_store(sess, store, network, grad_applier):
+    """Copy the global network weights and RMSProp ms into the store"""
+    var_list = network.get_vars()
+    slots = [grad_applier.get_slot(v, 'rms') for v in var_list]
+    values = sess.run(var_list)
+    ms_values = sess.run([s for s in slots if s is not None])
+    ms_values.reverse()
+    for v, value, slot in zip(var_list, values, slots):
+        store.set(v.name, value, ms=ms_values.pop() if slot is not None else None)
+
+def save_store(sess, store, network, grad_applier):
+    """Copy the store weights and RMSProp ms into the global network, to
+    evaluate it or write checkpoints."""
+    for v in network.get_vars():
+        v.load(store.get(v.name), sess)
+        slot = grad_applier.get_slot(v, 'rms')
+        if slot is not None:
+            slot.load(store.get_ms(v.name), sess)
+
+class QueueSummaryWriter(object):
+    """Forwards summaries of a worker process to the main process, which
+    owns the FileWriter."""
+    def __init__(self, queue):
+        self.queue = queue
+
+    def add_summary(self, summary, global_step=None):
+        self.queue.put(('summary', summary.SerializeToString(), global_step))
+
+    def flush(self):
+        pass
+
+def run_worker(index, args, action_size, store, msg_queue, coord, eval_phase, start_time):
+    """Entry point of an A3C worker process.
+
+    Builds a private graph and session holding a template global network
+    and the worker's A3CTrainingThread. sync pulls the weights from the
+    store, apply_gradients pushes the (clipped) gradients to it. global_t
+    is the store counter, episode scores and summaries go to msg_queue.
+    """
+    # the main process handles Ctrl+C and requests the stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    os.environ['CUDA_VISIBLE_DEVICES'] = ''
+    import tensorflow as tf
+    from game_ac_network import GameACFFNetwork, GameACLSTMNetwork
+    from a3c_training_thread import A3CTrainingThread
+    from a3c import configure_training_thread
+
+    configure_training_thread(args, action_size)
+    device = "/cpu:0"
+    if args.use_lstm:
+        GameACLSTMNetwork.use_mnih_2015 = args.use_mnih_2015
+        global_network = GameACLSTMNetwork(action_size, -1, device)
+    else:
+        GameACFFNetwork.use_mnih_2015 = args.use_mnih_2015
+        global_network = GameACFFNetwork(action_size, -1, device)
+
+    learning_rate_input = tf.placeholder(tf.float32, shape=(), name="opt_lr")
+    grad_applier = SharedRMSPropApplier(store, learning_rate_input)
+    training_thread = A3CTrainingThread(
+        index, global_network, args.initial_learn_rate,
+        learning_rate_input,
+        grad_applier, args.max_time_step,
+        device=device)
+    training_thread.sync = sync_from_store(
+        store, training_thread.local_network,
+        [v.name for v in global_network.get_vars()],
+        upper_layers_only=args.finetune_upper_layers_only)
+    training_thread.set_version_source(lambda: store.version)
+
+    # one TF thread per worker, the workers are the parallelism
+    config = tf.ConfigProto(
+        intra_op_parallelism_threads=1,
+        inter_op_parallelism_threads=1,
+        allow_soft_placement=True)
+    sess = tf.Session(config=config)
+    sess.run(tf.global_variables_initializer())
+
+    training_thread.set_summary_writer(QueueSummaryWriter(msg_queue))
+    training_thread.set_start_time(start_time)
+
+    max_global_t = args.max_time_step * args.max_time_step_fraction
+    global_t = store.global_t
+    try:
+        while not coord.stop_requested and global_t < max_global_t:
+            # paused while the main process evaluates
+            if not eval_phase.wait():
+                break
+            train_rewards = {'train': {}}
+            diff_global_t, _ = training_thread.process(sess, global_t, train_rewards)
+            global_t = store.add_steps(diff_global_t)
+            for t, reward in train_rewards['train'].items():
+                msg_queue.put(('train', t, reward))
+    finally:
+        training_thread.game_state.close()
+        sess.close()
+        msg_queue.put(('done', index, None))
+
+class WorkerPool(object):
+    """The A3C worker processes of run_a3c (--use-processes)."""
+    def __init__(self, args, action_size, store, ctx, start_time):
+        self.ctx = ctx
+        self.msg_queue = ctx.Queue()
+        self.coord = Coordinator(ctx)
+        self.eval_phase = Phase(self.coord)
+        self.processes = []
+        for i in range(args.parallel_size):
+            p = ctx.Process(
+                target=run_worker,
+                args=(i, args, action_size, store, self.msg_queue,
+                      self.coord, self.eval_phase, start_time))
+            p.daemon = True
+            self.processes.append(p)
+        self.n_done = 0
+
+    def start(self):
+        for p in self.processes:
+            p.start()
+        logger.info("started {} worker processes".format(len(self.processes)))
+
+    def pause(self):
+        """Pause the workers at their next rollout. Returns once every
+        running worker waits, so none pushes to the store any more."""
+        self.eval_phase.begin()
+        while True:
+            n_running = sum(1 for p in self.processes if p.is_alive())
+            if self.eval_phase.wait_waiters(n_running, timeout=0.1) or self.coord.stop_requested:
+                break
+
+    def resume(self):
+        self.eval_phase.end()
+
+    def alive(self):
+        return self.n_done < len(self.processes) and any(p.is_alive() for p in self.processes)
+
+    def poll(self, timeout=0.1):
+        """Messages of the workers received within timeout seconds"""
+        messages = []
+        try:
+            messages.append(self.msg_queue.get(timeout=timeout))
+            while True:
+                messages.append(self.msg_queue.get_nowait())
+        except queue.Empty:
+            pass
+        self.n_done += sum(1 for m in messages if m[0] == 'done')
+        return messages
+
+    def stop(self):
+        """Stop the workers, returns their last messages"""
+        self.coord.request_stop()
+        messages = []
+        deadline = time.time() + 60
+        while self.alive() and time.time() < deadline:
+            messages += self.poll()
+        for p in self.processes:
+            p.join(timeout=1)
+            if p.is_alive():
+                logger.warning("terminating worker pid={}".format(p.pid))
+                p.terminate()
+        return messages
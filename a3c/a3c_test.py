@@ -9,7 +9,7 @@ import time
 import logging
 
 from common.replay_memory import ReplayMemory
-from common.util import load_memory, prepare_dir
+from common.util import load_memory, prepare_dir, ArtifactWriter
 from common.game_state import GameState
 
 logger = logging.getLogger("a3c")
@@ -170,6 +170,9 @@ def run_a3c_test(args):
     A3CTrainingThread.transformed_bellman = args.transformed_bellman
     A3CTrainingThread.clip_norm = args.grad_norm_clip
     A3CTrainingThread.use_grad_cam = args.use_grad_cam
+    A3CTrainingThread.fused_grayscale = args.fused_grayscale
+    A3CTrainingThread.ale_skip = args.ale_skip
+    A3CTrainingThread.profile_env_interval = args.profile_env_interval
 
     if args.unclipped_reward:
         A3CTrainingThread.reward_type = "RAW"
@@ -184,6 +187,13 @@ def run_a3c_test(args):
         grad_applier, 0,
         device=device)
 
+    artifact_writer = None
+    if args.artifact_writer != 'none':
+        artifact_writer = ArtifactWriter(
+            max_queue_size=args.artifact_queue_size,
+            use_process=args.artifact_writer == 'process')
+    testing_thread.set_artifact_writer(artifact_writer)
+
     # prepare session
     sess = tf.Session(config=config)
 
@@ -310,4 +320,7 @@ def run_a3c_test(args):
 
     test_thread.join()
 
+    if artifact_writer is not None:
+        artifact_writer.close()
+
     sess.close()
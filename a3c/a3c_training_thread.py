@@ -6,8 +6,9 @@ import logging
 
 from termcolor import colored
 from game_ac_network import GameACFFNetwork, GameACLSTMNetwork
-from common.game_state import GameState, get_wrapper_by_name
-from common.util import make_movie, grad_cam, visualize_cam, generate_image_for_cam_video
+from common.game_state import GameState
+from common.util import VideoRecorder, grad_cam, write_cam_video
+from common.util import discounted_returns, look_back_shaping
 from common.replay_memory import ReplayMemory
 
 logger = logging.getLogger("a3c_training_thread")
@@ -35,6 +36,13 @@ class A3CTrainingThread(object):
     transformed_bellman = False
     clip_norm = 0.5
     use_grad_cam = False
+    fused_grayscale = False
+    ale_skip = False
+    profile_env_interval = 0
+    local_sync_interval = 1  # rollouts per sync, 0 syncs when the global version moved
+    share_global_network = False
+    # gradient updates applied by all threads, the default global version
+    global_updates = 0
 
     def __init__(self,
                  thread_index,
@@ -47,7 +55,8 @@ class A3CTrainingThread(object):
                  pretrained_model=None,
                  pretrained_model_sess=None,
                  advice=False,
-                 reward_shaping=False):
+                 reward_shaping=False,
+                 start_state_pool=None):
         assert self.action_size != -1
 
         self.thread_index = thread_index
@@ -76,7 +85,11 @@ class A3CTrainingThread(object):
         logger.info("use_grad_cam: {}".format(
             colored(self.use_grad_cam, "green" if self.use_grad_cam else "red")))
 
-        if self.use_lstm:
+        if self.share_global_network:
+            # forward passes and gradients directly on the global variables
+            assert not self.use_lstm, "LSTM states are per thread, use a local network"
+            self.local_network = global_network
+        elif self.use_lstm:
             GameACLSTMNetwork.use_mnih_2015 = self.use_mnih_2015
             self.local_network = GameACLSTMNetwork(self.action_size, thread_index, device)
         else:
@@ -84,7 +97,9 @@ class A3CTrainingThread(object):
             self.local_network = GameACFFNetwork(self.action_size, thread_index, device)
 
         with tf.device(device):
-            self.local_network.prepare_loss(entropy_beta=self.entropy_beta, critic_lr=0.5)
+            # a shared network gets its loss from the first thread
+            if not hasattr(self.local_network, 'total_loss'):
+                self.local_network.prepare_loss(entropy_beta=self.entropy_beta, critic_lr=0.5)
             local_vars = self.local_network.get_vars
             if self.finetune_upper_layers_only:
                 local_vars = self.local_network.get_vars_upper
@@ -106,12 +121,36 @@ class A3CTrainingThread(object):
             #    global_vars(),
             #    self.gradients)
 
-        self.sync = self.local_network.sync_from(
-            global_network, upper_layers_only=self.finetune_upper_layers_only)
-
+        if self.share_global_network:
+            self.sync = None
+        else:
+            self.sync = self.local_network.sync_from(
+                global_network, upper_layers_only=self.finetune_upper_layers_only)
+        self.synced = False
+        self.synced_version = None
+        self.rollouts_since_sync = 0
+        self.version_source = None
+
+        # full states are only cloned when testing_model stores them
         self.game_state = GameState(
             env_id=self.env_id, display=False,
-            no_op_max=30, human_demo=False, episode_life=True)
+            no_op_max=30, human_demo=False, episode_life=True,
+            full_state_mode='demand', fused_grayscale=self.fused_grayscale,
+            ale_skip=self.ale_skip, start_state_pool=start_state_pool,
+            profile_interval=self.profile_env_interval if thread_index == 0 else 0)
+
+        # rollout buffers, filled in place and fed as slices
+        t_max = max(self.local_t_max, self.demo_t_max)
+        self.rollout_states = np.zeros((self.local_t_max, 84, 84, 4), dtype=np.uint8)
+        self.rollout_actions = np.zeros(t_max, dtype=np.int32)
+        self.rollout_rewards = np.zeros(t_max, dtype=np.float32)
+        self.rollout_values = np.zeros(t_max, dtype=np.float32)
+        self.rollout_rho = np.zeros(self.local_t_max, dtype=np.float32)
+        self.rollout_shaping = np.zeros(self.local_t_max, dtype=np.float32)
+        self.rollout_returns = np.zeros(t_max, dtype=np.float32)
+        self.rollout_advantages = np.zeros(t_max, dtype=np.float32)
+        # demo states are normalized floats, allocated by pretrain_init
+        self.demo_states = None
 
         self.local_t = 0
 
@@ -125,10 +164,16 @@ class A3CTrainingThread(object):
 
         self.is_demo_thread = False
 
+        # evaluation videos and memory dumps are written inline unless set
+        self.artifact_writer = None
+        # training forward passes go through the local network unless set
+        self.predictor = None
+
         with tf.device(device):
             if self.use_grad_cam:
                 self.action_meaning = self.game_state.env.unwrapped.get_action_meanings()
-                self.local_network.build_grad_cam_grads()
+                if not hasattr(self.local_network, 'grad_cam_grads'):
+                    self.local_network.build_grad_cam_grads()
 
         self.pretrained_model = pretrained_model
         self.pretrained_model_sess = pretrained_model_sess
@@ -175,53 +220,84 @@ class A3CTrainingThread(object):
     def set_start_time(self, start_time):
         self.start_time = start_time
 
-    def generate_cam(self, sess, test_cam_si, global_t):
-        cam_side_img = []
+    def set_artifact_writer(self, artifact_writer):
+        self.artifact_writer = artifact_writer
+
+    def set_predictor(self, predictor):
+        assert not self.use_lstm
+        self.predictor = predictor
+
+    def set_version_source(self, version_source):
+        """version_source() returns the global version checked by
+        local_sync_interval=0, global_updates by default"""
+        self.version_source = version_source
+
+    def global_version(self):
+        if self.version_source is not None:
+            return self.version_source()
+        return A3CTrainingThread.global_updates
+
+    def sync_local_network(self, sess, force=False):
+        """Copy the global weights into the local network every
+        local_sync_interval rollouts, or if local_sync_interval is 0 when
+        the global version moved since the last copy. Nothing to copy
+        when the global network is shared."""
+        if self.sync is None:
+            return
+        version = self.global_version()
+        self.rollouts_since_sync += 1
+        if self.synced and not force:
+            if self.local_sync_interval > 0 and self.rollouts_since_sync < self.local_sync_interval:
+                return
+            if self.local_sync_interval == 0 and version == self.synced_version:
+                return
+        sess.run(self.sync)
+        self.synced = True
+        self.synced_version = version
+        self.rollouts_since_sync = 0
+
+    def _write_artifact(self, fn, *args, **kwargs):
+        # run slow side outputs in the background when a writer is given
+        if self.artifact_writer is not None:
+            self.artifact_writer.submit(fn, *args, **kwargs)
+        else:
+            fn(*args, **kwargs)
+
+    def generate_cam(self, sess, test_cam_si):
+        cams = []
+        actions = []
         for i in range(len(test_cam_si)):
             # get max action per demo state
             readout_t = self.local_network.run_policy(sess, test_cam_si[i])
             action = np.argmax(readout_t)
 
-            # convert action to one-hot vector
-            action_onehot = [0.] * self.game_state.env.action_space.n
-            action_onehot[action] = 1.
-
             # compute grad cam for conv layer 3
             activations, gradients = self.local_network.evaluate_grad_cam(
-                sess, test_cam_si[i], action_onehot)
-            cam = grad_cam(activations, gradients)
-            cam_img = visualize_cam(cam)
-
-            side_by_side = generate_image_for_cam_video(
-                test_cam_si[i],
-                cam_img, global_t, i,
-                self.action_meaning[action])
-
-            cam_side_img.append(side_by_side)
+                sess, test_cam_si[i], action)
+            cams.append(grad_cam(activations, gradients))
+            actions.append(self.action_meaning[action])
 
-        return cam_side_img
+        return cams, actions
 
     def generate_cam_video(self, sess, time_per_step, global_t, folder, demo_memory_cam, demo_cam_human=False):
         # use one demonstration data to record cam
         # only need to make movie for demo data once
-        cam_side_img = self.generate_cam(sess, demo_memory_cam, global_t)
-
         path = '/frames/demo-cam_side_img'
         if demo_cam_human:
             path += '_human'
 
-        make_movie(
-            cam_side_img,
+        # only the network passes run here, rendering and encoding
+        # the side-by-side frames is left to the artifact writer
+        cams, actions = self.generate_cam(sess, demo_memory_cam)
+        self._write_artifact(
+            write_cam_video, demo_memory_cam, cams, actions, global_t,
             folder + '{}{ep:010d}'.format(path, ep=(global_t)),
-            duration=len(cam_side_img)*time_per_step,
-            true_image=True,
-            salience=False)
-        del cam_side_img
+            fps=1. / time_per_step)
 
     def testing_model(self, sess, max_steps, global_t, folder, demo_memory_cam=None, demo_cam_human=False):
         logger.info("Testing model at global_t={}...".format(global_t))
         # copy weights from shared to local
-        sess.run(self.sync)
+        self.sync_local_network(sess, force=True)
 
         if demo_memory_cam is not None:
             self.generate_cam_video(sess, 0.03, global_t, folder, demo_memory_cam, demo_cam_human)
@@ -246,7 +322,10 @@ class A3CTrainingThread(object):
                     self.game_state.lives,
                     fullstate=self.game_state.full_state)
 
-        episode_buffer = []
+        time_per_step = 0.03
+        recorder = VideoRecorder(
+            folder + '/frames/image{ep:010d}'.format(ep=global_t),
+            fps=1. / time_per_step)
         test_memory_cam = []
 
         total_reward = 0
@@ -257,11 +336,10 @@ class A3CTrainingThread(object):
         terminal = False
         while True:
             #pi_ = self.local_network.run_policy(sess, self.game_state.s_t)
-            test_memory_cam.append(self.game_state.s_t)
-            episode_buffer.append(self.game_state.get_screen_rgb())
-            pi_, value_, logits_ = self.local_network.run_policy_and_value(sess, self.game_state.s_t)
-            #action = self.choose_action(logits_)
-            action = np.argmax(pi_)
+            # s_t is a view into the frame buffer, keep a copy for the cam video
+            test_memory_cam.append(np.copy(self.game_state.s_t))
+            recorder.add_frame(self.game_state.get_screen_rgb())
+            action, _ = self.local_network.run_action_and_value(sess, self.game_state.s_t, greedy=True)
 
             # take action
             self.game_state.step(action)
@@ -284,13 +362,8 @@ class A3CTrainingThread(object):
             self.game_state.update()
 
             if terminal_:
-                if get_wrapper_by_name(self.game_state.env, 'EpisodicLifeEnv').was_real_done or memory_full:
-                    time_per_step = 0.03
-                    images = np.array(episode_buffer)
-                    make_movie(
-                        images, folder + '/frames/image{ep:010d}'.format(ep=global_t),
-                        duration=len(images)*time_per_step,
-                        true_image=True, salience=False)
+                if self.game_state.was_real_done or memory_full:
+                    recorder.close()
                     break
 
                 self.game_state.reset(hard_reset=False)
@@ -302,8 +375,8 @@ class A3CTrainingThread(object):
         log_data = (global_t, self.thread_index, total_reward, total_steps)
         logger.info("test: global_t={} worker={} final score={} final steps={}".format(*log_data))
 
-        self.generate_cam_video(sess, 0.03, global_t, folder, np.array(test_memory_cam))
-        test_memory.save(name='test_cam', folder=folder, resize=True)
+        self.generate_cam_video(sess, 0.03, global_t, folder, test_memory_cam)
+        self._write_artifact(test_memory.save, name='test_cam', folder=folder, resize=True)
 
         if self.use_lstm:
             self.local_network.reset_state()
@@ -313,14 +386,19 @@ class A3CTrainingThread(object):
     def testing(self, sess, max_steps, global_t, folder, demo_memory_cam=None):
         logger.info("Evaluate policy at global_t={}...".format(global_t))
         # copy weights from shared to local
-        sess.run(self.sync)
+        self.sync_local_network(sess, force=True)
 
         if demo_memory_cam is not None and global_t % 5000000 == 0:
             self.generate_cam_video(sess, 0.03, global_t, folder, demo_memory_cam)
 
-        episode_buffer = []
+        recorder = None
         self.game_state.reset(hard_reset=True)
-        episode_buffer.append(self.game_state.get_screen_rgb())
+        if global_t % 5000000 == 0:
+            time_per_step = 0.0167
+            recorder = VideoRecorder(
+                folder + '/frames/image{ep:010d}'.format(ep=global_t),
+                fps=1. / time_per_step)
+            recorder.add_frame(self.game_state.get_screen_rgb())
 
         total_reward = 0
         total_steps = 0
@@ -329,26 +407,24 @@ class A3CTrainingThread(object):
         n_episodes = 0
         while max_steps > 0:
             #pi_ = self.local_network.run_policy(sess, self.game_state.s_t)
-            pi_, value_, logits_ = self.local_network.run_policy_and_value(sess, self.game_state.s_t)
-            if False:
-                action = np.random.choice(range(self.action_size), p=pi_)
-            else:
-                action = self.choose_action(logits_)
-
+            advice_action = -1
             if self.use_pretrained_model_as_advice:
                 psi = self.psi if self.psi > 0.001 else 0.0
                 if psi > np.random.rand():
                     model_pi = self.pretrained_model.run_policy(self.pretrained_model_sess, self.game_state.s_t)
                     model_action, confidence = self.choose_action_with_high_confidence(model_pi, exclude_noop=False)
                     if model_action > self.shaping_actions and confidence >= self.advice_confidence:
-                        action = model_action
+                        advice_action = model_action
+
+            action, _ = self.local_network.run_action_and_value(
+                sess, self.game_state.s_t, advice_action=advice_action)
 
             # take action
             self.game_state.step(action)
             terminal = self.game_state.terminal
 
-            if n_episodes == 0 and global_t % 5000000 == 0:
-                episode_buffer.append(self.game_state.get_screen_rgb())
+            if recorder is not None:
+                recorder.add_frame(self.game_state.get_screen_rgb())
 
             episode_reward += self.game_state.reward
             episode_steps += 1
@@ -358,15 +434,10 @@ class A3CTrainingThread(object):
             self.game_state.update()
 
             if terminal:
-                if get_wrapper_by_name(self.game_state.env, 'EpisodicLifeEnv').was_real_done:
-                    if n_episodes == 0 and global_t % 5000000 == 0:
-                        time_per_step = 0.0167
-                        images = np.array(episode_buffer)
-                        make_movie(
-                            images, folder + '/frames/image{ep:010d}'.format(ep=global_t),
-                            duration=len(images)*time_per_step,
-                            true_image=True, salience=False)
-                        episode_buffer = []
+                if self.game_state.was_real_done:
+                    if recorder is not None:
+                        recorder.close()
+                        recorder = None
                     n_episodes += 1
                     score_str = colored("score={}".format(episode_reward), "magenta")
                     steps_str = colored("steps={}".format(episode_steps), "blue")
@@ -381,6 +452,10 @@ class A3CTrainingThread(object):
                 if self.use_lstm:
                     self.local_network.reset_state()
 
+        # first episode did not finish within max_steps
+        if recorder is not None:
+            recorder.close()
+
         if n_episodes == 0:
             total_reward = episode_reward
             total_steps = episode_steps
@@ -409,6 +484,7 @@ class A3CTrainingThread(object):
         return total_reward, total_steps, n_episodes
 
     def pretrain_init(self, demo_memory):
+        self.demo_states = np.zeros((self.demo_t_max, 84, 84, 4), dtype=np.float32)
         self.demo_memory_size = len(demo_memory)
         self.demo_memory = demo_memory
         self.replay_mem_reset()
@@ -450,16 +526,11 @@ class A3CTrainingThread(object):
         self.demo_memory_s_t = self.demo_memory_s_t1
 
     def demo_process(self, sess, global_t, demo_memory_idx=None):
-        states = []
-        actions = []
-        rewards = []
-        values = []
-
         demo_ended = False
         terminal_end = False
 
         # copy weights from shared to local
-        sess.run( self.sync )
+        self.sync_local_network(sess)
 
         start_local_t = self.local_t
 
@@ -473,9 +544,9 @@ class A3CTrainingThread(object):
             action = self.demo_memory_action
             time.sleep(0.0025)
 
-            states.append(self.demo_memory_s_t)
-            actions.append(action)
-            values.append(value_)
+            self.demo_states[i] = self.demo_memory_s_t
+            self.rollout_actions[i] = action
+            self.rollout_values[i] = value_
 
             if (self.thread_index == 0) and (self.local_t % self.log_interval == 0):
                 log_msg = "lg={}".format(np.array_str(logits_, precision=4, suppress_small=True))
@@ -498,7 +569,8 @@ class A3CTrainingThread(object):
                 # clip reward
                 reward = np.sign(reward)
 
-            rewards.append(reward)
+            self.rollout_rewards[i] = reward
+            n_steps = i + 1
 
             self.local_t += 1
             self.episode_steps += 1
@@ -529,46 +601,26 @@ class A3CTrainingThread(object):
         if not terminal_end:
             cumulative_reward = self.local_network.run_value(sess, s_t)
 
-        actions.reverse()
-        states.reverse()
-        rewards.reverse()
-        values.reverse()
-
-        batch_state = []
-        batch_action = []
-        batch_adv = []
-        batch_cumulative_reward = []
-
-        # compute and accmulate gradients
-        for(ai, ri, si, vi) in zip(actions, rewards, states, values):
-            cumulative_reward = ri + self.gamma * cumulative_reward
-            advantage = cumulative_reward - vi
-
-            # convert action to one-hot vector
-            a = np.zeros([self.action_size])
-            a[ai] = 1
-
-            batch_state.append(si)
-            batch_action.append(a)
-            batch_adv.append(advantage)
-            batch_cumulative_reward.append(cumulative_reward)
+        states = self.demo_states[:n_steps]
+        actions = self.rollout_actions[:n_steps]
+        batch_cumulative_reward = discounted_returns(
+            self.rollout_rewards[:n_steps], self.gamma, cumulative_reward,
+            out=self.rollout_returns[:n_steps])
+        batch_adv = np.subtract(
+            batch_cumulative_reward, self.rollout_values[:n_steps],
+            out=self.rollout_advantages[:n_steps])
 
         cur_learning_rate = self._anneal_learning_rate(global_t) #* 0.005
 
         if self.use_lstm:
-            batch_state.reverse()
-            batch_action.reverse()
-            batch_adv.reverse()
-            batch_cumulative_reward.reverse()
-
             sess.run(self.apply_gradients,
                      feed_dict = {
-                         self.local_network.s: batch_state,
-                         self.local_network.a: batch_action,
+                         self.local_network.s: states,
+                         self.local_network.a: actions,
                          self.local_network.advantage: batch_adv,
                          self.local_network.cumulative_reward: batch_cumulative_reward,
                          self.local_network.initial_lstm_state: start_lstm_state,
-                         self.local_network.step_size : [len(batch_action)],
+                         self.local_network.step_size : [len(actions)],
                          self.learning_rate_input: cur_learning_rate} )
 
             # some demo episodes doesn't reach terminal state
@@ -578,12 +630,14 @@ class A3CTrainingThread(object):
         else:
             sess.run(self.apply_gradients,
                      feed_dict = {
-                         self.local_network.s: batch_state,
-                         self.local_network.a: batch_action,
+                         self.local_network.s: states,
+                         self.local_network.a: actions,
                          self.local_network.advantage: batch_adv,
-                         self.local_network.cumulative_reward: batch_R,
+                         self.local_network.cumulative_reward: batch_cumulative_reward,
                          self.learning_rate_input: cur_learning_rate} )
 
+        A3CTrainingThread.global_updates += 1
+
         if (self.thread_index == 0) and (self.local_t - self.prev_local_t >= self.performance_log_interval):
             self.prev_local_t += self.performance_log_interval
 
@@ -592,16 +646,11 @@ class A3CTrainingThread(object):
         return diff_local_t, demo_ended
 
     def process(self, sess, global_t, train_rewards):
-        states = []
-        actions = []
-        rewards = []
-        values = []
-        rho = []
-
+        rho = self.rollout_rho
         terminal_end = False
 
         # copy weights from shared to local
-        sess.run( self.sync )
+        self.sync_local_network(sess)
 
         start_local_t = self.local_t
 
@@ -610,37 +659,47 @@ class A3CTrainingThread(object):
 
         # t_max times loop
         for i in range(self.local_t_max):
-            pi_, value_, logits_ = self.local_network.run_policy_and_value(sess, self.game_state.s_t)
-            action = self.choose_action(logits_)
-
             model_pi = None
             confidence = 0.
+            advice_action = -1
             if self.use_pretrained_model_as_advice:
                 self.psi = 0.9999 * (0.9999 ** global_t) if self.psi > 0.001 else 0.0 # 0.99995 works
                 if self.psi > np.random.rand():
                     model_pi = self.pretrained_model.run_policy(self.pretrained_model_sess, self.game_state.s_t)
                     model_action, confidence = self.choose_action_with_high_confidence(model_pi, exclude_noop=False)
                     if (model_action > self.shaping_actions and confidence >= self.advice_confidence):
-                        action = model_action
+                        advice_action = model_action
                         self.advice_ctr += 1
+
+            # the full distribution is only fetched for logging
+            log_step = self.thread_index == 0 and self.local_t % self.log_interval == 0
+            if self.predictor is not None or log_step:
+                if self.predictor is not None:
+                    pi_, value_, logits_ = self.predictor.predict(self.game_state.s_t)
+                else:
+                    pi_, value_, logits_ = self.local_network.run_policy_and_value(sess, self.game_state.s_t)
+                action = self.choose_action(logits_) if advice_action < 0 else advice_action
+            else:
+                action, value_ = self.local_network.run_action_and_value(
+                    sess, self.game_state.s_t, advice_action=advice_action)
             if self.use_pretrained_model_as_reward_shaping:
                 #if action > 0:
                 if model_pi is None:
                     model_pi = self.pretrained_model.run_policy(self.pretrained_model_sess, self.game_state.s_t)
                     confidence = model_pi[action][0][0]
                 if (action > self.shaping_actions and confidence >= self.advice_confidence):
-                    #rho.append(round(confidence, 5))
-                    rho.append(self.shaping_reward)
+                    #rho[i] = round(confidence, 5)
+                    rho[i] = self.shaping_reward
                     self.shaping_ctr += 1
                 else:
-                    rho.append(0.)
+                    rho[i] = 0.
                 #self.shaping_ctr += 1
 
-            states.append(self.game_state.s_t)
-            actions.append(action)
-            values.append(value_)
+            self.rollout_states[i] = self.game_state.s_t
+            self.rollout_actions[i] = action
+            self.rollout_values[i] = value_
 
-            if self.thread_index == 0 and self.local_t % self.log_interval == 0:
+            if log_step:
                 log_msg1 = "lg={}".format(np.array_str(logits_, precision=4, suppress_small=True))
                 log_msg2 = "pi={}".format(np.array_str(pi_, precision=4, suppress_small=True))
                 log_msg3 = "V={:.4f}".format(value_)
@@ -661,7 +720,7 @@ class A3CTrainingThread(object):
                     rho[i] = 0.
                     j = i-1
                     while j > i-5:
-                        if rewards[j] != 0:
+                        if self.rollout_rewards[j] != 0:
                             break
                         rho[j] = 0.
                         j -= 1
@@ -686,7 +745,8 @@ class A3CTrainingThread(object):
                 # clip reward
                 reward = np.sign(reward)
 
-            rewards.append(reward)
+            self.rollout_rewards[i] = reward
+            n_steps = i + 1
 
             self.local_t += 1
             self.episode_steps += 1
@@ -696,7 +756,7 @@ class A3CTrainingThread(object):
             self.game_state.update()
 
             if terminal:
-                if get_wrapper_by_name(self.game_state.env, 'EpisodicLifeEnv').was_real_done:
+                if self.game_state.was_real_done:
                     log_msg = "train: worker={} global_t={}".format(self.thread_index, global_t)
                     if self.use_pretrained_model_as_advice:
                         log_msg += " advice_ctr={}".format(self.advice_ctr)
@@ -722,103 +782,57 @@ class A3CTrainingThread(object):
 
         cumulative_reward = 0.0
         if not terminal:
-            cumulative_reward = self.local_network.run_value(sess, self.game_state.s_t)
-
-        actions.reverse()
-        states.reverse()
-        rewards.reverse()
-        values.reverse()
-
-        batch_state = []
-        batch_action = []
-        batch_adv = []
-        batch_cumulative_reward = []
+            if self.predictor is not None:
+                cumulative_reward = self.predictor.run_value(self.game_state.s_t)
+            else:
+                cumulative_reward = self.local_network.run_value(sess, self.game_state.s_t)
 
+        states = self.rollout_states[:n_steps]
+        actions = self.rollout_actions[:n_steps]
+        rewards = self.rollout_rewards[:n_steps]
+        returns = self.rollout_returns[:n_steps]
         if self.use_pretrained_model_as_reward_shaping:
-            rho.reverse()
-            rho.append(self.last_rho)
-            self.last_rho = rho[0]
-            i = 0
-            # compute and accumulate gradients
-            for(ai, ri, si, vi) in zip(actions, rewards, states, values):
-                # Wiewiora et al.(2003) Principled Methods for Advising RL agents
-                # Look-Back Advice
-                #F = rho[i] - (self.shaping_gamma**-1) * rho[i+1]
-                #F = rho[i] - self.shaping_gamma * rho[i+1]
-                f = (self.shaping_gamma**-1) * rho[i] - rho[i+1]
-                if (i == 0 and terminal) or (f != 0 and (ri > 0 or ri < 0)):
-                    #logger.warn("averted additional F in absorbing state")
-                    F = 0.
-                # if (F < 0. and ri > 0) or (F > 0. and ri < 0):
-                #     logger.warn("Negative reward shaping F={} ri={} rho[s]={} rhos[s-1]={}".format(F, ri, rho[i], rho[i+1]))
-                #     F = 0.
-                cumulative_reward = (ri + f*self.shaping_factor) + self.gamma * cumulative_reward
-                advantage = cumulative_reward - vi
-
-                a = np.zeros([self.action_size])
-                a[ai] = 1
-
-                batch_state.append(si)
-                batch_action.append(a)
-                batch_adv.append(advantage)
-                batch_cumulative_reward.append(cumulative_reward)
-                i += 1
+            # Wiewiora et al.(2003) Principled Methods for Advising RL agents
+            # Look-Back Advice
+            shaped_rewards = look_back_shaping(
+                rho[:n_steps], self.last_rho, rewards, self.shaping_gamma,
+                terminal=terminal, out=self.rollout_shaping[:n_steps])
+            self.last_rho = float(rho[n_steps - 1])
+            shaped_rewards *= self.shaping_factor
+            shaped_rewards += rewards
+            batch_cumulative_reward = discounted_returns(
+                shaped_rewards, self.gamma, cumulative_reward, out=returns)
         else:
-            def h(z, eps=10**-2):
-                return (np.sign(z) * (np.sqrt(np.abs(z) + 1.) - 1.)) + (eps * z)
-
-            def h_inv(z, eps=10**-2):
-                return np.sign(z) * (np.square((np.sqrt(1 + 4 * eps * (np.abs(z) + 1 + eps)) - 1) / (2 * eps)) - 1)
-
-            def h_log(z, eps=.6):
-                return (np.sign(z) * np.log(1. + np.abs(z)) * eps)
-
-            def h_inv_log(z, eps=.6):
-                return np.sign(z) * (np.exp(np.abs(z) / eps) - 1)
-
-            # compute and accumulate gradients
-            for(ai, ri, si, vi) in zip(actions, rewards, states, values):
-                if self.transformed_bellman:
-                    cumulative_reward = h(ri + self.gamma * h_inv(cumulative_reward))
-                else:
-                    cumulative_reward = ri + self.gamma * cumulative_reward
-                advantage = cumulative_reward - vi
-
-                # convert action to one-hot vector
-                a = np.zeros([self.action_size])
-                a[ai] = 1
-
-                batch_state.append(si)
-                batch_action.append(a)
-                batch_adv.append(advantage)
-                batch_cumulative_reward.append(cumulative_reward)
+            batch_cumulative_reward = discounted_returns(
+                rewards, self.gamma, cumulative_reward,
+                transformed=self.transformed_bellman, out=returns)
+        batch_adv = np.subtract(
+            batch_cumulative_reward, self.rollout_values[:n_steps],
+            out=self.rollout_advantages[:n_steps])
 
         cur_learning_rate = self._anneal_learning_rate(global_t)
 
         if self.use_lstm:
-            batch_state.reverse()
-            batch_action.reverse()
-            batch_adv.reverse()
-            batch_cumulative_reward.reverse()
-
             sess.run(self.apply_gradients,
                 feed_dict = {
-                    self.local_network.s: batch_state,
-                    self.local_network.a: batch_action,
+                    self.local_network.s: states,
+                    self.local_network.a: actions,
                     self.local_network.advantage: batch_adv,
                     self.local_network.cumulative_reward: batch_cumulative_reward,
                     self.local_network.initial_lstm_state: start_lstm_state,
-                    self.local_network.step_size : [len(batch_action)],
+                    self.local_network.step_size : [len(actions)],
                     self.learning_rate_input: cur_learning_rate})
         else:
             sess.run(self.apply_gradients,
                 feed_dict = {
-                    self.local_network.s: batch_state,
-                    self.local_network.a: batch_action,
+                    self.local_network.s: states,
+                    self.local_network.a: actions,
                     self.local_network.advantage: batch_adv,
                     self.local_network.cumulative_reward: batch_cumulative_reward,
                     self.learning_rate_input: cur_learning_rate})
 
+        A3CTrainingThread.global_updates += 1
+
         if (self.thread_index == 0) and (self.local_t - self.prev_local_t >= self.performance_log_interval):
             self.prev_local_t += self.performance_log_interval
             elapsed_time = time.time() - self.start_time
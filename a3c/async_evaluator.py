@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+import threading
+import queue
+import logging
+
+logger = logging.getLogger("async_evaluator")
+
+class AsyncEvaluator(object):
+    """Evaluation of global weight snapshots in a background thread.
+
+    evaluator is an A3CTrainingThread built in its own graph on network,
+    a copy of the global network, and run in sess. submit() queues a
+    snapshot of the global weights (values in network.get_vars() order)
+    and returns at once. The evaluator thread loads the snapshot into
+    network, runs evaluator.testing() and passes the result to
+    on_result(global_t, (reward, steps, episodes)). Training continues
+    while evaluating.
+    """
+    def __init__(self, evaluator, sess, network, max_steps, folder, on_result, demo_memory_cam=None):
+        import tensorflow as tf
+        self.evaluator = evaluator
+        self.sess = sess
+        self.network = network
+        self.max_steps = max_steps
+        self.folder = folder
+        self.on_result = on_result
+        self.demo_memory_cam = demo_memory_cam
+        with sess.graph.as_default():
+            var_list = network.get_vars()
+            self._placeholders = [tf.placeholder(v.dtype.base_dtype, v.get_shape()) for v in var_list]
+            self._load = tf.group(*[tf.assign(v, p) for v, p in zip(var_list, self._placeholders)])
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        assert self._thread is None
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, global_t, values):
+        """Queue an evaluation of the snapshot values at global_t"""
+        if self._queue.qsize() > 0:
+            logger.warning("evaluation at global_t={} queued behind {} others".format(global_t, self._queue.qsize()))
+        self._queue.put((global_t, values))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            global_t, values = item
+            try:
+                self.sess.run(self._load, feed_dict=dict(zip(self._placeholders, values)))
+                result = self.evaluator.testing(
+                    self.sess, self.max_steps, global_t, self.folder,
+                    demo_memory_cam=self.demo_memory_cam)
+                self.on_result(global_t, result)
+            except Exception:
+                logger.exception("evaluation at global_t={} failed".format(global_t))
+
+    def stop(self, wait_pending=True):
+        """Stop after the current evaluation, and the queued ones unless
+        wait_pending is False"""
+        if self._thread is None:
+            return
+        if not wait_pending:
+            dropped = 0
+            while True:
+                try:
+                    self._queue.get_nowait()
+                    dropped += 1
+                except queue.Empty:
+                    break
+            if dropped > 0:
+                logger.info("dropped {} pending evaluations".format(dropped))
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
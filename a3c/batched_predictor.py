@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+import threading
+import queue
+import time
+import numpy as np
+import logging
+
+from concurrent.futures import Future
+
+logger = logging.getLogger("batched_predictor")
+
+class BatchedPredictor(object):
+    """Forward passes of all A3C workers batched on the global network
+    (GA3C, Babaeizadeh et al. 2017).
+
+    predict(s_t) enqueues a state and blocks on a Future. The predictor
+    thread takes the first pending request, gathers more until batch_size
+    requests are pending or max_wait seconds passed, runs one sess.run
+    on the global network and scatters (pi, value, logits) back. Actions
+    come from the global weights, which may be newer than the worker's
+    local copy the gradients are computed on (GA3C's policy lag).
+    Feed-forward networks only, LSTM states are per worker.
+
+    predict() raises once the predictor is stopped, and an error while
+    serving a batch is raised in the workers of that batch only.
+    """
+    def __init__(self, sess, network, batch_size=16, max_wait=0.001):
+        assert batch_size > 0
+        assert not hasattr(network, 'lstm'), "BatchedPredictor does not support LSTM networks"
+        self.sess = sess
+        self.network = network
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._states = np.zeros((batch_size, 84, 84, 4), dtype=np.uint8)
+        self._fetches = [network.pi, network.v0, network.logits]
+        self._thread = None
+        self._lock = threading.Lock()
+        self._running = False
+        self.batches = 0
+        self.requests = 0
+
+    def start(self):
+        """Start serving, the network variables must be initialized."""
+        assert self._thread is None
+        self._running = True
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def predict(self, s_t):
+        """Return (pi, value, logits) of s_t, like run_policy_and_value."""
+        future = Future()
+        with self._lock:
+            if not self._running:
+                raise RuntimeError("BatchedPredictor is not running")
+            self._queue.put((s_t, future))
+        return future.result()
+
+    def run_value(self, s_t):
+        return self.predict(s_t)[1]
+
+    def _gather(self):
+        requests = [self._queue.get()]
+        if requests[0] is None:
+            return None
+        deadline = time.time() + self.max_wait
+        while len(requests) < self.batch_size:
+            timeout = deadline - time.time()
+            try:
+                if timeout > 0:
+                    request = self._queue.get(timeout=timeout)
+                else:
+                    request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                # serve what was gathered, stop on the next round
+                self._queue.put(None)
+                break
+            requests.append(request)
+        return requests
+
+    def _serve(self, requests):
+        n = len(requests)
+        for i, (s_t, _) in enumerate(requests):
+            self._states[i] = s_t
+        pi, v, logits = self.sess.run(
+            self._fetches, feed_dict={self.network.s: self._states[:n]})
+        for i, (_, future) in enumerate(requests):
+            future.set_result((pi[i], v[i], logits[i]))
+        self.batches += 1
+        self.requests += n
+
+    def _run(self):
+        try:
+            while True:
+                requests = []
+                try:
+                    requests = self._gather()
+                    if requests is None:
+                        break
+                    self._serve(requests)
+                except Exception as e:
+                    logger.exception("batch of {} requests failed".format(len(requests)))
+                    for _, future in requests:
+                        if not future.done():
+                            future.set_exception(e)
+        finally:
+            # no worker may wait forever on a request that is never served
+            with self._lock:
+                self._running = False
+            error = RuntimeError("BatchedPredictor stopped")
+            while True:
+                try:
+                    request = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is not None:
+                    request[1].set_exception(error)
+
+    def stop(self):
+        if self._thread is None:
+            return
+        with self._lock:
+            self._running = False
+            self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        if self.batches > 0:
+            logger.info("BatchedPredictor: {} requests in {} batches ({:.1f} per batch)".format(
+                self.requests, self.batches, self.requests / self.batches))
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import unittest
+import numpy as np
+
+from batched_predictor import BatchedPredictor
+
+class FakeNetwork(object):
+    s = 'state'
+    pi = 'pi'
+    v0 = 'v0'
+    logits = 'logits'
+
+class FakeSession(object):
+    """sess.run of a linear "network" on the mean of each state"""
+    def __init__(self):
+        self.batch_sizes = []
+
+    def run(self, fetches, feed_dict):
+        states = feed_dict[FakeNetwork.s]
+        self.batch_sizes.append(len(states))
+        mean = states.reshape(len(states), -1).mean(axis=1)
+        logits = np.stack([mean, -mean], axis=1)
+        return [logits / 10., mean * 2., logits]
+
+def state(value):
+    return np.full((84, 84, 4), value, dtype=np.uint8)
+
+class BatchedPredictorTest(unittest.TestCase):
+    def testPredict(self):
+        sess = FakeSession()
+        predictor = BatchedPredictor(sess, FakeNetwork(), batch_size=4, max_wait=0.01)
+        predictor.start()
+        results = {}
+
+        def worker(index):
+            for step in range(20):
+                value = index * 20 + step
+                results[value] = predictor.predict(state(value))
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        predictor.stop()
+
+        self.assertEqual(len(results), 160)
+        for value, (pi, v, logits) in results.items():
+            self.assertAlmostEqual(v, value * 2.)
+            self.assertTrue(np.allclose(logits, [value, -value]))
+            self.assertTrue(np.allclose(pi, logits / 10.))
+        self.assertEqual(predictor.requests, 160)
+        self.assertTrue(max(sess.batch_sizes) > 1)
+        self.assertTrue(max(sess.batch_sizes) <= 4)
+
+    def testBadStateFailsItsRequestOnly(self):
+        predictor = BatchedPredictor(FakeSession(), FakeNetwork(), batch_size=4, max_wait=0.)
+        predictor.start()
+        with self.assertRaises(ValueError):
+            predictor.predict(np.zeros((2, 2)))
+        # the predictor thread keeps serving
+        self.assertAlmostEqual(predictor.predict(state(3))[1], 6.)
+        predictor.stop()
+
+    def testNotRunning(self):
+        predictor = BatchedPredictor(FakeSession(), FakeNetwork())
+        with self.assertRaises(RuntimeError):
+            predictor.predict(state(0))
+        predictor.start()
+        predictor.stop()
+        with self.assertRaises(RuntimeError):
+            predictor.predict(state(0))
+
+if __name__ == "__main__":
+    unittest.main()
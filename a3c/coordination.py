@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Blocking coordination of the A3C workers.
+
+Workers block on a condition variable instead of sleep-polling flags, so
+waiting costs no CPU and they wake as soon as the state changes. All the
+waits of a Coordinator share its condition, so request_stop() wakes every
+waiting worker. With ctx, a multiprocessing context, the state is shared
+by worker processes.
+"""
+import threading
+
+class Coordinator(object):
+    """Stop flag of a run and the condition its waits are built on"""
+    def __init__(self, ctx=None):
+        if ctx is None:
+            # reentrant as a signal handler may request_stop() in a waiting thread
+            self.cond = threading.Condition(threading.RLock())
+            self._stop = None
+            self._local_stop = False
+        else:
+            self.cond = ctx.Condition(ctx.RLock())
+            self._stop = ctx.RawValue('b', 0)
+        self.ctx = ctx
+
+    @property
+    def stop_requested(self):
+        return self._local_stop if self._stop is None else bool(self._stop.value)
+
+    def request_stop(self):
+        with self.cond:
+            if self._stop is None:
+                self._local_stop = True
+            else:
+                self._stop.value = 1
+            self.cond.notify_all()
+
+    def new_value(self, value):
+        if self.ctx is None:
+            return [value]
+        return self.ctx.RawValue('i', value)
+
+    def wait_for(self, predicate, timeout=None):
+        """Block until predicate() or a stop request, False on stop or timeout"""
+        with self.cond:
+            self.cond.wait_for(lambda: self.stop_requested or predicate(), timeout)
+            return not self.stop_requested and predicate()
+
+def _get(value):
+    return value[0] if isinstance(value, list) else value.value
+
+def _set(value, v):
+    if isinstance(value, list):
+        value[0] = v
+    else:
+        value.value = v
+
+class Phase(object):
+    """A phase the workers wait out, e.g. an evaluation.
+
+    begin() and end() nest, so the phase is active until every begin()
+    has ended. wait() returns at once when the phase is not active.
+    wait_waiters(n) blocks until n workers are waiting the phase out.
+    """
+    def __init__(self, coord, active=False):
+        self.coord = coord
+        self._count = coord.new_value(1 if active else 0)
+        self._waiting = coord.new_value(0)
+
+    @property
+    def active(self):
+        return _get(self._count) > 0
+
+    def begin(self):
+        with self.coord.cond:
+            _set(self._count, _get(self._count) + 1)
+
+    def end(self):
+        with self.coord.cond:
+            assert _get(self._count) > 0
+            _set(self._count, _get(self._count) - 1)
+            self.coord.cond.notify_all()
+
+    def __enter__(self):
+        self.begin()
+        return self
+
+    def __exit__(self, *exc):
+        self.end()
+
+    def wait(self, timeout=None):
+        """Block while active, False on a stop request or timeout"""
+        if not self.active:
+            return not self.coord.stop_requested
+        with self.coord.cond:
+            _set(self._waiting, _get(self._waiting) + 1)
+            self.coord.cond.notify_all()
+            try:
+                return self.coord.wait_for(lambda: not self.active, timeout)
+            finally:
+                _set(self._waiting, _get(self._waiting) - 1)
+
+    @property
+    def waiting(self):
+        return _get(self._waiting)
+
+    def wait_waiters(self, n, timeout=None):
+        """Block until n workers wait in wait(), False on a stop request or timeout"""
+        return self.coord.wait_for(lambda: self.waiting >= n, timeout)
+
+class CountDown(object):
+    """Wait until n workers are done, e.g. with pretraining"""
+    def __init__(self, coord, n):
+        self.coord = coord
+        self._count = coord.new_value(n)
+
+    @property
+    def remaining(self):
+        return _get(self._count)
+
+    def count_down(self):
+        with self.coord.cond:
+            assert _get(self._count) > 0
+            _set(self._count, _get(self._count) - 1)
+            if _get(self._count) == 0:
+                self.coord.cond.notify_all()
+
+    def wait(self, timeout=None):
+        """Block until all are done, False on a stop request or timeout"""
+        return self.coord.wait_for(lambda: self.remaining == 0, timeout)
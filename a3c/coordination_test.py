@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import threading
+import time
+import unittest
+
+from coordination import Coordinator, Phase, CountDown
+
+def wait_in_process(phase, done):
+    done.value = 1 if phase.wait() else -1
+
+class CoordinationTest(unittest.TestCase):
+    def testPhase(self):
+        coord = Coordinator()
+        phase = Phase(coord)
+        self.assertTrue(phase.wait())
+        with phase:
+            phase.begin()
+            phase.end()
+            self.assertTrue(phase.active)
+            self.assertFalse(phase.wait(timeout=0.01))
+        self.assertFalse(phase.active)
+
+        woken = []
+        phase.begin()
+        waiters = [threading.Thread(target=lambda: woken.append(phase.wait())) for _ in range(4)]
+        for t in waiters:
+            t.start()
+        phase.end()
+        for t in waiters:
+            t.join(timeout=1)
+        self.assertEqual(woken, [True] * 4)
+
+    def testWaitWaiters(self):
+        coord = Coordinator()
+        phase = Phase(coord, active=True)
+        self.assertFalse(phase.wait_waiters(1, timeout=0.01))
+        waiters = [threading.Thread(target=phase.wait) for _ in range(3)]
+        for t in waiters:
+            t.start()
+        self.assertTrue(phase.wait_waiters(3, timeout=1))
+        phase.end()
+        for t in waiters:
+            t.join(timeout=1)
+        self.assertEqual(phase.waiting, 0)
+
+    def testCountDown(self):
+        coord = Coordinator()
+        done = CountDown(coord, 2)
+        waiter = threading.Thread(target=done.wait)
+        waiter.start()
+        done.count_down()
+        self.assertFalse(done.wait(timeout=0.01))
+        done.count_down()
+        waiter.join(timeout=1)
+        self.assertFalse(waiter.is_alive())
+        self.assertTrue(CountDown(coord, 0).wait())
+
+    def testStopWakesWaiters(self):
+        coord = Coordinator()
+        phase = Phase(coord, active=True)
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(phase.wait()))
+        waiter.start()
+        time.sleep(0.01)
+        coord.request_stop()
+        waiter.join(timeout=1)
+        self.assertEqual(result, [False])
+        self.assertTrue(coord.stop_requested)
+
+    def testProcesses(self):
+        ctx = multiprocessing.get_context('spawn')
+        coord = Coordinator(ctx)
+        phase = Phase(coord, active=True)
+        done = ctx.RawValue('i', 0)
+        p = ctx.Process(target=wait_in_process, args=(phase, done))
+        p.start()
+        self.assertTrue(phase.wait_waiters(1, timeout=10))
+        self.assertEqual(done.value, 0)
+        phase.end()
+        p.join(timeout=10)
+        self.assertEqual(done.value, 1)
+
+if __name__ == "__main__":
+    unittest.main()
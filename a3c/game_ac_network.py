@@ -40,15 +40,16 @@ class GameACNetwork(ABC):
             return tf.reduce_sum(p0 * (tf.log(z0) - a0), 1)
 
         with tf.name_scope("Loss") as scope:
-            # taken action (input for policy)
-            self.a = tf.placeholder(tf.float32, shape=[None, self._action_size], name="action")
+            # taken action index (input for policy)
+            self.a = tf.placeholder(tf.int32, shape=[None], name="action")
+            self.a_onehot = tf.one_hot(self.a, self._action_size, dtype=tf.float32)
 
             # temporal difference (R-V) (input for policy)
             self.advantage = tf.placeholder(tf.float32, shape=[None], name="advantage")
             self.cumulative_reward = tf.placeholder(tf.float32, shape=[None], name="cumulative_reward")
 
-            assert self.a.shape.as_list() == self.logits.shape.as_list()
-            neglogpac = tf.nn.softmax_cross_entropy_with_logits_v2(logits=self.logits, labels=self.a)
+            assert self.a_onehot.shape.as_list() == self.logits.shape.as_list()
+            neglogpac = tf.nn.softmax_cross_entropy_with_logits_v2(logits=self.logits, labels=self.a_onehot)
             pg_loss = tf.reduce_mean(self.advantage * neglogpac)
             vf_loss = tf.reduce_mean(tf.squared_difference(tf.squeeze(self.v), self.cumulative_reward) / 2.0)
             entropy = tf.reduce_mean(cat_entropy(self.logits))
@@ -57,11 +58,12 @@ class GameACNetwork(ABC):
     def prepare_sil_loss(self, critic_lr=0.5):
         """Based from A2C-SIL"""
         with tf.name_scope("SIL_Loss") as scope:
-            # taken action (input for policy)
-            self.a_sil = tf.placeholder(tf.float32, shape=[None, self._action_size], name="action_sil")
+            # taken action index (input for policy)
+            self.a_sil = tf.placeholder(tf.int32, shape=[None], name="action_sil")
+            a_sil_onehot = tf.one_hot(self.a_sil, self._action_size, dtype=tf.float32)
             self.cumulative_reward_sil = tf.placeholder(tf.float32, shape=[None], name="cumulative_reward_sil")
 
-            neglogpac = tf.nn.softmax_cross_entropy_with_logits_v2(logits=self.logits, labels=self.a_sil)
+            neglogpac = tf.nn.softmax_cross_entropy_with_logits_v2(logits=self.logits, labels=a_sil_onehot)
             advantage_sil = self.cumulative_reward_sil - tf.squeeze(self.v)
             pg_loss = tf.reduce_mean(neglogpac * tf.maximum(advantage_sil, tf.zeros(tf.shape(self.cumulative_reward))))
             vf_loss = tf.reduce_mean(tf.squared_difference(tf.squeeze(self.v), self.cumulative_reward) / 2.0)
@@ -73,7 +75,7 @@ class GameACNetwork(ABC):
         '''
         with tf.name_scope("GradCAM_Loss") as scope:
             # We only care about target visualization class.
-            signal = tf.multiply(self.logits, self.a)
+            signal = tf.multiply(self.logits, self.a_onehot)
             y_c = tf.reduce_sum(signal, axis=1)
 
             if self.use_mnih_2015:
@@ -85,10 +87,28 @@ class GameACNetwork(ABC):
             # Normalizing the gradients
             self.grad_cam_grads = tf.div(grads, tf.sqrt(tf.reduce_mean(tf.square(grads))) + tf.constant(1e-5))
 
+    def build_action_ops(self):
+        """Actions chosen in the graph.
+        sampled_action: Gumbel-max sample of pi (choose_action in the graph)
+        greedy_action: argmax of pi
+        action: sampled_action unless advice_action >= 0 is fed
+        """
+        with tf.name_scope("Action") as scope:
+            uniform = tf.random_uniform(tf.shape(self.logits))
+            self.sampled_action = tf.argmax(self.logits - tf.log(-tf.log(uniform)), axis=1, output_type=tf.int32)
+            self.greedy_action = tf.argmax(self.logits, axis=1, output_type=tf.int32)
+            self.advice_action = tf.placeholder_with_default(-1, shape=[], name="advice_action")
+            advice = tf.fill(tf.shape(self.sampled_action), self.advice_action)
+            self.action = tf.where(advice >= 0, advice, self.sampled_action)
+
     @abstractmethod
     def run_policy_and_value(self, sess, s_t):
         raise NotImplementedError()
 
+    @abstractmethod
+    def run_action_and_value(self, sess, s_t, greedy=False, advice_action=-1):
+        raise NotImplementedError()
+
     @abstractmethod
     def run_policy(self, sess, s_t):
         raise NotImplementedError()
@@ -237,10 +257,19 @@ class GameACFFNetwork(GameACNetwork):
             self.v = tf.matmul(self.h_fc1, self.W_fc3) + self.b_fc3
             self.v0 = self.v[:, 0]
 
+            self.build_action_ops()
+
     def run_policy_and_value(self, sess, s_t):
         pi_out, v_out, logits = sess.run( [self.pi, self.v0, self.logits], feed_dict = {self.s : [s_t]} )
         return (pi_out[0], v_out[0], logits[0])
 
+    def run_action_and_value(self, sess, s_t, greedy=False, advice_action=-1):
+        action = self.greedy_action if greedy else self.action
+        action_out, v_out = sess.run(
+            [action, self.v0],
+            feed_dict = {self.s : [s_t], self.advice_action : advice_action})
+        return (action_out[0], v_out[0])
+
     def run_policy(self, sess, s_t):
         pi_out = sess.run( self.pi, feed_dict = {self.s : [s_t]} )
         return pi_out[0]
@@ -359,6 +388,8 @@ class GameACLSTMNetwork(GameACNetwork):
             self.v = tf.matmul(lstm_outputs, self.W_fc3) + self.b_fc3
             self.v0 = self.v[:, 0]
 
+            self.build_action_ops()
+
             scope.reuse_variables()
             self.W_lstm = tf.get_variable("basic_lstm_cell/kernel")
             self.b_lstm = tf.get_variable("basic_lstm_cell/bias")
@@ -383,6 +414,19 @@ class GameACLSTMNetwork(GameACNetwork):
         # pi_out: (1,3), v_out: (1)
         return (pi_out[0], v_out[0], logits[0])
 
+    def run_action_and_value(self, sess, s_t, greedy=False, advice_action=-1):
+        # forward propagation of one step like run_policy_and_value()
+        action = self.greedy_action if greedy else self.action
+        action_out, v_out, self.lstm_state_out = sess.run(
+            [action, self.v0, self.lstm_state],
+            feed_dict = {
+                self.s : [s_t],
+                self.initial_lstm_state0 : self.lstm_state_out[0],
+                self.initial_lstm_state1 : self.lstm_state_out[1],
+                self.step_size : [1],
+                self.advice_action : advice_action})
+        return (action_out[0], v_out[0])
+
     def run_policy(self, sess, s_t):
         # This run_policy() is used for displaying the result with display tool.
         pi_out, self.lstm_state_out = sess.run(
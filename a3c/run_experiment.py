@@ -108,6 +108,49 @@ def main():
     parser.add_argument('--test-model', action='store_true')
     parser.set_defaults(test_model=False)
 
+    # preprocessing on ALE grayscale screens (GrayMaxAndSkipEnv)
+    parser.add_argument('--fused-grayscale', action='store_true', help='max-pool and resize ALE grayscale screens directly')
+    parser.set_defaults(fused_grayscale=False)
+    parser.add_argument('--ale-skip', action='store_true', help='repeat actions in one ale.act loop instead of MaxAndSkipEnv')
+    parser.set_defaults(ale_skip=False)
+
+    # per wrapper layer env timings (first actor thread only)
+    parser.add_argument('--profile-env-interval', type=int, default=0, help='log env step profile every N steps, 0 disables')
+
+    # batch the forward passes of all workers on the global network (FF only)
+    parser.add_argument('--use-predictor', action='store_true', help='GA3C style batched inference thread')
+    parser.set_defaults(use_predictor=False)
+    parser.add_argument('--predictor-batch-size', type=int, default=16, help='max states per predictor forward pass')
+
+    # synchronous A2C: --parallel-size envs stepped in lockstep, batched forward and update
+    parser.add_argument('--use-a2c', action='store_true', help='train with A2C instead of A3C threads (FF only)')
+    parser.set_defaults(use_a2c=False)
+    parser.add_argument('--a2c-subproc', action='store_true', help='step the A2C envs in worker processes')
+    parser.set_defaults(a2c_subproc=False)
+
+    # copying the global weights to the local networks before each rollout
+    parser.add_argument('--local-sync-interval', type=int, default=1, help='sync local networks every N rollouts, 0 only when the global weights changed')
+    parser.add_argument('--share-global-network', action='store_true', help='act and compute gradients on the global network, no per thread copies (FF only)')
+    parser.set_defaults(share_global_network=False)
+
+    # evaluate weight snapshots in the background while training continues
+    parser.add_argument('--async-eval', action='store_true', help='evaluate in a separate graph and thread without pausing training')
+    parser.set_defaults(async_eval=False)
+
+    # A3C workers in processes sharing the global weights and RMSProp state
+    parser.add_argument('--use-processes', action='store_true', help='run the --parallel-size workers as processes')
+    parser.set_defaults(use_processes=False)
+    parser.add_argument('--shared-params-lock', action='store_true', help='serialize the updates of the shared weights')
+    parser.set_defaults(shared_params_lock=False)
+
+    # restore pooled post no-op states on real resets
+    parser.add_argument('--start-state-pool-size', type=int, default=0, help='number of pooled start states, 0 disables the pool')
+    parser.add_argument('--start-state-refresh', type=float, default=1., help='seconds between pool refreshes, 0 never refreshes')
+
+    # background writer for evaluation videos and memory dumps
+    parser.add_argument('--artifact-writer', type=str, default='thread', help='thread | process | none')
+    parser.add_argument('--artifact-queue-size', type=int, default=4, help='max pending artifact jobs')
+
     args = parser.parse_args()
 
     if args.test_model:
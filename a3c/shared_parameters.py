@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+import multiprocessing
+import numpy as np
+import logging
+
+from step_counter import StepCounter
+
+logger = logging.getLogger("shared_parameters")
+
+class SharedParameterStore(object):
+    """Global network weights and RMSProp state in shared memory.
+
+    Parameters and RMSProp mean squares of every variable live in two
+    float32 RawArrays so that worker processes pull weights and push
+    gradients without going through a server. apply_gradients() is the
+    update of tf.train.RMSPropOptimizer (momentum 0):
+
+        ms <- ms + (1 - decay) * (g^2 - ms)
+        w  <- w - lr * g / sqrt(ms + epsilon)
+
+    applied in place and, like the threaded A3C (use_locking=False),
+    without locking unless use_lock=True. global_t and version (number of
+    updates) are shared counters. The store must be created before the
+    worker processes are spawned and passed to them as an argument.
+    """
+    def __init__(self, shapes, decay=0.99, epsilon=1e-5, use_lock=False, ctx=None):
+        """shapes -- [(name, shape)] in a fixed order"""
+        if ctx is None:
+            ctx = multiprocessing.get_context('spawn')
+        self.names = [name for name, _ in shapes]
+        self.shapes = [tuple(shape) for _, shape in shapes]
+        self.decay = decay
+        self.epsilon = epsilon
+        self.use_lock = use_lock
+        self.size = int(sum(np.prod(shape) for shape in self.shapes))
+        self._params = ctx.RawArray('f', self.size)
+        self._ms = ctx.RawArray('f', self.size)
+        self.step_counter = StepCounter(ctx=ctx)
+        self._version = ctx.RawValue('q', 0)
+        self._counter_lock = ctx.Lock()
+        self._update_lock = ctx.Lock()
+        self._make_views()
+        self.ms[:] = 1.
+        logger.info("SharedParameterStore: {} variables, {} floats".format(len(self.names), self.size))
+
+    def _make_views(self):
+        self.params = np.frombuffer(self._params, dtype=np.float32)
+        self.ms = np.frombuffer(self._ms, dtype=np.float32)
+        self._tmp = np.empty(self.size, dtype=np.float32)
+        self.slices = {}
+        offset = 0
+        for name, shape in zip(self.names, self.shapes):
+            size = int(np.prod(shape))
+            self.slices[name] = (offset, offset + size, shape)
+            offset += size
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in ['params', 'ms', '_tmp', 'slices']:
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._make_views()
+
+    def _view(self, array, name):
+        start, end, shape = self.slices[name]
+        return array[start:end].reshape(shape)
+
+    def get(self, name):
+        """Copy of the weights of variable name"""
+        return np.array(self._view(self.params, name))
+
+    def get_ms(self, name):
+        return np.array(self._view(self.ms, name))
+
+    def set(self, name, value, ms=None):
+        self._view(self.params, name)[...] = value
+        if ms is not None:
+            self._view(self.ms, name)[...] = ms
+
+    def apply_gradients(self, names, grads, learning_rate):
+        if self.use_lock:
+            with self._update_lock:
+                self._apply_gradients(names, grads, learning_rate)
+        else:
+            self._apply_gradients(names, grads, learning_rate)
+        with self._counter_lock:
+            self._version.value += 1
+
+    def _apply_gradients(self, names, grads, learning_rate):
+        for name, grad in zip(names, grads):
+            start, end, _ = self.slices[name]
+            grad = np.asarray(grad, dtype=np.float32).ravel()
+            ms = self.ms[start:end]
+            tmp = self._tmp[start:end]
+            np.multiply(grad, grad, out=tmp)
+            tmp -= ms
+            tmp *= 1. - self.decay
+            ms += tmp
+            np.add(ms, self.epsilon, out=tmp)
+            np.sqrt(tmp, out=tmp)
+            np.divide(grad, tmp, out=tmp)
+            tmp *= learning_rate
+            self.params[start:end] -= tmp
+
+    @property
+    def version(self):
+        return self._version.value
+
+    @property
+    def global_t(self):
+        return self.step_counter.value
+
+    @global_t.setter
+    def global_t(self, value):
+        self.step_counter.set(value)
+
+    def add_steps(self, n):
+        """Advance global_t by n, returns the new value"""
+        return self.step_counter.add(n)[0]
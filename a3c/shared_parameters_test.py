@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import math
+import multiprocessing
+import unittest
+
+from shared_parameters import SharedParameterStore
+
+def push_in_process(store, n):
+    for _ in range(n):
+        store.apply_gradients(['w'], [np.zeros(2, dtype=np.float32)], 0.)
+        store.add_steps(5)
+
+class SharedParameterStoreTest(unittest.TestCase):
+    def testApply(self):
+        store = SharedParameterStore([('w', (2,)), ('b', (1,))], decay=0.9, epsilon=1.0)
+        store.set('w', [1.0, 2.0])
+        store.set('b', [3.0])
+
+        # same updates as RMSPropApplierTest
+        store.apply_gradients(['w'], [np.array([2.0, 4.0])], 2.0)
+
+        ms_x = 1.0
+        ms_y = 1.0
+
+        x = 1.0
+        y = 2.0
+        dx = 2.0
+        dy = 4.0
+        ms_x = ms_x + (dx * dx - ms_x) * (1.0 - 0.9)
+        ms_y = ms_y + (dy * dy - ms_y) * (1.0 - 0.9)
+        x = x - (2.0 * dx / math.sqrt(ms_x+1.0))
+        y = y - (2.0 * dy / math.sqrt(ms_y+1.0))
+
+        np.testing.assert_allclose(store.get('w'), [x, y], rtol=1e-6)
+        np.testing.assert_allclose(store.get_ms('w'), [ms_x, ms_y], rtol=1e-6)
+
+        store.apply_gradients(['w'], [np.array([3.0, 6.0])], 2.0)
+
+        dx = 3.0
+        dy = 6.0
+        ms_x = ms_x + (dx * dx - ms_x) * (1.0 - 0.9)
+        ms_y = ms_y + (dy * dy - ms_y) * (1.0 - 0.9)
+        x = x - (2.0 * dx / math.sqrt(ms_x+1.0))
+        y = y - (2.0 * dy / math.sqrt(ms_y+1.0))
+
+        np.testing.assert_allclose(store.get('w'), [x, y], rtol=1e-6)
+        # other variables are untouched
+        np.testing.assert_allclose(store.get('b'), [3.0])
+        self.assertEqual(store.version, 2)
+
+    def testShared(self):
+        ctx = multiprocessing.get_context('spawn')
+        store = SharedParameterStore([('w', (2,))], ctx=ctx)
+        store.set('w', [1.0, 2.0])
+        workers = [ctx.Process(target=push_in_process, args=(store, 10)) for _ in range(2)]
+        for p in workers:
+            p.start()
+        for p in workers:
+            p.join()
+        self.assertEqual(store.version, 20)
+        self.assertEqual(store.global_t, 100)
+        np.testing.assert_allclose(store.get('w'), [1.0, 2.0])
+
+if __name__ == "__main__":
+    unittest.main()
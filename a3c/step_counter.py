@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+import threading
+
+def last_crossed(prev, new, interval):
+    """Last multiple of interval in (prev, new], None if there is none"""
+    if interval <= 0 or new // interval == prev // interval:
+        return None
+    return (new // interval) * interval
+
+class StepCounter(object):
+    """global_t shared by the training threads, or processes when ctx is a
+    multiprocessing context.
+
+    add(n) advances the counter by a whole rollout atomically and returns
+    the new value with the boundaries of the named intervals that this
+    call crossed, e.g. {'eval': 1000000}. Each boundary is reported to
+    exactly one caller, so an evaluation or checkpoint is triggered once.
+    """
+    def __init__(self, value=0, intervals=None, ctx=None):
+        self.intervals = dict(intervals or {})
+        if ctx is None:
+            self._lock = threading.Lock()
+            self._value = None
+            self._local_value = value
+        else:
+            self._lock = ctx.Lock()
+            self._value = ctx.RawValue('q', value)
+
+    def _get(self):
+        return self._local_value if self._value is None else self._value.value
+
+    def _set(self, value):
+        if self._value is None:
+            self._local_value = value
+        else:
+            self._value.value = value
+
+    @property
+    def value(self):
+        return self._get()
+
+    def set(self, value):
+        with self._lock:
+            self._set(value)
+
+    def add(self, n):
+        with self._lock:
+            prev = self._get()
+            new = prev + n
+            self._set(new)
+        crossed = {}
+        for name, interval in self.intervals.items():
+            boundary = last_crossed(prev, new, interval)
+            if boundary is not None:
+                crossed[name] = boundary
+        return new, crossed
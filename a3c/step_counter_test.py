@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import threading
+import unittest
+
+from step_counter import StepCounter, last_crossed
+
+def add_in_process(counter, n, steps):
+    for _ in range(n):
+        counter.add(steps)
+
+class StepCounterTest(unittest.TestCase):
+    def testLastCrossed(self):
+        self.assertEqual(last_crossed(0, 99, 100), None)
+        self.assertEqual(last_crossed(99, 100, 100), 100)
+        self.assertEqual(last_crossed(100, 120, 100), None)
+        self.assertEqual(last_crossed(180, 420, 100), 400)
+
+    def testBoundariesReportedOnce(self):
+        counter = StepCounter(intervals={'eval': 100, 'save': 1000})
+        crossed = []
+
+        def worker():
+            for _ in range(500):
+                _, c = counter.add(7)
+                crossed.append(c)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(counter.value, 8 * 500 * 7)
+        evals = sorted(c['eval'] for c in crossed if 'eval' in c)
+        saves = sorted(c['save'] for c in crossed if 'save' in c)
+        # a 7 step rollout never crosses two eval boundaries
+        self.assertEqual(evals, list(range(100, counter.value + 1, 100)))
+        self.assertEqual(saves, list(range(1000, counter.value + 1, 1000)))
+
+    def testProcesses(self):
+        ctx = multiprocessing.get_context('spawn')
+        counter = StepCounter(value=10, ctx=ctx)
+        workers = [ctx.Process(target=add_in_process, args=(counter, 100, 5)) for _ in range(2)]
+        for p in workers:
+            p.start()
+        for p in workers:
+            p.join()
+        self.assertEqual(counter.value, 10 + 2 * 100 * 5)
+
+if __name__ == "__main__":
+    unittest.main()
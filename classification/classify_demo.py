@@ -9,7 +9,7 @@ import random
 from termcolor import colored
 from common.replay_memory import ReplayMemory
 from common.util import load_memory, solve_weight, compute_proportions
-from common.game_state import GameState, get_wrapper_by_name
+from common.game_state import GameState
 
 logger = logging.getLogger("classify_demo")
 
@@ -181,7 +181,7 @@ class ClassifyDemo(object):
             self.game_state.update()
 
             if terminal:
-                if get_wrapper_by_name(self.game_state.env, 'EpisodicLifeEnv').was_real_done:
+                if self.game_state.was_real_done:
                     n_episodes += 1
                     score_str = colored("score={}".format(episode_reward), "magenta")
                     steps_str = colored("steps={}".format(episode_steps), "blue")
@@ -1,2 +1,7 @@
 from .atari_wrapper import *
 from .game_state import GameState
+from .game_state_vec import GameStateVec
+from .game_state_subproc import SubprocGameStateVec
+from .start_state_pool import StartStatePool
+from .profiling import StepProfiler, ProfileWrapper
+from .synthetic_env import SyntheticAtariEnv, register_synthetic_env
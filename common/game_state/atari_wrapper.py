@@ -6,10 +6,8 @@ import gym
 import logging
 import pyglet
 import cv2
-import threading
 import numpy as np
 
-from time import sleep
 from gym import spaces
 
 logger = logging.getLogger("atari_wrapper")
@@ -19,14 +17,26 @@ class AtariWrapper(gym.Wrapper):
     Sets the frame skip in ale and overrides step function
     in order to speed up game simulation
     Should only be used for Deterministic and NoFrameskip version of Atari gym
+
+    With ale_skip=True step() repeats the action `skip` times in one loop
+    over ale.act and returns the max of the last two RGB screens, like
+    MaxAndSkipEnv does, so MaxAndSkipEnv must not be stacked on top.
     """
-    def __init__(self, env, noop_max=30, skip=4):
+    def __init__(self, env, noop_max=30, skip=4, ale_skip=False):
         gym.Wrapper.__init__(self, env)
 
         self.noop_max = noop_max
         self.override_num_noops = None
         self.noop_action = 0
         self._skip = skip
+        self.ale_skip = ale_skip
+        if self.ale_skip:
+            ale = self.unwrapped.ale
+            screen_width, screen_height = ale.getScreenDims()
+            self._obs_buffer = np.zeros((2, screen_height, screen_width, 3), dtype=np.uint8)
+            # same screen layout as gym's AtariEnv observations
+            self._grab_screen = getattr(ale, 'getScreenRGB2', ale.getScreenRGB)
+            self._time_limit = find_time_limit(self.env)
 
         # set frame skip in ALE
         # self.unwrapped.ale.setInt('frame_skip'.encode('utf-8'), self.unwrapped.frameskip)
@@ -39,9 +49,24 @@ class AtariWrapper(gym.Wrapper):
         logger.info("Gym action_space: {}".format(self.env.action_space))
         logger.info("AtariWrapper frameskip: {}".format(self._skip))
         logger.info("AtariWrapper noop_max: {}".format(self.noop_max))
+        logger.info("AtariWrapper ale_skip: {}".format(self.ale_skip))
 
     def step(self, a):
-        return self.env.step(a)
+        if not self.ale_skip:
+            return self.env.step(a)
+
+        ale = self.unwrapped.ale
+        if self._skip == 1:
+            self._obs_buffer[0] = 0
+        total_reward, frames, done = repeat_ale_action(
+            ale, self.unwrapped._action_set[a], self._skip,
+            self._grab_screen, self._obs_buffer)
+        if advance_time_limit(self._time_limit, frames):
+            done = True
+        # Note that the observation on the done=True frame
+        # doesn't matter
+        max_frame = self._obs_buffer.max(axis=0)
+        return max_frame, total_reward, done, {'ale.lives': ale.lives()}
 
     def reset(self, **kwargs):
         self.env.reset(**kwargs)
@@ -119,6 +144,91 @@ class MaxAndSkipEnv(gym.Wrapper):
     def reset(self, **kwargs):
         return self.env.reset(**kwargs)
 
+def repeat_ale_action(ale, action, skip, grab_screen, obs_buffer):
+    """Play action `skip` times straight on the ALE, grabbing the screens of
+    the last two frames into obs_buffer[0] and obs_buffer[1] with
+    grab_screen (ale.getScreenGrayscale or ale.getScreenRGB).
+    Returns (total_reward, frames played, game over).
+    """
+    total_reward = 0.0
+    game_over = False
+    frames = 0
+    for i in range(skip):
+        total_reward += ale.act(action)
+        frames += 1
+        if i >= skip - 2:
+            grab_screen(obs_buffer[i - skip + 2])
+        if ale.game_over():
+            game_over = True
+            break
+    return total_reward, frames, game_over
+
+def find_time_limit(env):
+    """Return gym's TimeLimit wrapper under env, or None."""
+    try:
+        return get_wrapper_by_name(env, 'TimeLimit')
+    except ValueError:
+        return None
+
+def advance_time_limit(time_limit, frames):
+    """Count frames played on the ALE directly against gym's TimeLimit
+    (as returned by find_time_limit). Returns True once the episode step
+    limit is reached.
+    """
+    if time_limit is None:
+        return False
+    time_limit._elapsed_steps += frames
+    max_steps = getattr(time_limit, '_max_episode_steps', None)
+    return max_steps is not None and time_limit._elapsed_steps >= max_steps
+
+class GrayMaxAndSkipEnv(gym.Wrapper):
+    def __init__(self, env, skip=4, width=84, height=84):
+        """MaxAndSkipEnv and WarpFrame fused on ALE grayscale screens.
+
+        Frames are played with ale.act and only the last two screens are read,
+        as grayscale, into preallocated buffers, max-pooled in place and
+        resized to (height, width). No RGB frame is rendered or copied. ALE
+        grayscale uses the palette luminance, so observations match the
+        RGB -> cvtColor path up to small rounding differences.
+        """
+        gym.Wrapper.__init__(self, env)
+        screen_width, screen_height = self.unwrapped.ale.getScreenDims()
+        self._obs_buffer = np.zeros((2, screen_height, screen_width), dtype=np.uint8)
+        self._max_frame = np.zeros((screen_height, screen_width), dtype=np.uint8)
+        self._time_limit = find_time_limit(self.env)
+        self._skip = skip
+        self.width = width
+        self.height = height
+        self.observation_space = spaces.Box(low=0, high=255,
+            shape=(self.height, self.width, 1), dtype=np.uint8)
+        logger.info("GrayMaxAndSkipEnv: {}".format(True))
+
+    def _observation(self):
+        np.maximum(self._obs_buffer[0], self._obs_buffer[1], out=self._max_frame)
+        # a new 84x84 frame, callers keep references to observations
+        return cv2.resize(self._max_frame, (self.width, self.height),
+            interpolation=cv2.INTER_AREA)
+
+    def step(self, action):
+        """Repeat action, sum reward, and max over last observations."""
+        ale = self.unwrapped.ale
+        if self._skip == 1:
+            self._obs_buffer[0] = 0
+        total_reward, frames, done = repeat_ale_action(
+            ale, self.unwrapped._action_set[action], self._skip,
+            ale.getScreenGrayscale, self._obs_buffer)
+        if advance_time_limit(self._time_limit, frames):
+            done = True
+        # Note that the observation on the done=True frame
+        # doesn't matter
+        return self._observation(), total_reward, done, {'ale.lives': ale.lives()}
+
+    def reset(self, **kwargs):
+        self.env.reset(**kwargs)
+        self.unwrapped.ale.getScreenGrayscale(self._obs_buffer[1])
+        self._obs_buffer[0] = self._obs_buffer[1]
+        return self._observation()
+
 class EpisodicLifeEnv(gym.Wrapper):
     def __init__(self, env):
         """Make end-of-life == end-of-episode, but only reset on true game over.
@@ -157,24 +267,32 @@ class EpisodicLifeEnv(gym.Wrapper):
         return obs
 
 class HumanDemoEnv(gym.Wrapper):
+    """
+    Keyboard control for human demos. The viewer window's key press and
+    release events (dispatched by env.render()) maintain the set of held
+    control keys and recompute human_agent_action on every change, so
+    the action is always a complete, single attribute update and no
+    polling thread is needed.
+    """
     def __init__(self, env):
         gym.Wrapper.__init__(self, env)
         logger.info("HumanDemoEnv: {}".format(True))
 
         self.key = pyglet.window.key
-        self.keys = self.key.KeyStateHandler()
+        self.control_keys = (self.key.UP, self.key.DOWN, self.key.LEFT, self.key.RIGHT, self.key.SPACE)
+        self.pressed_keys = set()
         self.env.render(mode='human')
         self.env.unwrapped.viewer.window.set_size(110+300, 210+300)
-        self.env.unwrapped.viewer.window.push_handlers(self.keys)
+        self.env.unwrapped.viewer.window.push_handlers(
+            on_key_press=self.on_key_press,
+            on_key_release=self.on_key_release,
+            on_deactivate=self.on_deactivate)
 
         self.human_agent_action = 0
         self.human_agent_action_code = 0
         self.human_wants_restart = False
         self.human_sets_pause = False
         self.action_map = self.get_keys_to_action()
-        self.stop_thread = False
-        self.keys_thread = threading.Thread(target=(self.update_human_agent_action))
-        self.keys_thread.start()
 
     def reset(self, **kwargs):
         return self.env.reset(**kwargs)
@@ -205,20 +323,32 @@ class HumanDemoEnv(gym.Wrapper):
 
         return keys_to_action
 
+    def on_key_press(self, symbol, modifiers):
+        if symbol in self.control_keys:
+            self.pressed_keys.add(symbol)
+            self.update_human_agent_action()
+
+    def on_key_release(self, symbol, modifiers):
+        if symbol in self.pressed_keys:
+            self.pressed_keys.discard(symbol)
+            self.update_human_agent_action()
+
+    def on_deactivate(self):
+        # releases are not delivered to an unfocused window
+        self.pressed_keys.clear()
+        self.update_human_agent_action()
+
     def update_human_agent_action(self):
-        while not self.stop_thread:
-            key = []
-            for k in [self.key.UP, self.key.DOWN, self.key.LEFT, self.key.RIGHT, self.key.SPACE]:
-                if self.keys[k]:
-                    key.append(k)
-            key = tuple(sorted(key))
-            action = self.action_map.get(key, 0)
-            self.human_agent_action = action
-            sleep(0.001)
+        key = tuple(sorted(self.pressed_keys))
+        self.human_agent_action = self.action_map.get(key, 0)
 
     def close(self):
-        self.stop_thread = True
-        self.keys_thread.join()
+        viewer = self.env.unwrapped.viewer
+        if viewer is not None:
+            viewer.window.remove_handlers(
+                on_key_press=self.on_key_press,
+                on_key_release=self.on_key_release,
+                on_deactivate=self.on_deactivate)
         self.env.close()
 
 
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import sys
+import time
 import numpy as np
 import gym
 
@@ -9,57 +10,164 @@ from time import sleep
 from termcolor import colored
 from common.game_state import AtariWrapper, FireResetEnv, \
     HumanDemoEnv, WarpFrame, MaxAndSkipEnv, EpisodicLifeEnv, \
-    get_wrapper_by_name
+    GrayMaxAndSkipEnv, get_wrapper_by_name, find_time_limit
+from common.game_state.profiling import StepProfiler
 
 logger = logging.getLogger("game_state")
 
 class GameState(object):
-    def __init__(self, env_id=None, display=False, no_op_max=30, human_demo=False, episode_life=True):
+    """s_t and s_t1 are views into a preallocated (84, 84, frame_buffer_size)
+    frame buffer instead of new arrays per step. A view stays valid for at
+    least frame_buffer_size - 8 further steps (or resets), copy it to keep
+    it longer.
+
+    full_state_mode controls ALE state cloning for full_state/full_state1:
+    'step' clones after every reset and step, 'demand' clones on first
+    access (valid until the next step), 'off' never clones and gives None.
+
+    fused_grayscale=True replaces MaxAndSkipEnv and WarpFrame with
+    GrayMaxAndSkipEnv, which works on ALE grayscale screens (not for
+    human_demo). ale_skip=True lets AtariWrapper repeat actions in one
+    ale.act loop instead of MaxAndSkipEnv.
+
+    With a start_state_pool (StartStatePool built with the same options)
+    real resets restore a pooled post no-op state instead of replaying the
+    no-ops; soft resets after a lost life are unchanged.
+
+    frame_skip overrides the per-game skip; frame_skip=1 emulates exactly
+    like a human demo (one ALE frame per step) without a display, which is
+    what replaying a recorded action sequence needs.
+
+    profile_interval > 0 puts a ProfileWrapper under every wrapper layer and
+    times GameState's own stacking and clone_full_state; the exclusive time
+    per layer is logged every profile_interval steps (see self.profiler).
+    """
+    full_state_modes = ['off', 'step', 'demand']
+
+    def __init__(self, env_id=None, display=False, no_op_max=30, human_demo=False, episode_life=True,
+                 frame_buffer_size=128, full_state_mode='demand', fused_grayscale=False,
+                 ale_skip=False, start_state_pool=None, frame_skip=None, profile_interval=0):
         assert env_id is not None
+        assert not (start_state_pool is not None and human_demo)
+        assert not ((fused_grayscale or ale_skip) and human_demo)
+        assert not (fused_grayscale and ale_skip)
+        assert frame_buffer_size >= 8
+        assert full_state_mode in self.full_state_modes
+        self.full_state_mode = full_state_mode
         self.display = display or human_demo
         self.env_id = env_id
         self.human_demo = human_demo
         self.fire_reset = False
         self.episode_life = episode_life
+        self.fused_grayscale = fused_grayscale
+        self.ale_skip = ale_skip
+        self.start_state_pool = start_state_pool
+        self.profiler = None
+        if profile_interval > 0:
+            self.profiler = StepProfiler(report_interval=profile_interval, logger=logger)
 
         env = gym.make(self.env_id)
         assert "NoFrameskip" in env.spec.id
+        env = self._profiled(env, 'emulator')
 
         skip = 3 if "SpaceInvaders" in env.spec.id else 4
+        if frame_skip is not None:
+            assert frame_skip > 0
+            skip = frame_skip
 
         # necessary for faster simulation
-        env = AtariWrapper(env, noop_max=no_op_max, skip=1 if human_demo else skip)
-        if not human_demo:
-            env = MaxAndSkipEnv(env, skip=skip)
+        env = self._profiled(AtariWrapper(env, noop_max=no_op_max, skip=1 if human_demo else skip, ale_skip=ale_skip))
+        if fused_grayscale:
+            env = self._profiled(GrayMaxAndSkipEnv(env, skip=skip))
+        elif not human_demo and not ale_skip and skip > 1:
+            env = self._profiled(MaxAndSkipEnv(env, skip=skip))
         if episode_life:
-            env = EpisodicLifeEnv(env)
+            env = self._profiled(EpisodicLifeEnv(env))
         if 'FIRE' in env.unwrapped.get_action_meanings():
             self.fire_reset = True
-            env = FireResetEnv(env)
-        env = WarpFrame(env)
+            env = self._profiled(FireResetEnv(env))
+        if not fused_grayscale:
+            env = self._profiled(WarpFrame(env))
         # override keyboard controls for human demo
         if self.human_demo:
             env = HumanDemoEnv(env)    
             logger.info(env.unwrapped.get_action_meanings())
         self.env = env
 
+        # wrapper handles resolved once, flags are mirrored as attributes
+        self._episodic_life_env = None
+        if episode_life:
+            self._episodic_life_env = get_wrapper_by_name(env, 'EpisodicLifeEnv')
+        self._time_limit = find_time_limit(env)
+        self.was_real_done = True
+
+        # frames [_frame_pos-4, _frame_pos) hold s_t
+        self._frames = np.zeros((84, 84, frame_buffer_size), dtype=np.uint8)
+        self._frame_pos = 0
+
+        self._full_state = None
+        self._full_state1 = None
+        # which of full_state/full_state1 the emulator is currently at
+        self._full_state_live = 'full_state'
+
+        if self.start_state_pool is not None:
+            # pooled resets restore a state without env.reset(), which gym's
+            # OrderEnforcing (gym >= 0.21) requires once before any step
+            self.env.reset()
         self.reset(hard_reset=True)
 
     def reset(self, hard_reset=False):
-        if self.episode_life and hard_reset:
-            get_wrapper_by_name(self.env, 'EpisodicLifeEnv').was_real_done = True
+        if self._episodic_life_env is not None and hard_reset:
+            self._episodic_life_env.was_real_done = True
+        if self.start_state_pool is not None and self._get_real_done(True):
+            full_state, x_t = self.start_state_pool.sample()
+            self.restore_state(full_state, x_t)
+            return
         x_t = self.env.reset()
+        self._start_from(x_t)
+
+    def restore_state(self, full_state, x_t, elapsed_steps=0):
+        """Continue from the ALE full_state whose observation is x_t.
+
+        Wrapper bookkeeping that env.reset() would have done is redone
+        (TimeLimit counter set to elapsed_steps, EpisodicLifeEnv lives) and
+        s_t holds x_t four times, as after a reset.
+        """
+        self.env.unwrapped.restore_full_state(full_state)
+        if self._time_limit is not None:
+            self._time_limit._elapsed_steps = elapsed_steps
+            if hasattr(self._time_limit, '_episode_started_at'):
+                self._time_limit._episode_started_at = time.time()
+        if self._episodic_life_env is not None:
+            self._episodic_life_env.lives = self.env.unwrapped.ale.lives()
+            self._episodic_life_env.was_real_done = False
+        self._start_from(x_t)
+
+    def _start_from(self, x_t):
+        self.was_real_done = self._get_real_done(False)
         self.prev_x_t = x_t
         self.x_t = x_t
-        self.s_t = np.stack((x_t, x_t, x_t, x_t), axis = 2)
-        self.full_state = self.env.unwrapped.clone_full_state()
+        if self._frame_pos + 4 > self._frames.shape[2]:
+            self._frame_pos = 0
+        self._frames[:, :, self._frame_pos:self._frame_pos+4] = x_t[:, :, np.newaxis]
+        self._frame_pos += 4
+        self.s_t = self._frames[:, :, self._frame_pos-4:self._frame_pos]
+        self._full_state = self._capture_full_state()
+        self._full_state_live = 'full_state'
         self.lives = self.env.unwrapped.ale.lives()
         self.reward = 0
         self.terminal = False
         self.loss_life = False
         self.gain_life = False
 
+    def _profiled(self, env, name=None):
+        if self.profiler is None:
+            return env
+        return self.profiler.wrap(env, name or type(env).__name__)
+
     def step(self, action):
+        if self.profiler is not None:
+            self.profiler.start('GameState.step')
         if self.display:
             self.env.render(mode='human' if self.human_demo else '')
 
@@ -72,22 +180,64 @@ class GameState(object):
         elif (self.lives - env_info['ale.lives']) != 0:
             self.loss_life = True
         self.x_t1 = obs
-        self.full_state1 = self.env.unwrapped.clone_full_state()
+        self._full_state1 = self._capture_full_state()
+        self._full_state_live = 'full_state1'
 
         self.reward = reward
         self.terminal = terminal
+        self.was_real_done = self._get_real_done(terminal)
         self.lives = env_info['ale.lives']
-        x_t = np.reshape(obs, (84, 84, 1))
-        self.s_t1 = np.append(self.s_t[:,:,1:], x_t, axis=2)
+        if self._frame_pos == self._frames.shape[2]:
+            # wrap around, s_t keeps pointing at the end of the buffer
+            self._frames[:, :, :3] = self._frames[:, :, -3:]
+            self._frame_pos = 3
+        self._frames[:, :, self._frame_pos] = obs
+        self.s_t1 = self._frames[:, :, self._frame_pos-3:self._frame_pos+1]
+        if self.profiler is not None:
+            self.profiler.stop()
+            self.profiler.step_done()
 
     def update(self):
         self.prev_x_t = self.x_t
         self.x_t = self.x_t1
-        self.full_state = self.full_state1
+        self._full_state = self._full_state1
+        self._full_state_live = 'full_state'
         self.s_t = self.s_t1
+        self._frame_pos += 1
+
+    def _get_real_done(self, terminal):
+        # without EpisodicLifeEnv every terminal is a real one
+        if self._episodic_life_env is None:
+            return terminal
+        return self._episodic_life_env.was_real_done
+
+    def _capture_full_state(self):
+        if self.full_state_mode == 'step':
+            return self.clone_full_state()
+        return None
+
+    @property
+    def full_state(self):
+        if self._full_state is None and self.full_state_mode == 'demand' \
+                and self._full_state_live == 'full_state':
+            self._full_state = self.clone_full_state()
+        return self._full_state
+
+    @property
+    def full_state1(self):
+        if self._full_state1 is None and self.full_state_mode == 'demand' \
+                and self._full_state_live == 'full_state1':
+            self._full_state1 = self.clone_full_state()
+        return self._full_state1
 
     def clone_full_state(self):
-        return self.env.unwrapped.clone_full_state()
+        if self.profiler is None:
+            return self.env.unwrapped.clone_full_state()
+        self.profiler.start('clone_full_state')
+        try:
+            return self.env.unwrapped.clone_full_state()
+        finally:
+            self.profiler.stop()
 
     def restore_full_state(self, state):
         self.env.unwrapped.restore_full_state(state)
@@ -169,7 +319,7 @@ def test_keys(env_id):
             steps = 0
             sys_states.clear()
 
-        if get_wrapper_by_name(test_game.env, 'EpisodicLifeEnv').was_real_done:
+        if test_game.was_real_done:
             break
         elif test_game.terminal:
             test_game.reset(hard_reset=False)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+import multiprocessing
+import traceback
+import numpy as np
+import logging
+
+logger = logging.getLogger("game_state_subproc")
+
+def _shared_array(ctx, typecode, dtype, shape):
+    raw = ctx.RawArray(typecode, int(np.prod(shape)))
+    return raw, np.frombuffer(raw, dtype=dtype).reshape(shape)
+
+def _worker(remote, parent_remote, env_id, start, end, vec_kwargs, shared):
+    from common.game_state.game_state_vec import GameStateVec
+    parent_remote.close()
+    n_envs = shared['n_envs']
+    views = {}
+    for name, (raw, dtype, shape) in shared['arrays'].items():
+        views[name] = np.frombuffer(raw, dtype=dtype).reshape(shape)[start:end]
+
+    vec = None
+    try:
+        vec = GameStateVec(env_id=env_id, n_envs=end-start, **vec_kwargs)
+        while True:
+            cmd, data = remote.recv()
+            if cmd == 'step':
+                _, rewards, terminals, lives, real_dones = vec.step(data, out=views['states'])
+                views['rewards'][:] = rewards
+                views['terminals'][:] = terminals
+                views['lives'][:] = lives
+                views['real_dones'][:] = real_dones
+                remote.send(('ok', None))
+            elif cmd == 'reset':
+                vec.reset(out=views['states'])
+                views['rewards'][:] = 0
+                views['terminals'][:] = False
+                views['lives'][:] = vec.lives
+                views['real_dones'][:] = False
+                remote.send(('ok', vec.action_size))
+            elif cmd == 'screen':
+                remote.send(('ok', vec.get_screen_rgb(data)))
+            elif cmd == 'close':
+                remote.send(('ok', None))
+                break
+            else:
+                remote.send(('error', "unknown command {}".format(cmd)))
+    except KeyboardInterrupt:
+        pass
+    except Exception:
+        remote.send(('error', traceback.format_exc()))
+    finally:
+        if vec is not None:
+            vec.close()
+        remote.close()
+
+class SubprocGameStateVec(object):
+    """GameStateVec split across worker processes.
+
+    Same interface as GameStateVec, but the envs are stepped by n_workers
+    spawned processes so emulation, resizing and max-pooling are not
+    serialized behind the GIL. States, rewards, terminals, lives and
+    real-done flags live in shared memory, each worker writes its own
+    slice, and only the small commands and acknowledgements go over pipes.
+    The returned arrays are overwritten by the next step() or reset().
+    """
+    def __init__(self, env_id=None, n_envs=1, n_workers=None, no_op_max=30, episode_life=True, full_state_mode='off',
+                 fused_grayscale=False, ale_skip=False):
+        assert env_id is not None
+        if n_workers is None:
+            n_workers = min(n_envs, multiprocessing.cpu_count())
+        assert 0 < n_workers <= n_envs
+        self.env_id = env_id
+        self.n_envs = n_envs
+        self.n_workers = n_workers
+
+        ctx = multiprocessing.get_context('spawn')
+        shapes = {
+            'states': ('B', np.uint8, (n_envs, 84, 84, 4)),
+            'rewards': ('f', np.float32, (n_envs,)),
+            'terminals': ('b', np.bool_, (n_envs,)),
+            'lives': ('i', np.int32, (n_envs,)),
+            'real_dones': ('b', np.bool_, (n_envs,)),
+        }
+        shared = {'n_envs': n_envs, 'arrays': {}}
+        for name, (typecode, dtype, shape) in shapes.items():
+            raw, view = _shared_array(ctx, typecode, dtype, shape)
+            shared['arrays'][name] = (raw, dtype, shape)
+            setattr(self, name, view)
+
+        vec_kwargs = {
+            'no_op_max': no_op_max,
+            'episode_life': episode_life,
+            'full_state_mode': full_state_mode,
+            'fused_grayscale': fused_grayscale,
+            'ale_skip': ale_skip,
+        }
+        # contiguous slices of roughly n_envs / n_workers envs per worker
+        bounds = np.linspace(0, n_envs, n_workers + 1).astype(np.int32)
+        self.slices = [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:])]
+        self.remotes = []
+        self.processes = []
+        for start, end in self.slices:
+            remote, work_remote = ctx.Pipe()
+            p = ctx.Process(
+                target=_worker,
+                args=(work_remote, remote, env_id, start, end, vec_kwargs, shared))
+            p.daemon = True
+            p.start()
+            work_remote.close()
+            self.remotes.append(remote)
+            self.processes.append(p)
+        logger.info("SubprocGameStateVec: {} x {} on {} workers".format(n_envs, env_id, n_workers))
+
+        self.closed = False
+        self.action_size = self._call_all('reset')[0]
+
+    def __len__(self):
+        return self.n_envs
+
+    def _recv(self, remote):
+        status, data = remote.recv()
+        if status == 'error':
+            raise RuntimeError("GameState worker failed:\n{}".format(data))
+        return data
+
+    def _call_all(self, cmd, data=None):
+        for remote in self.remotes:
+            remote.send((cmd, data))
+        return [self._recv(remote) for remote in self.remotes]
+
+    def reset(self, out=None):
+        """Hard reset all envs, returns the stacked initial states."""
+        self._call_all('reset')
+        if out is not None:
+            out[:] = self.states
+            return out
+        return self.states
+
+    def step(self, actions, out=None):
+        """Step env i with actions[i].
+        Returns (states, rewards, terminals, lives, real_dones).
+        """
+        assert len(actions) == self.n_envs
+        actions = np.asarray(actions)
+        for remote, (start, end) in zip(self.remotes, self.slices):
+            remote.send(('step', actions[start:end]))
+        for remote in self.remotes:
+            self._recv(remote)
+        states = self.states
+        if out is not None:
+            out[:] = self.states
+            states = out
+        return states, self.rewards, self.terminals, self.lives, self.real_dones
+
+    def get_screen_rgb(self, index=0):
+        for remote, (start, end) in zip(self.remotes, self.slices):
+            if start <= index < end:
+                remote.send(('screen', index - start))
+                return self._recv(remote)
+        raise IndexError(index)
+
+    def close(self):
+        if self.closed:
+            return
+        for remote in self.remotes:
+            try:
+                remote.send(('close', None))
+                remote.recv()
+            except (EOFError, BrokenPipeError):
+                pass
+        for p in self.processes:
+            p.join()
+        self.closed = True
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+import numpy as np
+import logging
+
+from common.game_state.game_state import GameState
+
+logger = logging.getLogger("game_state_vec")
+
+class GameStateVec(object):
+    """N GameState stacks stepped together.
+
+    step(actions) returns the stacked (N, 84, 84, 4) states together with
+    per-env rewards, terminals, lives and real-done flags. An env that
+    reaches a terminal is reset right away (soft reset on a lost life, hard
+    reset on a real done), so the returned state of that env is the first
+    state of its next episode. The returned arrays are reused between steps,
+    copy them to keep them; pass out= to write the states into a buffer of
+    your own (e.g. a rollout slot).
+    """
+    def __init__(self, env_id=None, n_envs=1, no_op_max=30, episode_life=True, full_state_mode='off',
+                 fused_grayscale=False, ale_skip=False, start_state_pool=None):
+        assert env_id is not None
+        assert n_envs > 0
+        self.env_id = env_id
+        self.n_envs = n_envs
+        self.episode_life = episode_life
+        self.games = [
+            GameState(
+                env_id=env_id, display=False, no_op_max=no_op_max,
+                human_demo=False, episode_life=episode_life,
+                full_state_mode=full_state_mode,
+                fused_grayscale=fused_grayscale, ale_skip=ale_skip,
+                start_state_pool=start_state_pool)
+            for _ in range(n_envs)]
+        self.action_size = self.games[0].env.action_space.n
+
+        self.states = np.zeros((n_envs, 84, 84, 4), dtype=np.uint8)
+        self.rewards = np.zeros(n_envs, dtype=np.float32)
+        self.terminals = np.zeros(n_envs, dtype=np.bool_)
+        self.lives = np.zeros(n_envs, dtype=np.int32)
+        self.real_dones = np.zeros(n_envs, dtype=np.bool_)
+        logger.info("GameStateVec: {} x {}".format(n_envs, env_id))
+
+        self.reset()
+
+    def __len__(self):
+        return self.n_envs
+
+    def reset(self, out=None):
+        """Hard reset all envs, returns the stacked initial states."""
+        states = self.states if out is None else out
+        for i, game in enumerate(self.games):
+            game.reset(hard_reset=True)
+            states[i] = game.s_t
+            self.lives[i] = game.lives
+        self.rewards.fill(0)
+        self.terminals.fill(False)
+        self.real_dones.fill(False)
+        return states
+
+    def step(self, actions, out=None):
+        """Step env i with actions[i].
+        Returns (states, rewards, terminals, lives, real_dones).
+        """
+        assert len(actions) == self.n_envs
+        states = self.states if out is None else out
+        for i, game in enumerate(self.games):
+            game.step(actions[i])
+            self.rewards[i] = game.reward
+            self.terminals[i] = game.terminal
+            self.lives[i] = game.lives
+            self.real_dones[i] = False
+
+            if game.terminal:
+                self.real_dones[i] = game.was_real_done
+                game.reset(hard_reset=False)
+            else:
+                game.update()
+            states[i] = game.s_t
+        return states, self.rewards, self.terminals, self.lives, self.real_dones
+
+    def get_screen_rgb(self, index=0):
+        return self.games[index].get_screen_rgb()
+
+    def close(self):
+        for game in self.games:
+            game.close()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+import gym
+import logging
+
+from collections import OrderedDict
+from time import perf_counter
+
+logger = logging.getLogger("profiling")
+
+class StepProfiler(object):
+    """Exclusive time and call counts of nested timed regions.
+
+    start(name)/stop() pairs may nest; time spent in an inner region is
+    subtracted from the enclosing one, so every region reports only its
+    own work (e.g. WarpFrame reports the resize, not the emulation below
+    it). step_done() is called once per GameState step and logs a summary
+    every report_interval steps.
+    """
+    def __init__(self, report_interval=10000, logger=logger):
+        self.report_interval = report_interval
+        self.logger = logger
+        self.exclusive = OrderedDict()
+        self.calls = OrderedDict()
+        self.steps = 0
+        self._stack = []
+
+    def wrap(self, env, name):
+        return ProfileWrapper(env, self, name)
+
+    def start(self, name):
+        self._stack.append([name, perf_counter(), 0.])
+
+    def stop(self):
+        name, start, child = self._stack.pop()
+        elapsed = perf_counter() - start
+        self.exclusive[name] = self.exclusive.get(name, 0.) + elapsed - child
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def step_done(self):
+        self.steps += 1
+        if self.report_interval > 0 and self.steps % self.report_interval == 0:
+            self.report()
+
+    def summary(self):
+        """[(name, calls, seconds, usec per step, share of total)]"""
+        total = sum(self.exclusive.values()) or 1.
+        steps = max(self.steps, 1)
+        return [(name, self.calls[name], seconds, 1e6 * seconds / steps, seconds / total)
+                for name, seconds in self.exclusive.items()]
+
+    def report(self):
+        self.logger.info("env profile over {} steps:".format(self.steps))
+        for name, calls, seconds, usec, share in self.summary():
+            self.logger.info("    {:<24} calls={:<9} total={:.3f}s {:.1f}us/step {:.1%}".format(
+                name, calls, seconds, usec, share))
+
+    def reset(self):
+        self.exclusive.clear()
+        self.calls.clear()
+        self.steps = 0
+
+class ProfileWrapper(gym.Wrapper):
+    """Times step() and reset() of the wrapped env as region name."""
+    def __init__(self, env, profiler, name):
+        gym.Wrapper.__init__(self, env)
+        self.profiler = profiler
+        self.name = name
+        self.reset_name = name + '.reset'
+
+    def step(self, action):
+        self.profiler.start(self.name)
+        try:
+            return self.env.step(action)
+        finally:
+            self.profiler.stop()
+
+    def reset(self, **kwargs):
+        self.profiler.start(self.reset_name)
+        try:
+            return self.env.reset(**kwargs)
+        finally:
+            self.profiler.stop()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+import threading
+import numpy as np
+import logging
+
+from common.game_state.game_state import GameState
+
+logger = logging.getLogger("start_state_pool")
+
+class StartStatePool(object):
+    """Pool of post no-op start states shared by GameStates of one game.
+
+    Each entry is (ALE full state, first observation) taken right after a
+    real reset (gym reset, random no-ops, fire reset) of a generator
+    GameState built with the same options as the consumers. A GameState
+    given this pool restores a random entry instead of replaying the
+    no-ops. With refresh_interval > 0 a background thread replaces one
+    random entry every refresh_interval seconds to keep starts diverse.
+    """
+    def __init__(self, env_id=None, size=32, refresh_interval=1., no_op_max=30,
+                 fused_grayscale=False, ale_skip=False):
+        assert env_id is not None
+        assert size > 0
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self._generator = GameState(
+            env_id=env_id, display=False, no_op_max=no_op_max,
+            human_demo=False, episode_life=True, full_state_mode='off',
+            fused_grayscale=fused_grayscale, ale_skip=ale_skip)
+        self._rng = np.random.RandomState()
+        self._lock = threading.Lock()
+        self._entries = [self._generate() for _ in range(size)]
+        logger.info("StartStatePool: {} x {} refresh_interval={}".format(
+            size, env_id, refresh_interval))
+
+        self._stop = threading.Event()
+        self._thread = None
+        if refresh_interval > 0:
+            self._thread = threading.Thread(target=self._refresh)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _generate(self):
+        self._generator.reset(hard_reset=True)
+        return (self._generator.clone_full_state(), np.copy(self._generator.x_t))
+
+    def _refresh(self):
+        while not self._stop.wait(self.refresh_interval):
+            entry = self._generate()
+            with self._lock:
+                self._entries[self._rng.randint(self.size)] = entry
+
+    def sample(self):
+        """Return a random (full state, observation) entry, both read-only."""
+        with self._lock:
+            return self._entries[self._rng.randint(self.size)]
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._generator.close()
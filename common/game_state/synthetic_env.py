@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+ROM-free stand-in for gym's Atari NoFrameskip envs.
+
+SyntheticAtariEnv exposes what the wrappers and GameState use from
+AtariEnv (ale.act/lives/game_over/getScreenRGB/getScreenGrayscale,
+_action_set, get_action_meanings, clone_full_state/restore_full_state,
+210x160x3 RGB observations) so the whole training stack runs, and can be
+benchmarked or profiled, without atari-py ROMs. Importing common.game_state
+registers SyntheticNoFrameskip-v4 (free emulation) and
+SyntheticSlowNoFrameskip-v4 (busy-waits about as long as an ALE frame);
+register_synthetic_env() registers other step costs and episode lengths.
+"""
+import gym
+import numpy as np
+import logging
+
+from time import perf_counter
+from gym import spaces
+
+logger = logging.getLogger("synthetic_env")
+
+SCREEN_HEIGHT = 210
+SCREEN_WIDTH = 160
+ACTION_MEANINGS = ['NOOP', 'FIRE', 'UP', 'RIGHT', 'LEFT', 'DOWN']
+MOVES = {2: (-2, 0), 3: (0, 2), 4: (0, -2), 5: (2, 0)}
+
+# full state layout (int64): frame, episode frame, lives, player y, player x,
+# target y, target x, lcg state, score
+FRAME, EPISODE_FRAME, LIVES, PLAYER_Y, PLAYER_X, TARGET_Y, TARGET_X, LCG, SCORE = range(9)
+
+class SyntheticALE(object):
+    """Deterministic ALE look-alike.
+
+    A player block is moved by the actions; a target block jumps to a
+    pseudo random (LCG) position every 32 frames and touching it gives +1.
+    A life is lost every episode_frames // lives frames, the game is over
+    after episode_frames frames. Everything is a function of the state
+    vector and the actions, so clone/restore reproduce a run exactly.
+    step_cost seconds are busy-waited per act() to emulate emulation time.
+    """
+    def __init__(self, episode_frames=4500, lives=3, step_cost=0., seed=0):
+        assert episode_frames >= lives > 0
+        self.episode_frames = episode_frames
+        self.max_lives = lives
+        self.life_frames = episode_frames // lives
+        self.step_cost = step_cost
+        self.seed = seed
+        self._state = np.zeros(9, dtype=np.int64)
+        self._rgb = np.zeros((SCREEN_HEIGHT, SCREEN_WIDTH, 3), dtype=np.uint8)
+        self._gray = np.zeros((SCREEN_HEIGHT, SCREEN_WIDTH), dtype=np.uint8)
+        self._drawn_frame = -1
+        self._gray_frame = -1
+        self.reset_game()
+
+    def _rand(self, n):
+        s = self._state
+        s[LCG] = (s[LCG] * 1103515245 + 12345) % (1 << 31)
+        return int(s[LCG] % n)
+
+    def reset_game(self):
+        s = self._state
+        frame = s[FRAME]
+        s[:] = 0
+        s[FRAME] = frame
+        s[LIVES] = self.max_lives
+        s[PLAYER_Y] = SCREEN_HEIGHT // 2
+        s[PLAYER_X] = SCREEN_WIDTH // 2
+        s[LCG] = self.seed + 1
+        s[TARGET_Y] = self._rand(SCREEN_HEIGHT - 8)
+        s[TARGET_X] = self._rand(SCREEN_WIDTH - 8)
+        self._drawn_frame = -1
+
+    def act(self, action):
+        if self.step_cost > 0:
+            end = perf_counter() + self.step_cost
+            while perf_counter() < end:
+                pass
+        s = self._state
+        if self.game_over():
+            return 0
+        s[FRAME] += 1
+        s[EPISODE_FRAME] += 1
+        dy, dx = MOVES.get(int(action), (0, 0))
+        s[PLAYER_Y] = min(max(s[PLAYER_Y] + dy, 0), SCREEN_HEIGHT - 8)
+        s[PLAYER_X] = min(max(s[PLAYER_X] + dx, 0), SCREEN_WIDTH - 8)
+
+        reward = 0
+        if abs(s[PLAYER_Y] - s[TARGET_Y]) < 8 and abs(s[PLAYER_X] - s[TARGET_X]) < 8:
+            reward = 1
+            s[SCORE] += 1
+            s[TARGET_Y] = self._rand(SCREEN_HEIGHT - 8)
+            s[TARGET_X] = self._rand(SCREEN_WIDTH - 8)
+        elif s[EPISODE_FRAME] % 32 == 0:
+            s[TARGET_Y] = self._rand(SCREEN_HEIGHT - 8)
+            s[TARGET_X] = self._rand(SCREEN_WIDTH - 8)
+        if s[EPISODE_FRAME] % self.life_frames == 0:
+            s[LIVES] = max(s[LIVES] - 1, 0)
+        return reward
+
+    def game_over(self):
+        s = self._state
+        return bool(s[LIVES] == 0 or s[EPISODE_FRAME] >= self.episode_frames)
+
+    def lives(self):
+        return int(self._state[LIVES])
+
+    def getFrameNumber(self):
+        return int(self._state[FRAME])
+
+    def getEpisodeFrameNumber(self):
+        return int(self._state[EPISODE_FRAME])
+
+    def getScreenDims(self):
+        return SCREEN_WIDTH, SCREEN_HEIGHT
+
+    def _draw(self):
+        s = self._state
+        if self._drawn_frame == s[FRAME]:
+            return
+        rgb = self._rgb
+        rgb[:] = (0, 28 * s[LIVES] % 256, 64)
+        rgb[:4, :min(int(s[SCORE]), SCREEN_WIDTH)] = 200
+        y, x = int(s[PLAYER_Y]), int(s[PLAYER_X])
+        rgb[y:y+8, x:x+8] = (236, 236, 236)
+        y, x = int(s[TARGET_Y]), int(s[TARGET_X])
+        rgb[y:y+8, x:x+8] = (200, 72, 72)
+        self._drawn_frame = s[FRAME]
+        self._gray_frame = -1
+
+    def getScreenRGB(self, screen_data=None):
+        self._draw()
+        if screen_data is None:
+            return self._rgb.copy()
+        screen_data.reshape(self._rgb.shape)[:] = self._rgb
+        return screen_data
+
+    getScreenRGB2 = getScreenRGB
+
+    def getScreenGrayscale(self, screen_data=None):
+        self._draw()
+        if self._gray_frame != self._drawn_frame:
+            # integer luminance, close to ALE's grayscale palette
+            rgb = self._rgb.astype(np.uint16)
+            self._gray[:] = (77 * rgb[:, :, 0] + 150 * rgb[:, :, 1] + 29 * rgb[:, :, 2]) >> 8
+            self._gray_frame = self._drawn_frame
+        if screen_data is None:
+            return self._gray.copy()[:, :, np.newaxis]
+        screen_data.reshape(self._gray.shape)[:] = self._gray
+        return screen_data
+
+    def getInt(self, key):
+        return 1 if key in (b'frame_skip', 'frame_skip') else 0
+
+    def getFloat(self, key):
+        return 0.
+
+    def cloneSystemState(self):
+        return self._state.copy()
+
+    def restoreSystemState(self, state):
+        self._state[:] = state
+        self._drawn_frame = -1
+
+    cloneState = cloneSystemState
+    restoreState = restoreSystemState
+
+class SyntheticAtariEnv(gym.Env):
+    """AtariEnv (frameskip=1, RGB observations) on top of SyntheticALE."""
+    metadata = {'render.modes': ['human', 'rgb_array']}
+
+    def __init__(self, episode_frames=4500, lives=3, step_cost=0.):
+        self.ale = SyntheticALE(episode_frames=episode_frames, lives=lives, step_cost=step_cost)
+        self.frameskip = 1
+        self._action_set = np.arange(len(ACTION_MEANINGS))
+        self.action_space = spaces.Discrete(len(self._action_set))
+        self.observation_space = spaces.Box(
+            low=0, high=255, shape=(SCREEN_HEIGHT, SCREEN_WIDTH, 3), dtype=np.uint8)
+        self.viewer = None
+
+    def seed(self, seed=None):
+        self.ale.seed = 0 if seed is None else seed
+        return [self.ale.seed]
+
+    def step(self, a):
+        reward = self.ale.act(self._action_set[a])
+        return self.ale.getScreenRGB(), reward, self.ale.game_over(), {'ale.lives': self.ale.lives()}
+
+    def reset(self):
+        self.ale.reset_game()
+        return self.ale.getScreenRGB()
+
+    def render(self, mode='human'):
+        img = self.ale.getScreenRGB()
+        if mode == 'rgb_array':
+            return img
+        elif mode == 'human':
+            from gym.envs.classic_control import rendering
+            if self.viewer is None:
+                self.viewer = rendering.SimpleImageViewer()
+            self.viewer.imshow(img)
+            return self.viewer.isopen
+
+    def close(self):
+        if self.viewer is not None:
+            self.viewer.close()
+            self.viewer = None
+
+    def get_action_meanings(self):
+        return list(ACTION_MEANINGS)
+
+    def clone_state(self):
+        return self.ale.cloneState()
+
+    def restore_state(self, state):
+        self.ale.restoreState(state)
+
+    def clone_full_state(self):
+        # uint8 view like ALE's encoded system state
+        return self.ale.cloneSystemState().view(np.uint8)
+
+    def restore_full_state(self, state):
+        self.ale.restoreSystemState(np.asarray(state, dtype=np.uint8).view(np.int64))
+
+def register_synthetic_env(env_id, episode_frames=4500, lives=3, step_cost=0.):
+    """Register a SyntheticAtariEnv under env_id (must contain NoFrameskip)."""
+    assert "NoFrameskip" in env_id
+    try:
+        gym.envs.registration.register(
+            id=env_id,
+            entry_point='common.game_state.synthetic_env:SyntheticAtariEnv',
+            kwargs={'episode_frames': episode_frames, 'lives': lives, 'step_cost': step_cost},
+            max_episode_steps=400000,
+            nondeterministic=False)
+    except gym.error.Error:
+        # already registered, e.g. module imported again in a worker
+        pass
+
+register_synthetic_env('SyntheticNoFrameskip-v4')
+register_synthetic_env('SyntheticSlowNoFrameskip-v4', step_cost=5e-5)
@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+
+from common.game_state import GameState
+
+class TestAtariWrapper(unittest.TestCase):
+
+  def run_game(self, n_steps=1200, **kwargs):
+    """Observations, rewards and terminals of a fixed action sequence"""
+    game_state = GameState(env_id='SyntheticNoFrameskip-v4', no_op_max=1, **kwargs)
+    actions = np.random.RandomState(0).randint(game_state.env.action_space.n, size=n_steps)
+    frames = [np.copy(game_state.x_t)]
+    rewards = []
+    terminals = []
+    for a in actions:
+      game_state.step(a)
+      frames.append(np.copy(game_state.x_t1))
+      rewards.append(game_state.reward)
+      terminals.append(game_state.terminal)
+      if game_state.terminal:
+        game_state.reset(hard_reset=False)
+        frames.append(np.copy(game_state.x_t))
+      else:
+        game_state.update()
+    game_state.close()
+    return np.array(frames), np.array(rewards), np.array(terminals)
+
+  def test_fused_grayscale(self):
+    frames, rewards, terminals = self.run_game()
+    fused_frames, fused_rewards, fused_terminals = self.run_game(fused_grayscale=True)
+    self.assertTrue( np.any(terminals) )
+    self.assertTrue( np.array_equal(rewards, fused_rewards) )
+    self.assertTrue( np.array_equal(terminals, fused_terminals) )
+    # ALE grayscale screens vs RGB -> cvtColor only differ by rounding, up
+    # to one gray level, except where the max-pooled frames overlap two
+    # colours: the max of the luminances is not the luminance of the RGB max
+    self.assertEqual( frames.shape, fused_frames.shape )
+    diff = np.abs(frames.astype(np.int16) - fused_frames.astype(np.int16))
+    self.assertLess( np.mean(diff > 1), 1e-5 )
+
+  def test_ale_skip(self):
+    frames, rewards, terminals = self.run_game()
+    ale_frames, ale_rewards, ale_terminals = self.run_game(ale_skip=True)
+    self.assertTrue( np.any(terminals) )
+    # same frames played and max-pooled, only without the gym step per frame
+    self.assertTrue( np.array_equal(frames, ale_frames) )
+    self.assertTrue( np.array_equal(rewards, ale_rewards) )
+    self.assertTrue( np.array_equal(terminals, ale_terminals) )
+
+if __name__ == '__main__':
+  unittest.main()
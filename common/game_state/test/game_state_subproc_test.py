@@ -0,0 +1,35 @@
+import unittest
+import numpy as np
+
+from common.game_state import GameStateVec, SubprocGameStateVec
+
+class TestSubprocGameStateVec(unittest.TestCase):
+
+  def test_matches_game_state_vec(self):
+    # the spawned workers register the synthetic envs when importing common.game_state
+    env_id = 'SyntheticNoFrameskip-v4'
+    n_envs = 3
+    vec = GameStateVec(env_id=env_id, n_envs=n_envs, no_op_max=1)
+    subproc = SubprocGameStateVec(env_id=env_id, n_envs=n_envs, n_workers=2, no_op_max=1)
+    try:
+      self.assertEqual( subproc.action_size, vec.action_size )
+      self.assertEqual( subproc.slices, [(0, 1), (1, 3)] )
+      self.assertTrue( np.array_equal(subproc.reset(), vec.reset()) )
+
+      actions = np.random.RandomState(0).randint(vec.action_size, size=(1200, n_envs))
+      n_terminals = 0
+      for a in actions:
+        expected = vec.step(a)
+        result = subproc.step(a)
+        for x, y in zip(expected, result):
+          self.assertTrue( np.array_equal(x, y) )
+        n_terminals += int(np.sum(expected[2]))
+      # lost lives and game overs were reset the same way
+      self.assertTrue( n_terminals > 0 )
+      self.assertTrue( np.array_equal(subproc.get_screen_rgb(2), vec.get_screen_rgb(2)) )
+    finally:
+      subproc.close()
+      vec.close()
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,21 +1,25 @@
 import unittest
 import numpy as np
 
-from game_state import GameState
+from common.game_state import GameState, register_synthetic_env
+
+# short episodes so that lost lives and real dones show up quickly
+register_synthetic_env('SyntheticShortNoFrameskip-v4', episode_frames=400, lives=2)
 
 class TestSequenceFunctions(unittest.TestCase):
 
   def test_process(self):
-    game_state = GameState(0)
-
-    before_s_t = np.array( game_state.s_t )
+    game_state = GameState(env_id='SyntheticNoFrameskip-v4')
 
     for i in range(1000):
-      bef1 = game_state.s_t[:,:,1]
-      bef2 = game_state.s_t[:,:,2]
-      bef3 = game_state.s_t[:,:,3]
+      bef1 = np.array(game_state.s_t[:,:,1])
+      bef2 = np.array(game_state.s_t[:,:,2])
+      bef3 = np.array(game_state.s_t[:,:,3])
 
-      game_state.process(1)
+      game_state.step(i % game_state.env.action_space.n)
+      if game_state.terminal:
+        game_state.reset(hard_reset=False)
+        continue
       game_state.update()
 
       aft0 = game_state.s_t[:,:,0]
@@ -23,24 +27,47 @@ class TestSequenceFunctions(unittest.TestCase):
       aft2 = game_state.s_t[:,:,2]
 
       # values should be shifted
-      self.assertTrue( (bef1.flatten() == aft0.flatten()).all() )
-      self.assertTrue( (bef2.flatten() == aft1.flatten()).all() )
-      self.assertTrue( (bef3.flatten() == aft2.flatten()).all() )
-
-      # all element should be less [0.0~1.0]
-      self.assertTrue( np.less_equal(bef1, 1.0).all() )
-      self.assertTrue( np.less_equal(bef2, 1.0).all() )
-      self.assertTrue( np.less_equal(bef3, 1.0).all() )
-      self.assertTrue( np.greater_equal(bef1, 0.0).all() )
-      self.assertTrue( np.greater_equal(bef2, 0.0).all() )
-      self.assertTrue( np.greater_equal(bef3, 0.0).all() )
-
-      self.assertTrue( np.less_equal(aft0, 1.0).all() )
-      self.assertTrue( np.less_equal(aft1, 1.0).all() )
-      self.assertTrue( np.less_equal(aft2, 1.0).all() )
-      self.assertTrue( np.greater_equal(aft0, 0.0).all() )
-      self.assertTrue( np.greater_equal(aft1, 0.0).all() )
-      self.assertTrue( np.greater_equal(aft2, 0.0).all() )
+      self.assertTrue( (bef1 == aft0).all() )
+      self.assertTrue( (bef2 == aft1).all() )
+      self.assertTrue( (bef3 == aft2).all() )
+      self.assertTrue( (game_state.s_t[:,:,3] == game_state.x_t).all() )
+      self.assertEqual( game_state.s_t.dtype, np.uint8 )
+      self.assertEqual( game_state.s_t.shape, (84, 84, 4) )
+    game_state.close()
+
+  def test_restore_full_state(self):
+    game_state = GameState(env_id='SyntheticNoFrameskip-v4', full_state_mode='step')
+    full_state = game_state.full_state
+    x_t = np.copy(game_state.x_t)
+    actions = np.random.RandomState(0).randint(game_state.env.action_space.n, size=100)
+
+    runs = []
+    for _ in range(2):
+      game_state.restore_state(full_state, x_t)
+      frames = []
+      for a in actions:
+        game_state.step(a)
+        frames.append(np.copy(game_state.x_t1))
+        game_state.update()
+      runs.append(np.array(frames))
+    self.assertTrue( np.array_equal(runs[0], runs[1]) )
+    game_state.close()
+
+  def test_real_done(self):
+    game_state = GameState(env_id='SyntheticShortNoFrameskip-v4', no_op_max=1)
+    terminals = []
+    while True:
+      game_state.step(0)
+      if game_state.terminal:
+        terminals.append(game_state.was_real_done)
+        if game_state.was_real_done:
+          break
+        game_state.reset(hard_reset=False)
+      else:
+        game_state.update()
+    # one soft reset per lost life, the last life ends the game
+    self.assertEqual( terminals, [False, True] )
+    game_state.close()
 
 if __name__ == '__main__':
   unittest.main()
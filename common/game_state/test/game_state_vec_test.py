@@ -0,0 +1,54 @@
+import unittest
+import numpy as np
+
+from common.game_state import GameState, GameStateVec, register_synthetic_env
+
+# short episodes so that lost lives and real dones show up quickly
+register_synthetic_env('SyntheticShortNoFrameskip-v4', episode_frames=400, lives=2)
+
+class TestGameStateVec(unittest.TestCase):
+
+  def test_step_matches_game_states(self):
+    env_id = 'SyntheticShortNoFrameskip-v4'
+    n_envs = 3
+    vec = GameStateVec(env_id=env_id, n_envs=n_envs, no_op_max=1)
+    games = [GameState(env_id=env_id, no_op_max=1) for _ in range(n_envs)]
+    actions = np.random.RandomState(0).randint(vec.action_size, size=(250, n_envs))
+
+    out = np.zeros((n_envs, 84, 84, 4), dtype=np.uint8)
+    states = vec.reset(out=out)
+    self.assertIs( states, out )
+    for i, game in enumerate(games):
+      self.assertTrue( np.array_equal(out[i], game.s_t) )
+
+    n_terminals = 0
+    real_dones = []
+    for a in actions:
+      states, rewards, terminals, lives, vec_real_dones = vec.step(a, out=out)
+      self.assertIs( states, out )
+      for i, game in enumerate(games):
+        game.step(a[i])
+        self.assertEqual( rewards[i], game.reward )
+        self.assertEqual( terminals[i], game.terminal )
+        self.assertEqual( lives[i], game.lives )
+        if game.terminal:
+          self.assertEqual( vec_real_dones[i], game.was_real_done )
+          real_dones.append(bool(vec_real_dones[i]))
+          n_terminals += 1
+          # reset right away, the state is the first one of the next episode
+          game.reset(hard_reset=False)
+        else:
+          self.assertFalse( vec_real_dones[i] )
+          game.update()
+        self.assertTrue( np.array_equal(out[i], game.s_t) )
+
+    # 250 steps of 4 frames cover two 200 frame lives per env
+    self.assertTrue( n_terminals >= 2 * n_envs )
+    self.assertIn( True, real_dones )
+    self.assertIn( False, real_dones )
+    vec.close()
+    for game in games:
+      game.close()
+
+if __name__ == '__main__':
+  unittest.main()
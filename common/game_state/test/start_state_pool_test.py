@@ -0,0 +1,59 @@
+import unittest
+import numpy as np
+
+from unittest import mock
+from common.game_state import GameState, StartStatePool, SyntheticAtariEnv, register_synthetic_env
+
+# short episodes so that lost lives and real dones show up quickly
+register_synthetic_env('SyntheticShortNoFrameskip-v4', episode_frames=400, lives=2)
+
+class TestStartStatePool(unittest.TestCase):
+
+  def test_sample(self):
+    pool = StartStatePool(env_id='SyntheticNoFrameskip-v4', size=4, refresh_interval=0, no_op_max=5)
+    entries = [pool.sample() for _ in range(20)]
+    for full_state, x_t in entries:
+      self.assertTrue( any(full_state is e[0] for e in pool._entries) )
+      self.assertEqual( x_t.shape, (84, 84) )
+    pool.close()
+
+  def test_pooled_reset(self):
+    env_id = 'SyntheticShortNoFrameskip-v4'
+    # no_op_max=1 makes every real reset the same, pooled or not
+    pool = StartStatePool(env_id=env_id, size=2, refresh_interval=0, no_op_max=1)
+    reference = GameState(env_id=env_id, no_op_max=1)
+    reset = SyntheticAtariEnv.reset
+    with mock.patch.object(SyntheticAtariEnv, 'reset', autospec=True, side_effect=reset) as env_reset:
+      game_state = GameState(env_id=env_id, no_op_max=1, start_state_pool=pool)
+      # the env is reset once before the first pooled restore
+      self.assertEqual( env_reset.call_count, 1 )
+
+      actions = np.random.RandomState(0).randint(game_state.env.action_space.n, size=250)
+      real_dones = 0
+      for a in actions:
+        self.assertTrue( np.array_equal(game_state.s_t, reference.s_t) )
+        self.assertEqual( game_state.lives, reference.lives )
+        for game in [game_state, reference]:
+          game.step(a)
+        self.assertEqual( game_state.reward, reference.reward )
+        self.assertEqual( game_state.terminal, reference.terminal )
+        self.assertEqual( game_state.was_real_done, reference.was_real_done )
+        if reference.terminal:
+          real_done = reference.was_real_done
+          real_dones += int(real_done)
+          reference.reset(hard_reset=False)
+          n_env_resets = env_reset.call_count
+          game_state.reset(hard_reset=False)
+          if real_done:
+            # real dones restore a pooled state instead of resetting the env
+            self.assertEqual( env_reset.call_count, n_env_resets )
+        else:
+          for game in [game_state, reference]:
+            game.update()
+      self.assertTrue( real_dones > 0 )
+    game_state.close()
+    reference.close()
+    pool.close()
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1 +1,2 @@
 from .replay_memory import ReplayMemory
+from .action_replay import ActionReplay
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+import multiprocessing
+import gzip
+import numpy as np
+import logging
+
+from common.replay_memory.replay_memory import ReplayMemory
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+logger = logging.getLogger("action_replay")
+
+SOFT_RESET = -1
+
+class ActionReplay(object):
+    """Compact demo: ALE start state, per-frame actions and checkpoints.
+
+    Instead of every preprocessed frame and a full state per transition,
+    only the ALE full state right after the real reset, the action of every
+    emulator frame (the demo is played at skip=1) and the soft resets after
+    a lost life are recorded. Every checkpoint_interval events a
+    checkpoint (event index, full state, observation, episode frame number)
+    is taken right after a stored transition so that segments can be
+    replayed independently.
+
+    regenerate() replays the events through a display-less GameState with
+    frame_skip=1 and applies the same storing rule as CollectDemonstration
+    (every skip-th episode frame, max of the last two observations, first
+    action and summed reward of the group) to rebuild the ReplayMemory.
+    ALE is deterministic given its full state, so the rebuilt memory
+    matches the one recorded alongside; a different skip gives a different
+    subsampling of the same play.
+    """
+    def __init__(self, env_id=None, episode_life=True, skip=4, phi_length=4,
+                 checkpoint_interval=1000):
+        self.env_id = env_id
+        self.episode_life = episode_life
+        self.skip = skip
+        self.phi_length = phi_length
+        self.checkpoint_interval = checkpoint_interval
+        self.num_actions = 0
+        self.full_state_size = 0
+        self.initial_state = None
+        self.initial_obs = None
+        self.initial_screen = None
+        self.initial_frame_number = 0
+        self.events = []
+        self.checkpoints = []
+        self._last_checkpoint = 0
+
+    def start(self, game_state):
+        """Record the state right after a real reset of game_state."""
+        self.initial_state = game_state.clone_full_state()
+        self.initial_obs = np.copy(game_state.x_t)
+        self.initial_screen = np.copy(game_state.get_screen_rgb())
+        self.initial_frame_number = game_state.get_episode_frame_number()
+        self.num_actions = game_state.env.action_space.n
+        self.full_state_size = self.initial_state.shape[0]
+        self.events = []
+        self.checkpoints = []
+        self._last_checkpoint = 0
+
+    def add_step(self, action):
+        self.events.append(action)
+
+    def add_soft_reset(self):
+        self.events.append(SOFT_RESET)
+
+    def add_checkpoint(self, game_state):
+        """Checkpoint right after a stored, non-terminal transition
+        (before game_state.update())."""
+        index = len(self.events)
+        if index - self._last_checkpoint < self.checkpoint_interval:
+            return
+        self.checkpoints.append((
+            index, game_state.clone_full_state(), np.copy(game_state.x_t1),
+            game_state.get_episode_frame_number()))
+        self._last_checkpoint = index
+
+    def segments(self, skip=None):
+        """Split the events at the checkpoints.
+        Returns [(start, end, checkpoint or None)], None is the initial state.
+
+        A segment must start on a group boundary of skip (default: the
+        collection skip), otherwise the group straddling the checkpoint
+        would lose its first action and pending reward. Checkpoints follow
+        a non-terminal stored transition, so only those at an episode frame
+        number divisible by skip are used.
+        """
+        if skip is None:
+            skip = self.skip
+        checkpoints = [c for c in self.checkpoints if c[3] % skip == 0]
+        bounds = [0] + [c[0] for c in checkpoints] + [len(self.events)]
+        starts = [None] + checkpoints
+        return [(bounds[i], bounds[i+1], starts[i]) for i in range(len(starts))]
+
+    def save(self, name=None, folder=None):
+        assert name is not None
+        assert folder is not None
+        data = {'env_id': self.env_id,
+                'episode_life': self.episode_life,
+                'skip': self.skip,
+                'phi_length': self.phi_length,
+                'checkpoint_interval': self.checkpoint_interval,
+                'num_actions': self.num_actions,
+                'full_state_size': self.full_state_size,
+                'initial_state': self.initial_state,
+                'initial_obs': self.initial_obs,
+                'initial_screen': self.initial_screen,
+                'initial_frame_number': self.initial_frame_number,
+                'events': np.asarray(self.events, dtype=np.int16),
+                'checkpoints': self.checkpoints}
+        file = folder + '/{}-action-replay.pkl.gz'.format(name)
+        with gzip.open(file, 'wb') as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+        logger.info("Saved action replay {} ({} events, {} checkpoints)".format(
+            file, len(self.events), len(self.checkpoints)))
+
+    def load(self, name=None, folder=None):
+        assert name is not None
+        assert folder is not None
+        file = folder + '/{}-action-replay.pkl.gz'.format(name)
+        with gzip.open(file, 'rb') as f:
+            data = pickle.load(f)
+        for key, value in data.items():
+            setattr(self, key, value)
+        self.events = list(self.events)
+        self._last_checkpoint = self.checkpoints[-1][0] if self.checkpoints else 0
+
+    def regenerate(self, skip=None, processes=0):
+        """Rebuild the ReplayMemory by replaying the events.
+
+        skip defaults to the skip used at collection. With processes > 0
+        the segments between checkpoints are replayed by a pool of spawned
+        worker processes, each with its own GameState. With another skip
+        only the checkpoints on its group boundaries split the events.
+        """
+        if skip is None:
+            skip = self.skip
+        events = np.asarray(self.events, dtype=np.int16)
+        jobs = []
+        for start, end, checkpoint in self.segments(skip):
+            if checkpoint is None:
+                checkpoint = (0, self.initial_state, self.initial_obs, self.initial_frame_number)
+                initial = True
+            else:
+                initial = False
+            final = end == len(events)
+            jobs.append((events[start:end], checkpoint[1:], initial, final, skip, self.phi_length))
+
+        if processes > 0:
+            ctx = multiprocessing.get_context('spawn')
+            pool = ctx.Pool(
+                processes, initializer=_init_worker,
+                initargs=(self.env_id, self.episode_life))
+            try:
+                results = pool.map(_replay_job, jobs)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            game_state = _make_game_state(self.env_id, self.episode_life)
+            try:
+                results = [replay_segment(game_state, *job) for job in jobs]
+            finally:
+                game_state.close()
+
+        size = sum(len(r[1]) for r in results)
+        replay_memory = ReplayMemory(
+            self.initial_obs.shape[1], self.initial_obs.shape[0],
+            np.random.RandomState(),
+            max_steps=size,
+            phi_length=self.phi_length,
+            num_actions=self.num_actions,
+            wrap_memory=False,
+            full_state_size=self.full_state_size)
+        for transitions in results:
+            for transition in zip(*transitions):
+                replay_memory.add(*transition[:5], fullstate=transition[5])
+        logger.info("Regenerated {} transitions from {} events".format(size, len(events)))
+        return replay_memory
+
+def replay_segment(game_state, events, start_point, initial, final, skip, phi_length):
+    """Replay one segment of events starting at start_point
+    (full state, observation, elapsed frames).
+
+    Mirrors CollectDemonstration.run: the last event of the final segment
+    is the step the collection stopped at and is stored as terminal.
+    Returns (imgs, actions, rewards, terminals, lives, full_states) lists.
+    """
+    transitions = ([], [], [], [], [], [])
+
+    def store_reset():
+        img = np.maximum(game_state.prev_x_t, game_state.x_t)
+        for _ in range(phi_length):
+            for values, value in zip(transitions, (
+                    img, 0, game_state.reward, game_state.terminal,
+                    game_state.lives, np.copy(game_state.full_state))):
+                values.append(value)
+
+    full_state, obs, elapsed_steps = start_point
+    game_state.restore_state(full_state, obs, elapsed_steps=elapsed_steps)
+    if initial:
+        store_reset()
+
+    first_action = None
+    rew = 0
+    last = len(events) - 1
+    for i, event in enumerate(events):
+        if event == SOFT_RESET:
+            game_state.reset(hard_reset=False)
+            store_reset()
+            continue
+
+        if first_action is None:
+            first_action = int(event)
+        game_state.step(int(event))
+        rew += game_state.reward
+        terminal = final and i == last
+
+        if game_state.get_episode_frame_number() % skip == 0 or terminal or game_state.terminal:
+            img = np.maximum(game_state.x_t, game_state.x_t1)
+            for values, value in zip(transitions, (
+                    img, first_action, rew, terminal or game_state.terminal,
+                    game_state.lives, np.copy(game_state.full_state1))):
+                values.append(value)
+            first_action = None
+            rew = 0
+
+            if terminal or game_state.was_real_done:
+                break
+            if game_state.terminal:
+                continue
+
+        game_state.update()
+    return transitions
+
+def _make_game_state(env_id, episode_life):
+    from common.game_state import GameState
+    return GameState(
+        env_id=env_id, display=False, human_demo=False,
+        episode_life=episode_life, full_state_mode='demand', frame_skip=1)
+
+_worker_game_state = None
+
+def _init_worker(env_id, episode_life):
+    global _worker_game_state
+    _worker_game_state = _make_game_state(env_id, episode_life)
+
+def _replay_job(job):
+    return replay_segment(_worker_game_state, *job)
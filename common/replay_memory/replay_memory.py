@@ -176,8 +176,8 @@ class ReplayMemory(object):
             reward -- reward received after taking the action
             terminal -- boolean indicating whether the episode ended
             after this time step
+            fullstate -- emulator state, None stores zeros
         """
-        assert fullstate is not None
         if not self.wrap_memory and self.size == self.max_steps:
             logger.warn("Memory is full. Data not added!")
             return
@@ -192,7 +192,10 @@ class ReplayMemory(object):
         self.rewards[idx] = reward
         self.terminal[idx] = terminal
         self.lives[idx] = lives
-        self.full_state[idx] = fullstate
+        if fullstate is None:
+            self.full_state[idx] = 0
+        else:
+            self.full_state[idx] = fullstate
 
         if self.wrap_memory and self.size == self.max_steps:
             self.bottom = (self.bottom + 1) % self.max_steps
@@ -0,0 +1,65 @@
+import copy
+import unittest
+import numpy as np
+
+from common.game_state import register_synthetic_env
+from common.replay_memory.action_replay import ActionReplay, _make_game_state
+
+# short episodes so that the demo crosses a lost life
+register_synthetic_env('SyntheticShortNoFrameskip-v4', episode_frames=400, lives=2)
+
+class TestActionReplay(unittest.TestCase):
+
+  def record(self, n_frames=350, skip=4):
+    """Record a random demo the way CollectDemonstration does"""
+    action_replay = ActionReplay(
+      env_id='SyntheticShortNoFrameskip-v4', episode_life=True, skip=skip,
+      checkpoint_interval=30)
+    game_state = _make_game_state(action_replay.env_id, action_replay.episode_life)
+    action_replay.start(game_state)
+    actions = np.random.RandomState(0).randint(game_state.env.action_space.n, size=n_frames)
+    for t, action in enumerate(actions):
+      game_state.step(action)
+      action_replay.add_step(action)
+      terminal = t == n_frames - 1
+      if game_state.get_episode_frame_number() % skip == 0 or terminal or game_state.terminal:
+        if terminal or game_state.was_real_done:
+          break
+        if game_state.terminal:
+          game_state.reset(hard_reset=False)
+          action_replay.add_soft_reset()
+          continue
+        action_replay.add_checkpoint(game_state)
+      game_state.update()
+    game_state.close()
+    return action_replay
+
+  def assert_same_memory(self, a, b):
+    self.assertEqual( a.size, b.size )
+    for name in ['imgs', 'actions', 'rewards', 'terminal', 'lives', 'full_state']:
+      self.assertTrue( np.array_equal(getattr(a, name)[:a.size], getattr(b, name)[:b.size]), name )
+
+  def test_regenerate_across_checkpoints(self):
+    action_replay = self.record()
+    self.assertIn( -1, action_replay.events )
+    self.assertTrue( len(action_replay.checkpoints) > 2 )
+    # the same demo replayed in one piece from the initial state
+    whole = copy.copy(action_replay)
+    whole.checkpoints = []
+
+    for skip in [4, 3, 2]:
+      self.assert_same_memory(action_replay.regenerate(skip=skip), whole.regenerate(skip=skip))
+
+  def test_segments(self):
+    action_replay = self.record()
+    # every checkpoint is at a transition stored with the collection skip
+    self.assertEqual( len(action_replay.segments()), len(action_replay.checkpoints) + 1 )
+    self.assertEqual( len(action_replay.segments(skip=4)), len(action_replay.checkpoints) + 1 )
+    # other skips only split where their groups end too
+    self.assertTrue( 1 < len(action_replay.segments(skip=3)) < len(action_replay.checkpoints) + 1 )
+    for start, _, checkpoint in action_replay.segments(skip=3)[1:]:
+      self.assertEqual( checkpoint[3] % 3, 0 )
+      self.assertEqual( start, checkpoint[0] )
+
+if __name__ == '__main__':
+  unittest.main()
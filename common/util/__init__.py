@@ -1,3 +1,6 @@
 from .util import *
 from .log_formatter import LogFormatter
-from .similarity_measures import Similarity
+from .similarity_measures import Similarity, pairwise_distances
+from .video_recorder import VideoRecorder
+from .artifact_writer import ArtifactWriter
+from .returns import discounted_returns, look_back_shaping
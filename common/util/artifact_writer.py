@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+import threading
+import multiprocessing
+import logging
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+logger = logging.getLogger("artifact_writer")
+
+def _run_jobs(jobs):
+    while True:
+        job = jobs.get()
+        try:
+            if job is None:
+                break
+            fn, args, kwargs = job
+            fn(*args, **kwargs)
+        except Exception:
+            logger.exception("Artifact job failed")
+        finally:
+            jobs.task_done()
+
+class ArtifactWriter(object):
+    """Background service for slow evaluation side outputs.
+
+    Jobs (videos, replay memory dumps) are placed on a bounded queue and run
+    in order by a worker thread, or by a separate process when
+    use_process=True, in which case functions and arguments must be
+    picklable. submit() returns immediately unless max_queue_size jobs are
+    still pending, which bounds the memory held by queued frame buffers.
+    """
+    def __init__(self, max_queue_size=4, use_process=False):
+        self.use_process = use_process
+        if use_process:
+            ctx = multiprocessing.get_context('spawn')
+            self._jobs = ctx.JoinableQueue(maxsize=max_queue_size)
+            self._worker = ctx.Process(target=_run_jobs, args=(self._jobs,))
+        else:
+            self._jobs = queue.Queue(maxsize=max_queue_size)
+            self._worker = threading.Thread(target=_run_jobs, args=(self._jobs,))
+        self._worker.daemon = True
+        self._worker.start()
+        logger.info("ArtifactWriter: {} max_queue_size={}".format(
+            "process" if use_process else "thread", max_queue_size))
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs). Arguments must not be modified afterwards."""
+        assert self._worker is not None
+        self._jobs.put((fn, args, kwargs))
+
+    def join(self):
+        """Block until all submitted jobs are done."""
+        self._jobs.join()
+
+    def close(self):
+        """Finish pending jobs and stop the worker."""
+        if self._worker is None:
+            return
+        self._jobs.put(None)
+        self._worker.join()
+        self._worker = None
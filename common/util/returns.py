@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+n-step returns of actor-critic rollouts.
+
+Rewards are in time order, either (T,) for one env or (T, n_envs) for
+lockstep envs. Results are written to out when given so that rollout
+buffers can be preallocated.
+"""
+import numpy as np
+
+from scipy.signal import lfilter
+
+def h(z, eps=10**-2):
+    """Value rescaling of the transformed Bellman operator (Pohlen et al. 2018)"""
+    return (np.sign(z) * (np.sqrt(np.abs(z) + 1.) - 1.)) + (eps * z)
+
+def h_inv(z, eps=10**-2):
+    return np.sign(z) * (np.square((np.sqrt(1 + 4 * eps * (np.abs(z) + 1 + eps)) - 1) / (2 * eps)) - 1)
+
+def discounted_returns(rewards, gamma, bootstrap, terminals=None, transformed=False, out=None):
+    """R_t = r_t + gamma * R_{t+1} with R_T = bootstrap.
+
+    terminals[t] cuts the bootstrapping after step t (lost life or game
+    over inside the rollout). transformed=True uses
+    R_t = h(r_t + gamma * h_inv(R_{t+1})) instead. Without terminals the
+    linear case is one lfilter pass over the reversed rewards.
+    """
+    rewards = np.asarray(rewards, dtype=np.float32)
+    if out is None:
+        out = np.empty(rewards.shape, dtype=np.float32)
+    if terminals is None and not transformed:
+        # y[n] = x[n] + gamma * y[n-1] on the reversed sequence, y[-1] = bootstrap
+        zi = gamma * np.asarray(bootstrap, dtype=np.float64).reshape((1,) + rewards.shape[1:])
+        y, _ = lfilter([1.], [1., -gamma], rewards[::-1], axis=0, zi=zi)
+        out[:] = y[::-1]
+        return out
+
+    cumulative_reward = bootstrap
+    for t in reversed(range(len(rewards))):
+        if terminals is not None:
+            cumulative_reward = np.where(terminals[t], 0., cumulative_reward)
+        if transformed:
+            cumulative_reward = h(rewards[t] + gamma * h_inv(cumulative_reward))
+        else:
+            cumulative_reward = rewards[t] + gamma * cumulative_reward
+        out[t] = cumulative_reward
+    return out
+
+def look_back_shaping(rho, last_rho, rewards, shaping_gamma, terminal=False, out=None):
+    """Look-back advice of Wiewiora et al. (2003).
+
+    F_t = rho_t / shaping_gamma - rho_{t-1}, rho_{-1} = last_rho (the last
+    advice of the previous rollout). F is dropped on the absorbing step of
+    a terminal rollout and where the env reward is non-zero.
+    """
+    rho = np.asarray(rho, dtype=np.float32)
+    rewards = np.asarray(rewards)
+    if out is None:
+        out = np.empty(rho.shape, dtype=np.float32)
+    out[:] = rho / shaping_gamma
+    out[0] -= last_rho
+    out[1:] -= rho[:-1]
+    out[(out != 0) & (rewards != 0)] = 0.
+    if terminal:
+        out[-1] = 0.
+    return out
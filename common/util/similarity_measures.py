@@ -1,40 +1,90 @@
 #!/usr/bin/env python3
-from math import*
-from decimal import Decimal
+import numpy as np
+
+METRICS = ['euclidean', 'manhattan', 'minkowski', 'cosine', 'jaccard']
+
+def _as_rows(X):
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 1:
+        X = X[np.newaxis, :]
+    return X.reshape(X.shape[0], -1)
+
+def _as_sets(X):
+    if np.ndim(X[0]) == 0:
+        X = [X]
+    return [np.unique(np.asarray(x).ravel()) for x in X]
+
+def _pairwise_jaccard(X, Y=None):
+    # sets may differ in size, rows are not stacked into one array
+    X_sets = _as_sets(X)
+    Y_sets = X_sets if Y is None else _as_sets(Y)
+    out = np.empty((len(X_sets), len(Y_sets)), dtype=np.float64)
+    for i, x in enumerate(X_sets):
+        for j, y in enumerate(Y_sets):
+            intersection = np.intersect1d(x, y, assume_unique=True).size
+            out[i, j] = intersection / float(x.size + y.size - intersection)
+    return out
+
+def pairwise_distances(X, Y=None, metric='euclidean', p_value=3):
+    """ return the (n, m) matrix of measures between rows of X (n, d) and Y (m, d)
+
+    Rows are flattened, so a stack of weight tensors from n checkpoints can be
+    passed as is. Distances are computed on exact differences one row of X at
+    a time (no |x|^2 + |y|^2 - 2xy shortcut) so that small drifts between
+    checkpoints are not lost to cancellation. cosine and jaccard return
+    similarities, not distances.
+    """
+    assert metric in METRICS, "unknown metric {}".format(metric)
+    if metric == 'jaccard':
+        return _pairwise_jaccard(X, Y)
+
+    X = _as_rows(X)
+    Y = X if Y is None else _as_rows(Y)
+    assert X.shape[1] == Y.shape[1]
+
+    if metric == 'cosine':
+        X_norm = np.linalg.norm(X, axis=1)
+        Y_norm = np.linalg.norm(Y, axis=1)
+        return np.dot(X, Y.T) / np.outer(X_norm, Y_norm)
+
+    out = np.empty((X.shape[0], Y.shape[0]), dtype=np.float64)
+    for i in range(X.shape[0]):
+        diff = np.abs(Y - X[i])
+        if metric == 'euclidean':
+            out[i] = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+        elif metric == 'manhattan':
+            out[i] = diff.sum(axis=1)
+        else:
+            out[i] = np.power(np.power(diff, p_value).sum(axis=1), 1. / p_value)
+    return out
 
 class Similarity():
-    """ Five similarity measures function """
+    """ Five similarity measures function (numpy backed) """
 
     def euclidean_distance(self,x,y):
         """ return euclidean distance between two lists """
-        return sqrt(sum(pow(a-b,2) for a, b in zip(x, y)))
+        return float(pairwise_distances(x, y, 'euclidean')[0, 0])
 
     def manhattan_distance(self,x,y):
         """ return manhattan distance between two lists """
-        return sum(abs(a-b) for a,b in zip(x,y))
+        return float(pairwise_distances(x, y, 'manhattan')[0, 0])
 
     def minkowski_distance(self,x,y,p_value):
         """ return minkowski distance between two lists """
-        return self.nth_root(sum(pow(abs(a-b),p_value) for a,b in zip(x, y)),
-           p_value)
+        return round(float(pairwise_distances(x, y, 'minkowski', p_value)[0, 0]), 3)
 
     def nth_root(self,value, n_root):
         """ returns the n_root of an value """
-        root_value = 1/float(n_root)
-        return round (Decimal(value) ** Decimal(root_value),3)
+        return round(float(value) ** (1 / float(n_root)), 3)
 
     def cosine_similarity(self,x,y):
         """ return cosine similarity between two lists """
-        numerator = sum(a*b for a,b in zip(x,y))
-        denominator = self.square_rooted(x)*self.square_rooted(y)
-        return round(numerator/float(denominator),3)
+        return round(float(pairwise_distances(x, y, 'cosine')[0, 0]), 3)
 
     def square_rooted(self,x):
         """ return 3 rounded square rooted value """
-        return round(sqrt(sum([a*a for a in x])),3)
+        return round(float(np.linalg.norm(np.asarray(x, dtype=np.float64))), 3)
 
     def jaccard_similarity(self,x,y):
         """ returns the jaccard similarity between two lists """
-        intersection_cardinality = len(set.intersection(*[set(x), set(y)]))
-        union_cardinality = len(set.union(*[set(x), set(y)]))
-        return intersection_cardinality/float(union_cardinality)
+        return float(pairwise_distances(x, y, 'jaccard')[0, 0])
@@ -0,0 +1,48 @@
+import unittest
+import numpy as np
+
+from common.util.returns import discounted_returns, look_back_shaping, h, h_inv
+
+class TestReturns(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.rewards = rng.choice([-1., 0., 1.], size=(20, 4))
+        self.bootstrap = rng.randn(4)
+        self.terminals = rng.rand(20, 4) < .1
+        self.gamma = 0.99
+
+    def loop_returns(self, terminals=None, transformed=False):
+        returns = np.zeros(self.rewards.shape)
+        cumulative_reward = self.bootstrap
+        for t in reversed(range(len(self.rewards))):
+            if terminals is not None:
+                cumulative_reward = np.where(terminals[t], 0., cumulative_reward)
+            if transformed:
+                cumulative_reward = h(self.rewards[t] + self.gamma * h_inv(cumulative_reward))
+            else:
+                cumulative_reward = self.rewards[t] + self.gamma * cumulative_reward
+            returns[t] = cumulative_reward
+        return returns
+
+    def test_matches_loop(self):
+        out = np.zeros(self.rewards.shape, dtype=np.float32)
+        returns = discounted_returns(self.rewards, self.gamma, self.bootstrap, out=out)
+        self.assertIs(returns, out)
+        self.assertTrue(np.allclose(returns, self.loop_returns(), atol=1e-4))
+        returns = discounted_returns(self.rewards, self.gamma, self.bootstrap, terminals=self.terminals)
+        self.assertTrue(np.allclose(returns, self.loop_returns(terminals=self.terminals), atol=1e-4))
+        returns = discounted_returns(self.rewards, self.gamma, self.bootstrap, transformed=True)
+        self.assertTrue(np.allclose(returns, self.loop_returns(transformed=True), atol=1e-4))
+        # one env, scalar bootstrap
+        returns = discounted_returns(list(self.rewards[:, 0]), self.gamma, 0.)
+        self.assertAlmostEqual(returns[-1], self.rewards[-1, 0])
+
+    def test_look_back_shaping(self):
+        rho = [0.001, 0., 0.001, 0.001]
+        f = look_back_shaping(rho, 0.001, [0., 0., 1., 0.], 0.5, terminal=True)
+        # rho_t / shaping_gamma - rho_{t-1}, none where rewarded or absorbing
+        self.assertTrue(np.allclose(f, [0.001, -0.001, 0., 0.]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import numpy as np
+
+from common.util.similarity_measures import Similarity, pairwise_distances
+
+class TestSimilarityMeasures(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.X = rng.randn(5, 300)
+
+    def test_matches_pairwise_loop(self):
+        measures = Similarity()
+        euclidean = pairwise_distances(self.X, metric='euclidean')
+        manhattan = pairwise_distances(self.X, metric='manhattan')
+        minkowski = pairwise_distances(self.X, metric='minkowski', p_value=3)
+        cosine = pairwise_distances(self.X, metric='cosine')
+        for i in range(len(self.X)):
+            for j in range(len(self.X)):
+                x, y = self.X[i], self.X[j]
+                d = x - y
+                self.assertAlmostEqual(euclidean[i, j], np.sqrt(np.sum(d * d)))
+                self.assertAlmostEqual(manhattan[i, j], np.sum(np.abs(d)))
+                self.assertAlmostEqual(minkowski[i, j], np.sum(np.abs(d) ** 3) ** (1 / 3.))
+                self.assertAlmostEqual(
+                    cosine[i, j], np.dot(x, y) / np.linalg.norm(x) / np.linalg.norm(y))
+                self.assertAlmostEqual(measures.euclidean_distance(x, y), euclidean[i, j])
+
+        self.assertTrue(np.allclose(np.diag(euclidean), 0.))
+        self.assertTrue(np.allclose(np.diag(cosine), 1.))
+
+    def test_small_drift(self):
+        # distances between nearby checkpoints must not cancel out
+        x = np.full(10**5, 1000., dtype=np.float32)
+        y = x.copy()
+        y[0] += 0.0625
+        self.assertAlmostEqual(pairwise_distances(x, y)[0, 0], 0.0625)
+
+    def test_jaccard(self):
+        measures = Similarity()
+        self.assertAlmostEqual(measures.jaccard_similarity([0, 1, 2, 5, 6], [0, 2, 3, 5, 7, 9]), 3 / 8.)
+
+
+if __name__ == "__main__":
+    unittest.main()
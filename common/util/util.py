@@ -73,6 +73,17 @@ def generate_image_for_cam_video(state_img, cam_img, global_t, img_index, action
 
     return vcat_title_camstate
 
+def write_cam_video(states, cams, actions, global_t, fname, fps=24.):
+    """Render side-by-side CAM frames and encode them into fname.mp4.
+    Meant to run as an ArtifactWriter job, cams are raw grad_cam outputs.
+    """
+    from common.util.video_recorder import VideoRecorder
+    with VideoRecorder(fname, fps=fps) as recorder:
+        for i in range(len(cams)):
+            cam_img = visualize_cam(cams[i])
+            recorder.add_frame(generate_image_for_cam_video(
+                states[i], cam_img, global_t, i, actions[i]))
+
 def compute_proportions(batch_size, action_distribution):
     num_nonzeros = np.count_nonzero(action_distribution)
     max_action_index = np.argmax(action_distribution)
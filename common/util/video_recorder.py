@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+import threading
+import subprocess
+import logging
+import numpy as np
+import cv2
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+logger = logging.getLogger("video_recorder")
+
+class VideoRecorder(object):
+    """Streams frames into an mp4 file as they are produced.
+
+    Unlike make_movie(), frames are not collected in a list first. Each frame
+    pushed with add_frame() goes into a bounded queue and is encoded by a
+    background thread, so memory stays constant for any episode length and
+    encoding overlaps the rollout. add_frame() only blocks when the encoder
+    falls max_queue_size frames behind.
+
+    backend='cv2' encodes with cv2.VideoWriter (mp4v), backend='ffmpeg'
+    pipes raw RGB frames into the ffmpeg binary used by moviepy (libx264).
+    """
+    def __init__(self, fname, fps=24., backend='cv2', true_image=True, max_queue_size=64):
+        assert backend in ['cv2', 'ffmpeg']
+        self.fname = fname + ".mp4"
+        self.fps = fps
+        self.backend = backend
+        self.true_image = true_image
+        self.num_frames = 0
+
+        self._writer = None
+        self._error = None
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = threading.Thread(target=self._encode)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def add_frame(self, frame):
+        """Queue one RGB (h, w, 3) or grayscale (h, w) frame for encoding.
+        The frame is copied, callers are free to reuse their buffer.
+        """
+        if self._error is not None:
+            return
+        if not self.true_image:
+            frame = (np.asarray(frame) + 1) / 2 * 255
+        self._queue.put(np.array(frame, dtype=np.uint8))
+        self.num_frames += 1
+
+    def close(self):
+        """Flush pending frames and finalize the file."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        if self._error is not None:
+            logger.error("Failed to write {}: {}".format(self.fname, self._error))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _open(self, frame):
+        height, width = frame.shape[:2]
+        if self.backend == 'cv2':
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            self._writer = cv2.VideoWriter(self.fname, fourcc, self.fps, (width, height))
+        else:
+            from moviepy.config import get_setting
+            cmd = [get_setting("FFMPEG_BINARY"), '-y', '-loglevel', 'error',
+                '-f', 'rawvideo', '-vcodec', 'rawvideo',
+                '-s', '{}x{}'.format(width, height), '-pix_fmt', 'rgb24',
+                '-r', '{:.02f}'.format(self.fps), '-i', '-',
+                '-an', '-vcodec', 'libx264', '-pix_fmt', 'yuv420p',
+                # libx264 requires even dimensions
+                '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+                self.fname]
+            self._writer = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    def _write(self, frame):
+        if frame.ndim == 2:
+            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2RGB)
+        if self.backend == 'cv2':
+            self._writer.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+        else:
+            self._writer.stdin.write(np.ascontiguousarray(frame).tobytes())
+
+    def _release(self):
+        if self._writer is None:
+            return
+        if self.backend == 'cv2':
+            self._writer.release()
+        else:
+            self._writer.stdin.close()
+            self._writer.wait()
+        self._writer = None
+
+    def _encode(self):
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            if self._error is not None:
+                # keep draining so producers never block on a dead encoder
+                continue
+            try:
+                if self._writer is None:
+                    self._open(frame)
+                self._write(frame)
+            except Exception as e:
+                self._error = e
+        try:
+            self._release()
+        except Exception as e:
+            self._error = e
@@ -5,6 +5,7 @@ import os
 
 from common.replay_memory import ReplayMemory
 from common.game_state import GameState
+from common.util import ArtifactWriter
 
 logger = logging.getLogger("dqn")
 
@@ -91,7 +92,13 @@ def run_dqn(args):
         allow_soft_placement=True,
         log_device_placement=False)
 
-    game_state = GameState(env_id=args.gym_env, display=False, no_op_max=30, human_demo=False, episode_life=True)
+    # replay memory only keeps emulator states when asked
+    full_state_mode = 'step' if args.store_full_state else 'off'
+    game_state = GameState(
+        env_id=args.gym_env, display=False, no_op_max=30, human_demo=False,
+        episode_life=True, full_state_mode=full_state_mode,
+        fused_grayscale=args.fused_grayscale, ale_skip=args.ale_skip,
+        profile_interval=args.profile_env_interval)
     human_net = None
     sess_human = None
     if args.use_human_model_as_advice:
@@ -185,6 +192,12 @@ def run_dqn(args):
     else:
         reward_type = 'CLIP'
 
+    artifact_writer = None
+    if args.artifact_writer != 'none':
+        artifact_writer = ArtifactWriter(
+            max_queue_size=args.artifact_queue_size,
+            use_process=args.artifact_writer == 'process')
+
     experiment = DQNTraining(
         sess, net, game_state, args.resized_height, args.resized_width,
         args.phi_len, args.batch, args.gym_env,
@@ -198,9 +211,13 @@ def run_dqn(args):
         train_max_steps=args.train_max_steps,
         human_net=human_net, confidence=args.advice_confidence, psi=args.psi,
         train_with_demo_steps=args.train_with_demo_steps,
-        use_transfer=args.use_transfer, reward_type=reward_type)
+        use_transfer=args.use_transfer, reward_type=reward_type,
+        artifact_writer=artifact_writer)
     experiment.run()
 
+    if artifact_writer is not None:
+        artifact_writer.close()
+
     if args.use_human_model_as_advice:
         sess_human.close()
 
@@ -12,8 +12,7 @@ from skimage.transform import resize
 import matplotlib.image as mpimg
 
 from termcolor import colored
-from common.util import egreedy, get_action_index, make_movie, load_memory
-from common.game_state import get_wrapper_by_name
+from common.util import egreedy, get_action_index, load_memory, VideoRecorder
 
 logger = logging.getLogger("dqn")
 
@@ -43,6 +42,44 @@ try:
 except ImportError:
     import pickle
 
+def write_demo_cam_videos(cam, state, action, folder, global_t, fps):
+    """Render overlay and side-by-side CAM movies (run as an artifact job)."""
+    cam_plus_recorder = VideoRecorder(
+        folder + '/frames/demo-cam_plus_img{ep:010d}'.format(ep=global_t),
+        fps=fps)
+    cam_side_recorder = VideoRecorder(
+        folder + '/frames/demo-cam_side_img{ep:010d}'.format(ep=global_t),
+        fps=fps)
+
+    for i in range(len(cam)):
+        # overlay cam-state
+        overlay = np.uint8(cam[i]).copy()
+        output = np.uint8(state[i]).copy()
+        alpha = 0.3
+        cv2.addWeighted(overlay, alpha, output, 1 - alpha,
+            0, output)
+        # create a title space for action
+        title_space = np.zeros((20, 84, 3), np.uint8)
+        title_space[:] = (255,255,255)
+        cv2.putText(title_space, "{}".format(ACTION_MEANING[action[i]]),
+            (20, 14), cv2.FONT_HERSHEY_DUPLEX, .4, (0, 0, 0), 1)
+        # concate title and state
+        vcat_output = cv2.vconcat((title_space, output))
+        cam_plus_recorder.add_frame(vcat_output)
+
+        # side-by-side cam-state
+        hcat_cam_state =  cv2.hconcat((np.uint8(cam[i]).copy(),
+                                       np.uint8(state[i]).copy()))
+        title_space = np.zeros((20, 84*2, 3), np.uint8)
+        title_space[:] = (255,255,255)
+        vcat_title_camstate = cv2.vconcat((title_space, hcat_cam_state))
+        cv2.putText(vcat_title_camstate, "{}".format(ACTION_MEANING[action[i]]),
+            (20, 14), cv2.FONT_HERSHEY_DUPLEX, .4, (0, 0, 0), 1)
+        cam_side_recorder.add_frame(vcat_title_camstate)
+
+    cam_plus_recorder.close()
+    cam_side_recorder.close()
+
 class DQNTraining(object):
     def __init__(
         self, sess, network, game_state, resized_height, resized_width, phi_length, batch,
@@ -51,7 +88,8 @@ class DQNTraining(object):
         folder, load_demo_memory=False, demo_memory_folder=None, demo_ids=None,
         load_demo_cam=False, demo_cam_id=None,
         train_max_steps=sys.maxsize, human_net=None, confidence=0., psi=0.999995,
-        train_with_demo_steps=0, use_transfer=False, reward_type='CLIP'):
+        train_with_demo_steps=0, use_transfer=False, reward_type='CLIP',
+        artifact_writer=None):
         """ Initialize experiment """
         self.sess = sess
         self.net = network
@@ -80,6 +118,7 @@ class DQNTraining(object):
         self.train_with_demo_steps = train_with_demo_steps
         self.use_transfer = use_transfer
         self.reward_type = reward_type
+        self.artifact_writer = artifact_writer
 
         self.human_net = human_net
         self.confidence = confidence
@@ -93,6 +132,13 @@ class DQNTraining(object):
         if not os.path.exists(self.folder + '/frames'):
             os.makedirs(self.folder + '/frames')
 
+    def _write_artifact(self, fn, *args, **kwargs):
+        # run slow side outputs in the background when a writer is given
+        if self.artifact_writer is not None:
+            self.artifact_writer.submit(fn, *args, **kwargs)
+        else:
+            fn(*args, **kwargs)
+
     def _reset(self, hard_reset=True):
         self.game_state.reset(hard_reset=hard_reset)
         for _ in range(self.phi_length):
@@ -205,9 +251,14 @@ class DQNTraining(object):
     def test(self, render=False):
         logger.info("Evaluate policy at global_t={}...".format(self.global_t))
 
-        episode_buffer = []
+        time_per_step = 0.0167
+        recorder = None
         self.game_state.reset(hard_reset=True)
-        episode_buffer.append(self.game_state.get_screen_rgb())
+        if self.global_t % 2000000 == 0:
+            recorder = VideoRecorder(
+                self.folder + '/frames/image{ep:010d}'.format(ep=(self.global_t)),
+                fps=1. / time_per_step)
+            recorder.add_frame(self.game_state.get_screen_rgb())
 
         max_steps = self.eval_max_steps
         total_reward = 0
@@ -220,49 +271,10 @@ class DQNTraining(object):
         # only need to make movie for demo data once
         # if self.global_t == 0:
         cam, state, action = self.calculate_cam(self.test_cam_si)
-        cam_plus_img = []
-        cam_side_img = []
-
-        for i in range(len(cam)):
-            # overlay cam-state
-            overlay = np.uint8(cam[i]).copy()
-            output = np.uint8(state[i]).copy()
-            alpha = 0.3
-            cv2.addWeighted(overlay, alpha, output, 1 - alpha,
-                0, output)
-            # create a title space for action
-            title_space = np.zeros((20, 84, 3), np.uint8)
-            title_space[:] = (255,255,255)
-            cv2.putText(title_space, "{}".format(ACTION_MEANING[action[i]]),
-                (20, 14), cv2.FONT_HERSHEY_DUPLEX, .4, (0, 0, 0), 1)
-            # concate title and state
-            vcat_output = cv2.vconcat((title_space, output))
-            cam_plus_img.append(vcat_output)
-
-            # side-by-side cam-state
-            hcat_cam_state =  cv2.hconcat((np.uint8(cam[i]).copy(),
-                                           np.uint8(state[i]).copy()))
-            title_space = np.zeros((20, 84*2, 3), np.uint8)
-            title_space[:] = (255,255,255)
-            vcat_title_camstate = cv2.vconcat((title_space, hcat_cam_state))
-            cv2.putText(vcat_title_camstate, "{}".format(ACTION_MEANING[action[i]]),
-                (20, 14), cv2.FONT_HERSHEY_DUPLEX, .4, (0, 0, 0), 1)
-            cam_side_img.append(vcat_title_camstate)
-
-        time_per_step = 0.0167
-        make_movie(
-            cam_plus_img,
-            self.folder + '/frames/demo-cam_plus_img{ep:010d}'.format(ep=(self.global_t)),
-            duration=len(cam)*time_per_step,
-            true_image=True,
-            salience=False)
-        make_movie(
-            cam_side_img,
-            self.folder + '/frames/demo-cam_side_img{ep:010d}'.format(ep=(self.global_t)),
-            duration=len(state)*time_per_step,
-            true_image=True,
-            salience=False)
-        del cam, state, action, cam_plus_img, cam_side_img
+        self._write_artifact(
+            write_demo_cam_videos, cam, state, action,
+            self.folder, self.global_t, 1. / time_per_step)
+        del cam, state, action
 
         while max_steps > 0:
             readout_t = self.net.evaluate(self.game_state.s_t)[0]
@@ -272,8 +284,8 @@ class DQNTraining(object):
             self.game_state.step(action)
             terminal = self.game_state.terminal
 
-            if n_episodes == 0 and self.global_t % 2000000 == 0:
-                episode_buffer.append(self.game_state.get_screen_rgb())
+            if recorder is not None:
+                recorder.add_frame(self.game_state.get_screen_rgb())
 
             episode_reward += self.game_state.reward
             episode_steps += 1
@@ -283,15 +295,10 @@ class DQNTraining(object):
             self.game_state.update()
 
             if terminal:
-                if get_wrapper_by_name(self.game_state.env, 'EpisodicLifeEnv').was_real_done:
-                    if n_episodes == 0 and self.global_t % 2000000 == 0:
-                        time_per_step = 0.0167
-                        images = np.array(episode_buffer)
-                        make_movie(
-                            images, self.folder + '/frames/image{ep:010d}'.format(ep=(self.global_t)),
-                            duration=len(images)*time_per_step,
-                            true_image=True, salience=False)
-                        episode_buffer = []
+                if self.game_state.was_real_done:
+                    if recorder is not None:
+                        recorder.close()
+                        recorder = None
                     n_episodes += 1
                     score_str = colored("score={}".format(episode_reward), "magenta")
                     steps_str = colored("steps={}".format(episode_steps), "blue")
@@ -303,6 +310,10 @@ class DQNTraining(object):
                     episode_steps = 0
                 self.game_state.reset(hard_reset=False)
 
+        # first episode did not finish within eval_max_steps
+        if recorder is not None:
+            recorder.close()
+
         if n_episodes == 0:
             total_reward = episode_reward
             total_steps = episode_steps
@@ -454,7 +465,7 @@ class DQNTraining(object):
                 # self.net.add_summary(summary, self.global_t)
 
             if terminal:
-                if get_wrapper_by_name(self.game_state.env, 'EpisodicLifeEnv').was_real_done:
+                if self.game_state.was_real_done:
                     self.rewards['train'][self.global_t] = (sub_total_reward, sub_steps)
                     score_str = colored("score={}".format(sub_total_reward), "magenta")
                     steps_str = colored("steps={}".format(sub_steps), "blue")
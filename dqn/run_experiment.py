@@ -81,6 +81,8 @@ def main():
     parser.add_argument('--demo-cam-id', type=str, default=None, help='demo id for cam')
 
     parser.add_argument('--train-with-demo-steps', type=int, default=0)
+    parser.add_argument('--store-full-state', action='store_true', help='store emulator states in replay memory')
+    parser.set_defaults(store_full_state=False)
 
     # Alternatives to reward clipping
     parser.add_argument('--unclipped-reward', action='store_true', help='use raw reward')
@@ -94,6 +96,19 @@ def main():
     parser.add_argument('--target-consistency', action='store_true', help='use target consistency (TC) loss')
     parser.set_defaults(target_consistency=False)
 
+    # preprocessing on ALE grayscale screens (GrayMaxAndSkipEnv)
+    parser.add_argument('--fused-grayscale', action='store_true', help='max-pool and resize ALE grayscale screens directly')
+    parser.set_defaults(fused_grayscale=False)
+    parser.add_argument('--ale-skip', action='store_true', help='repeat actions in one ale.act loop instead of MaxAndSkipEnv')
+    parser.set_defaults(ale_skip=False)
+
+    # per wrapper layer env timings
+    parser.add_argument('--profile-env-interval', type=int, default=0, help='log env step profile every N steps, 0 disables')
+
+    # background writer for evaluation videos and memory dumps
+    parser.add_argument('--artifact-writer', type=str, default='thread', help='thread | process | none')
+    parser.add_argument('--artifact-queue-size', type=int, default=4, help='max pending artifact jobs')
+
     args = parser.parse_args()
 
     logger.info('Running DQN...')
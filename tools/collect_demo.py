@@ -10,9 +10,8 @@ import datetime
 
 from tkinter import Tk, messagebox
 from collections import deque
-from common.util import prepare_dir, get_action_index, make_movie
-from common.replay_memory import ReplayMemory
-from common.game_state.atari_wrapper import get_wrapper_by_name
+from common.util import prepare_dir, get_action_index, VideoRecorder
+from common.replay_memory import ReplayMemory, ActionReplay
 
 logger = logging.getLogger("collect_demo")
 
@@ -20,9 +19,15 @@ class CollectDemonstration(object):
 
     def __init__(
         self, game_state, resized_height, resized_width, phi_length, name,
-        folder='', create_movie=False, hertz=60.0, skip=4):
-        """ Initialize collection of demo """
+        folder='', create_movie=False, hertz=60.0, skip=4, demo_format='memory'):
+        """ Initialize collection of demo
+
+        demo_format -- 'memory' saves the ReplayMemory (frames and full
+        states), 'action-replay' only the compact ActionReplay (start state,
+        actions, checkpoints) it can be regenerated from, 'both' saves both
+        """
         assert folder != ''
+        assert demo_format in ['memory', 'action-replay', 'both']
         self.game_state = game_state
         self.resized_h = resized_height
         self.resized_w = resized_width
@@ -44,6 +49,7 @@ class CollectDemonstration(object):
             self._skip = skip
 
         self.create_movie = create_movie
+        self.demo_format = demo_format
         self.obs_buffer = np.zeros((2, 84 , 84), dtype=np.uint8)
 
     def _create_table(self):
@@ -168,8 +174,10 @@ class CollectDemonstration(object):
 
     def run(self, minutes_limit=5, episode=0, num_episodes=0, demo_type=0,
             model_net=None, replay_memory=None, total_memory=0):
+        recorder = None
         if self.create_movie:
-            movie_images = []
+            time_per_step = 0.0167
+            recorder = VideoRecorder(self.folder + "demo", fps=1. / time_per_step)
 
         rewards = {'train':[], 'eval':[]}
 
@@ -183,6 +191,13 @@ class CollectDemonstration(object):
         # re-initialize game for evaluation
         self._reset(replay_memory, hard_reset=True)
 
+        action_replay = None
+        if self.demo_format != 'memory':
+            action_replay = ActionReplay(
+                env_id=self.name, episode_life=self.game_state.episode_life,
+                skip=self._skip, phi_length=self.phi_length)
+            action_replay.start(self.game_state)
+
         rew = self.game_state.reward
         terminal = False
         lives = self.game_state.lives
@@ -227,6 +242,8 @@ class CollectDemonstration(object):
 
             actions.append(action)
             self.game_state.step(action)
+            if action_replay is not None:
+                action_replay.add_step(action)
             rew += self.game_state.reward
             lives = self.game_state.lives
             # loss_life = loss_life or self.game_state.loss_life
@@ -234,8 +251,8 @@ class CollectDemonstration(object):
             total_reward += self.game_state.reward
             t += 1
 
-            if self.create_movie:
-                movie_images.append(self.game_state.get_screen_rgb())
+            if recorder is not None:
+                recorder.add_frame(self.game_state.get_screen_rgb())
 
             # Ensure that D does not reach max memory that mitigate
             # problems when combining different human demo files
@@ -265,13 +282,18 @@ class CollectDemonstration(object):
                 actions.clear()
                 rew = 0
 
-                if terminal or (self.game_state.episode_life and get_wrapper_by_name(self.game_state.env, 'EpisodicLifeEnv').was_real_done):
+                if terminal or (self.game_state.episode_life and self.game_state.was_real_done):
                     break
 
                 if self.game_state.terminal:
                     self._reset(replay_memory, hard_reset=False)
+                    if action_replay is not None:
+                        action_replay.add_soft_reset()
                     continue
 
+                if action_replay is not None:
+                    action_replay.add_checkpoint(self.game_state)
+
             self.game_state.update()
 
         end_time = datetime.datetime.now()
@@ -281,19 +303,18 @@ class CollectDemonstration(object):
         logger.info("Total reward: {}".format(total_reward))
         logger.info("Total Replay memory saved: {}".format(replay_memory.size))
 
-        replay_memory.save(name=self.name, folder=self.folder, resize=True)
-        if self.create_movie:
-            time_per_step = 0.0167
-            make_movie(
-                movie_images, self.folder+"demo",
-                duration=len(movie_images)*time_per_step,
-                true_image=True, salience=False)
+        if self.demo_format != 'action-replay':
+            replay_memory.save(name=self.name, folder=self.folder, resize=True)
+        if action_replay is not None:
+            action_replay.save(name=self.name, folder=self.folder)
+        if recorder is not None:
+            recorder.close()
 
         return total_reward, t, start_time, end_time, duration, replay_memory.size
 
 def test_collect(env_id):
     from common.game_state import GameState
-    game_state = GameState(env_id=env_id, display=True, human_demo=True)
+    game_state = GameState(env_id=env_id, display=True, human_demo=True, full_state_mode='step')
     test_folder = "demo_samples/{}_test".format(env_id.replace('-', '_'))
     prepare_dir(test_folder, empty=True)
     collect_demo = CollectDemonstration(
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import re
+import coloredlogs, logging
+import numpy as np
+
+from common.util.similarity_measures import METRICS, pairwise_distances
+
+logger = logging.getLogger("compare_checkpoints")
+
+# optimizer slots and counters are not network weights
+SKIP_PATTERN = r'RMSProp|Adam|Momentum|global_step'
+
+def list_checkpoints(paths):
+    """ expand checkpoint folders into all the checkpoints they keep """
+    import tensorflow as tf
+    checkpoints = []
+    for path in paths:
+        if os.path.isdir(path):
+            state = tf.train.get_checkpoint_state(path)
+            assert state is not None, "no checkpoint found in {}".format(path)
+            checkpoints.extend(state.all_model_checkpoint_paths)
+        else:
+            checkpoints.append(path)
+    return checkpoints
+
+def load_layers(checkpoints, include=None):
+    """ return {layer name: (n_checkpoints, n_weights) float array} """
+    import tensorflow as tf
+    readers = [tf.train.NewCheckpointReader(c) for c in checkpoints]
+    names = sorted(readers[0].get_variable_to_shape_map())
+    layers = {}
+    for name in names:
+        if re.search(SKIP_PATTERN, name):
+            continue
+        if include is not None and not re.search(include, name):
+            continue
+        if not all(r.has_tensor(name) for r in readers):
+            logger.warning("{} missing from some checkpoints, skipped".format(name))
+            continue
+        tensors = [r.get_tensor(name) for r in readers]
+        if not np.issubdtype(tensors[0].dtype, np.floating):
+            continue
+        layers[name] = np.stack([t.ravel() for t in tensors])
+    return layers
+
+def compare_checkpoints(args):
+    checkpoints = list_checkpoints(args.checkpoints)
+    assert len(checkpoints) > 0
+    for i, c in enumerate(checkpoints):
+        logger.info("[{}] {}".format(i, c))
+
+    layers = load_layers(checkpoints, include=args.include)
+    assert len(layers) > 0, "no layers matched"
+    if args.all_layers:
+        names = sorted(layers)
+        layers['all'] = np.concatenate([layers[n] for n in names], axis=1)
+
+    np.set_printoptions(precision=args.precision, suppress=True, linewidth=200)
+    results = {}
+    for name in sorted(layers):
+        matrix = pairwise_distances(layers[name], metric=args.metric, p_value=args.p_value)
+        results[name] = matrix
+        print("{} {} {}".format(name, layers[name].shape[1], args.metric))
+        print(matrix)
+
+    if args.output is not None:
+        np.savez(args.output, checkpoints=np.array(checkpoints), **results)
+        logger.info("Saved {} matrices to {}".format(len(results), args.output))
+
+def main():
+    """
+    python3 compare_checkpoints.py results/a3c/PongNoFrameskip_v4 --metric=cosine --include=W_conv
+    python3 compare_checkpoints.py model_a/checkpoint-100 model_b/checkpoint-100 --all-layers --output=drift.npz
+    """
+    coloredlogs.install(level='DEBUG', fmt='%(asctime)s,%(msecs)03d %(name)s %(levelname)s %(message)s')
+    logger.setLevel(logging.DEBUG)
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('checkpoints', type=str, nargs='+', help='checkpoint prefixes or folders (all kept checkpoints)')
+    parser.add_argument('--metric', type=str, default='euclidean', help=' | '.join(METRICS))
+    parser.add_argument('--p-value', type=float, default=3, help='minkowski order')
+    parser.add_argument('--include', type=str, default=None, help='regex on variable names')
+    parser.add_argument('--all-layers', action='store_true', help='also compare all selected weights as one vector')
+    parser.set_defaults(all_layers=False)
+    parser.add_argument('--precision', type=int, default=4)
+    parser.add_argument('--output', type=str, default=None, help='save matrices to npz')
+
+    args = parser.parse_args()
+
+    compare_checkpoints(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -140,13 +140,12 @@ def view_features(args):
         from scipy import spatial
         from common.util import Similarity
         measures = Similarity()
-        W_flatten = W.flatten()
-        W_init_flatten = W_init.flatten()
-        W_flatten.dtype=np.float64
-        W_init_flatten.dtype=np.float64
+        W_flatten = W.flatten().astype(np.float64)
+        W_init_flatten = W_init.flatten().astype(np.float64)
         print(np.shape(W_flatten), np.shape(W_init_flatten))
-        # result_euclidean_distance = measures.euclidean_distance(W_flatten, W_init_flatten)
-        # print ('euclidean_distance:{}'.format(result_euclidean_distance))
+        result_euclidean_distance = measures.euclidean_distance(W_flatten, W_init_flatten)
+        print ('euclidean_distance:{}'.format(result_euclidean_distance))
+        print ('cosine_similarity:{}'.format(measures.cosine_similarity(W_flatten, W_init_flatten)))
         # print ('mse:{}'.format(mse(W_flatten, W_init_flatten)))
         # print ('cosine_scipy:{}'.format(1-spatial.distance.cosine(W_flatten, W_init_flatten)))
         # print ('correlation_scipy:{}'.format(1-spatial.distance.correlation(W_flatten, W_init_flatten)))
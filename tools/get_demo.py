@@ -41,7 +41,9 @@ def get_demo(args):
     logging.getLogger('replay_memory').addHandler(fh)
     logging.getLogger('atari_wrapper').addHandler(fh)
 
-    game_state = GameState(env_id=args.gym_env, display=True, human_demo=True, episode_life=episode_life)
+    game_state = GameState(
+        env_id=args.gym_env, display=True, human_demo=True,
+        episode_life=episode_life, full_state_mode='step')
     collect_demo = CollectDemonstration(
         game_state,
         84, 84, 4,
@@ -49,7 +51,8 @@ def get_demo(args):
         folder=demo_memory_folder,
         create_movie=args.create_movie,
         hertz=args.hz,
-        skip=args.skip)
+        skip=args.skip,
+        demo_format=args.demo_format)
     collect_demo.run_episodes(
         args.num_episodes,
         minutes_limit=args.demo_time_limit,
@@ -82,6 +85,9 @@ def main():
     parser.add_argument('--hz', type=float, default=60.0, help='game update frequency')
 
     parser.add_argument('--hostname', type=str, default=None)
+    parser.add_argument('--demo-format', type=str, default='memory', choices=['memory', 'action-replay', 'both'],
+                        help='memory: frames and full states, action-replay: start state, actions and checkpoints '
+                             '(rebuild with regenerate_demo.py), both: save both')
 
     args = parser.parse_args()
 
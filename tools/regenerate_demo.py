@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+import argparse
+import glob
+import os
+import coloredlogs, logging
+
+from common.replay_memory import ActionReplay
+
+logger = logging.getLogger("regenerate_demo")
+
+SUFFIX = '-action-replay.pkl.gz'
+
+def regenerate_demo(args):
+    """ rebuild the ReplayMemory of every action replay found under args.folder """
+    files = sorted(glob.glob(os.path.join(args.folder, '**', '*' + SUFFIX), recursive=True))
+    assert len(files) > 0, "no action replay found in {}".format(args.folder)
+    for file in files:
+        folder = os.path.dirname(file)
+        name = os.path.basename(file)[:-len(SUFFIX)]
+        if os.path.exists(os.path.join(folder, name + '.pkl')) and not args.overwrite:
+            logger.warn("{} already has a replay memory, skipped (use --overwrite)".format(folder))
+            continue
+        action_replay = ActionReplay()
+        action_replay.load(name=name, folder=folder)
+        logger.info("{}: {} events, {} checkpoints".format(
+            file, len(action_replay.events), len(action_replay.checkpoints)))
+        replay_memory = action_replay.regenerate(skip=args.skip, processes=args.processes)
+        replay_memory.save(name=name, folder=folder)
+
+def main():
+    """
+    python3 regenerate_demo.py collected_demo/PongNoFrameskip_v4 --processes=4
+    """
+    coloredlogs.install(level='DEBUG', fmt='%(asctime)s,%(msecs)03d %(name)s %(levelname)s %(message)s')
+    logger.setLevel(logging.DEBUG)
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('folder', type=str, help='demo folder, searched recursively for action replays')
+    parser.add_argument('--skip', type=int, default=None, help='store every skip-th frame, default: skip used at collection')
+    parser.add_argument('--processes', type=int, default=0, help='replay segments between checkpoints in a process pool')
+    parser.add_argument('--overwrite', action='store_true')
+    parser.set_defaults(overwrite=False)
+
+    args = parser.parse_args()
+
+    regenerate_demo(args)
+
+
+if __name__ == "__main__":
+    main()